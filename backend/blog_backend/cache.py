@@ -0,0 +1,415 @@
+import functools
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from .routers import use_primary
+
+VERSION_KEY = 'cache:version:{namespace}'
+SCOPE_VERSION_KEY = 'cache:version:{namespace}:{scope}'
+VALUE_KEY = 'cache:{namespace}:{versions}:{key}'
+STALE_KEY = 'cache:stale:{namespace}:{key}'
+LOCK_KEY = '{cache_key}:lock'
+
+# Longer key parts are hashed so that keys stay valid for every cache backend
+MAX_KEY_LENGTH = 150
+
+_missing = object()
+
+# Lookup outcomes of the current request, for blog_backend.metrics
+request_lookups = ContextVar('cache_request_lookups', default=None)
+
+namespaces = {}
+
+
+class LocalCache:
+    """Per-process LRU with a TTL per entry; values are shared by callers, not copied"""
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class CacheStats:
+    """Per-process L1 hit, L2 hit and miss counters by namespace"""
+
+    # Stale hits were served the previous value while another worker recomputed it;
+    # coalesced lookups waited for that worker instead
+    OUTCOMES = ('l1_hits', 'l2_hits', 'stale_hits', 'coalesced', 'misses')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: dict.fromkeys(self.OUTCOMES, 0))
+
+    def record(self, namespace, outcome, count=1):
+        if count:
+            with self._lock:
+                self._counts[namespace][outcome] += count
+            lookups = request_lookups.get()
+            if lookups is not None:
+                lookups[outcome] += count
+
+    def snapshot(self):
+        with self._lock:
+            counts = {namespace: dict(outcomes) for namespace, outcomes in self._counts.items()}
+        for outcomes in counts.values():
+            lookups = sum(outcomes.values())
+            outcomes['hit_ratio'] = round((lookups - outcomes['misses']) / lookups, 4) if lookups else None
+        return counts
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+local_cache = LocalCache(max_size=settings.CACHE_L1_MAX_ENTRIES)
+stats = CacheStats()
+
+
+def _format_key(parts):
+    text = ':'.join(str(part) for part in parts)
+    if len(text) > MAX_KEY_LENGTH or not text.isprintable() or ' ' in text:
+        return hashlib.sha1(text.encode()).hexdigest()
+    return text
+
+
+def _store_stamp(key, stamp):
+    local_cache.set(key, stamp, settings.CACHE_L1_VERSION_SECONDS)
+    return stamp
+
+
+def get_stamps(keys):
+    """Version stamps by key, from L1 while fresh, otherwise from L2 (created there when missing)"""
+    stamps = {}
+    stale = []
+    for key in keys:
+        stamp = local_cache.get(key)
+        if stamp is None:
+            stale.append(key)
+        else:
+            stamps[key] = stamp
+    if stale:
+        found = cache.get_many(stale)
+        for key in stale:
+            stamp = found.get(key)
+            if stamp is None:
+                stamp = time.time_ns()
+                # The first worker to create the stamp wins
+                if not cache.add(key, stamp, timeout=None):
+                    stamp = cache.get(key) or stamp
+            stamps[key] = _store_stamp(key, stamp)
+    return stamps
+
+
+def bump_stamp(key):
+    """Give a version stamp a new value, which orphans every value stored under the old one"""
+    stamp = time.time_ns()
+    cache.set(key, stamp, timeout=None)
+    _store_stamp(key, stamp)
+
+
+class CacheNamespace:
+    """
+    Two-tier cache of values under a versioned namespace.
+
+    Lookups try the per-process L1, then the shared Django cache (L2), and
+    compute the value on a miss. Keys are tuples whose first part is their
+    scope. Value keys embed the version stamps of the namespace and of the
+    scope, so invalidation bumps a stamp instead of finding keys to delete.
+    Workers trust their copy of a stamp for CACHE_L1_VERSION_SECONDS, which
+    bounds how long they may serve values invalidated by another worker.
+
+    With single_flight, concurrent misses of a key across workers are
+    coalesced into one computation (see _fill); use it for values that are
+    expensive to build and may be served slightly stale.
+
+    Values kept in L1 are shared by every caller in the process and must not
+    be modified. Set CACHE_ENABLED to False to compute every lookup.
+    """
+
+    def __init__(self, name, timeout=None, single_flight=False):
+        if namespaces.setdefault(name, self) is not self:
+            raise ValueError(f'A cache namespace named {name!r} already exists')
+        self.name = name
+        self.timeout = timeout
+        self.single_flight = single_flight
+
+    def __repr__(self):
+        return f'<CacheNamespace {self.name}>'
+
+    def get_timeout(self):
+        return self.timeout if self.timeout is not None else settings.CACHE_DEFAULT_TIMEOUT
+
+    def _version_key(self, scope=None):
+        if scope is None:
+            return VERSION_KEY.format(namespace=self.name)
+        return SCOPE_VERSION_KEY.format(namespace=self.name, scope=_format_key([scope]))
+
+    def make_keys(self, keys):
+        """Map each key tuple to its cache key at the current version stamps"""
+        namespace_key = self._version_key()
+        scope_keys = {key: self._version_key(key[0]) for key in keys if key}
+        stamps = get_stamps([namespace_key, *dict.fromkeys(scope_keys.values())])
+        cache_keys = {}
+        for key in keys:
+            versions = [stamps[namespace_key]]
+            if key:
+                versions.append(stamps[scope_keys[key]])
+            cache_keys[key] = VALUE_KEY.format(
+                namespace=self.name,
+                versions='.'.join(str(version) for version in versions),
+                key=_format_key(key)
+            )
+        return cache_keys
+
+    def _fetch(self, keys, cache_keys, timeout):
+        """Values of keys found in L2, which are copied to L1"""
+        found = cache.get_many([cache_keys[key] for key in keys])
+        values = {}
+        for key in keys:
+            if cache_keys[key] in found:
+                values[key] = found[cache_keys[key]]
+                local_cache.set(cache_keys[key], values[key], timeout)
+        return values
+
+    def _compute(self, keys, cache_keys, compute_many, timeout):
+        stats.record(self.name, 'misses', len(keys))
+        # A lagging replica would store old rows under the current version stamp
+        with use_primary():
+            computed = compute_many(keys)
+        cache.set_many({cache_keys[key]: value for key, value in computed.items()}, timeout=timeout)
+        if self.single_flight:
+            # The last value outlives its key, for readers waiting on a recompute
+            cache.set_many(
+                {self._stale_key(key): value for key, value in computed.items()},
+                timeout=timeout + settings.CACHE_STALE_SECONDS
+            )
+        for key, value in computed.items():
+            local_cache.set(cache_keys[key], value, timeout)
+        return computed
+
+    def _stale_key(self, key):
+        return STALE_KEY.format(namespace=self.name, key=_format_key(key))
+
+    def _fill(self, keys, cache_keys, compute_many, timeout):
+        """
+        Compute the values of keys missing from both tiers.
+
+        With single_flight, only the worker holding a key's lock computes it.
+        The others serve its last value, if it has one, or wait up to
+        CACHE_LOCK_WAIT_SECONDS for the computed value before computing it
+        themselves.
+        """
+        if not self.single_flight:
+            return self._compute(keys, cache_keys, compute_many, timeout)
+
+        token = uuid.uuid4().hex
+        lock_keys = {key: LOCK_KEY.format(cache_key=cache_keys[key]) for key in keys}
+        owned = [key for key in keys if cache.add(lock_keys[key], token, timeout=settings.CACHE_LOCK_SECONDS)]
+        values = {}
+        if owned:
+            try:
+                values.update(self._compute(owned, cache_keys, compute_many, timeout))
+            finally:
+                # Leave locks that expired and were taken over meanwhile to their new holder
+                held = cache.get_many([lock_keys[key] for key in owned])
+                cache.delete_many([lock_key for lock_key, holder in held.items() if holder == token])
+
+        waiting = [key for key in keys if key not in values]
+        if waiting:
+            stale = cache.get_many([self._stale_key(key) for key in waiting])
+            served = [key for key in waiting if self._stale_key(key) in stale]
+            for key in served:
+                values[key] = stale[self._stale_key(key)]
+            stats.record(self.name, 'stale_hits', len(served))
+
+        deadline = time.monotonic() + settings.CACHE_LOCK_WAIT_SECONDS
+        waiting = [key for key in keys if key not in values]
+        while waiting and time.monotonic() < deadline:
+            time.sleep(settings.CACHE_LOCK_POLL_SECONDS)
+            found = self._fetch(waiting, cache_keys, timeout)
+            stats.record(self.name, 'coalesced', len(found))
+            values.update(found)
+            waiting = [key for key in waiting if key not in found]
+        if waiting:
+            values.update(self._compute(waiting, cache_keys, compute_many, timeout))
+        return values
+
+    def get_or_set_many(self, keys, compute_many, timeout=None):
+        """
+        Get the values of many keys at once.
+
+        compute_many is called with the list of keys missing from both tiers
+        and returns a dict of their values, which are then stored for timeout
+        seconds (by default the namespace's).
+        """
+        keys = list(dict.fromkeys(tuple(key) for key in keys))
+        if not settings.CACHE_ENABLED:
+            return compute_many(keys)
+
+        cache_keys = self.make_keys(keys)
+        values = {}
+        for key in keys:
+            value = local_cache.get(cache_keys[key], _missing)
+            if value is not _missing:
+                values[key] = value
+        stats.record(self.name, 'l1_hits', len(values))
+
+        timeout = timeout if timeout is not None else self.get_timeout()
+        remote = [key for key in keys if key not in values]
+        if remote:
+            found = self._fetch(remote, cache_keys, timeout)
+            stats.record(self.name, 'l2_hits', len(found))
+            values.update(found)
+
+        missing = [key for key in keys if key not in values]
+        if missing:
+            values.update(self._fill(missing, cache_keys, compute_many, timeout))
+        return values
+
+    def get_or_set(self, key, compute, timeout=None):
+        key = tuple(key)
+        return self.get_or_set_many([key], lambda missing: {key: compute()}, timeout=timeout)[key]
+
+    def invalidate(self, scope=None):
+        """
+        Drop the values of one scope, or of the whole namespace.
+
+        Inside a transaction the stamp is bumped again on commit, so values
+        recomputed from data read before the commit are dropped as well.
+        """
+        key = self._version_key(None if scope is None else str(scope))
+        bump_stamp(key)
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: bump_stamp(key))
+
+
+def invalidate_on_change(namespace, model, scope=None):
+    """
+    Invalidate a namespace when instances of model are saved or deleted.
+
+    scope(instance) narrows it to one scope. Auto-created many-to-many
+    through models invalidate the whole namespace when their links change.
+    Changes made with QuerySet.update() or bulk methods send no signals and
+    must be invalidated by the code that makes them.
+    """
+    dispatch_uid = f'cache:{namespace.name}:{model._meta.label_lower}'
+
+    if model._meta.auto_created:
+        def links_changed(sender, action, **kwargs):
+            if action in ('post_add', 'post_remove', 'post_clear'):
+                namespace.invalidate()
+        m2m_changed.connect(links_changed, sender=model, weak=False, dispatch_uid=dispatch_uid)
+        return
+
+    def changed(sender, instance, **kwargs):
+        namespace.invalidate(scope(instance) if scope else None)
+    post_save.connect(changed, sender=model, weak=False, dispatch_uid=dispatch_uid)
+    post_delete.connect(changed, sender=model, weak=False, dispatch_uid=dispatch_uid)
+
+
+def cached(namespace, timeout=None, single_flight=False):
+    """
+    Cache the results of a function by its arguments.
+
+    The first argument is the scope: `func.invalidate(value)` drops the
+    results for that first argument and `func.invalidate()` drops them all.
+    The undecorated function is available as `func.uncached`.
+    """
+    def decorator(func):
+        cache_namespace = CacheNamespace(namespace, timeout, single_flight)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (*args, *sorted(kwargs.items()))
+            return cache_namespace.get_or_set(key, lambda: func(*args, **kwargs))
+
+        wrapper.namespace = cache_namespace
+        wrapper.invalidate = cache_namespace.invalidate
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+def cached_queryset(namespace, depends_on=(), timeout=None, single_flight=False):
+    """
+    Cache the rows of the queryset returned by a function as a list.
+
+    Saving or deleting an instance of any depends_on model, or changing the
+    links of a many-to-many through model listed there, drops every result.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def evaluate(*args, **kwargs):
+            return list(func(*args, **kwargs))
+
+        wrapper = cached(namespace, timeout, single_flight)(evaluate)
+        wrapper.uncached = func
+        for model in depends_on:
+            invalidate_on_change(wrapper.namespace, model)
+        return wrapper
+    return decorator
+
+
+def cached_model(model, namespace=None, timeout=None, single_flight=False):
+    """
+    Cache a function that loads an instance of model by primary key.
+
+    The function may return None for missing rows, which is cached too.
+    Saving or deleting an instance drops its entry.
+    """
+    def decorator(func):
+        cache_namespace = CacheNamespace(
+            namespace or f'model:{model._meta.label_lower}',
+            timeout,
+            single_flight
+        )
+        invalidate_on_change(cache_namespace, model, scope=lambda instance: instance.pk)
+
+        @functools.wraps(func)
+        def wrapper(pk):
+            pk = str(model._meta.pk.to_python(pk))
+            return cache_namespace.get_or_set((pk,), lambda: func(pk))
+
+        wrapper.namespace = cache_namespace
+        wrapper.invalidate = cache_namespace.invalidate
+        wrapper.uncached = func
+        return wrapper
+    return decorator
@@ -0,0 +1,90 @@
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework import status
+from rest_framework.response import Response
+from .routers import request_replica
+
+# PostgreSQL SQLSTATE of a query cancelled by statement_timeout
+QUERY_CANCELED = '57014'
+
+
+def is_statement_timeout(exc):
+    cause = getattr(exc, '__cause__', None)
+    # psycopg 3 names the code sqlstate, psycopg2 pgcode
+    code = getattr(cause, 'sqlstate', None) or getattr(cause, 'pgcode', None)
+    return isinstance(exc, DatabaseError) and code == QUERY_CANCELED
+
+
+@contextmanager
+def statement_timeout(milliseconds, using=DEFAULT_DB_ALIAS):
+    """
+    Cancel PostgreSQL queries that run longer than milliseconds inside the block.
+
+    Inside a transaction the limit ends with it (SET LOCAL); otherwise it is
+    reset on exit so that persistent or pooled connections do not keep it.
+    A falsy limit or another database makes this a no-op.
+    """
+    connection = connections[using]
+    if not milliseconds or connection.vendor != 'postgresql':
+        yield
+        return
+
+    local = connection.in_atomic_block
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT set_config('statement_timeout', %s, %s)", [str(int(milliseconds)), local])
+    try:
+        yield
+    finally:
+        if not local:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('RESET statement_timeout')
+            except DatabaseError:
+                # Never hand a connection with the limit still set to the next request
+                connection.close()
+
+
+class StatementTimeoutMixin:
+    """
+    Per-action statement timeouts for DRF views.
+
+    Views map actions to scopes with `statement_timeout_scopes`, and the limit
+    of each scope in milliseconds comes from the DB_STATEMENT_TIMEOUTS setting.
+    It applies to the primary, the analytics database and the replica that
+    ReplicaRouter picked for the request.
+    Requests cancelled by the limit get a 503 instead of pinning a worker.
+    """
+    statement_timeout_scopes = {}
+
+    def get_statement_timeout(self):
+        scope = self.statement_timeout_scopes.get(getattr(self, 'action', None))
+        return settings.DB_STATEMENT_TIMEOUTS.get(scope) if scope else None
+
+    def dispatch(self, request, *args, **kwargs):
+        # Reset here rather than in finalize_response, which is skipped when an error becomes a 500
+        with ExitStack() as self._statement_timeout:
+            return super().dispatch(request, *args, **kwargs)
+
+    def get_statement_timeout_aliases(self):
+        """Databases the request may query: the primary, the analytics database and the request's replica"""
+        aliases = {DEFAULT_DB_ALIAS, settings.ANALYTICS_DB_ALIAS}
+        replica = request_replica()
+        if replica is not None:
+            aliases.add(replica)
+        return aliases
+
+    def initial(self, request, *args, **kwargs):
+        timeout = self.get_statement_timeout()
+        if timeout:
+            for using in self.get_statement_timeout_aliases():
+                self._statement_timeout.enter_context(statement_timeout(timeout, using=using))
+        super().initial(request, *args, **kwargs)
+
+    def handle_exception(self, exc):
+        if is_statement_timeout(exc):
+            return Response(
+                {'error': 'This request took too long, please narrow it down or try again later'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        return super().handle_exception(exc)
@@ -0,0 +1,247 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+import uuid
+from collections import defaultdict
+from django.conf import settings
+from django.db import connection, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'blog_events'
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more; longer events are sent in parts
+MAX_NOTIFY_BYTES = 7900
+
+
+class Subscription:
+    """Bounded event queue owned by one streaming client"""
+
+    def __init__(self, channel, maxsize=100):
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def put(self, event):
+        # Runs on the subscriber's event loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The client fell behind. Its backlog no longer adds up to the current state, so
+            # replace it with one event telling the client to refetch the thread and counts
+            dropped = self.queue.qsize() + 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'type': 'resync'})
+            self.dropped += dropped
+            logger.warning('Subscriber of %s fell behind; replaced %d events with a resync', self.channel, dropped)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+def split_payload(payload):
+    """
+    NOTIFY payloads for a JSON message.
+
+    Messages that fit are sent as they are. Longer ones are split into
+    'id:index:count:part' payloads, which NotifyAssembler joins again.
+    """
+    if len(payload) < MAX_NOTIFY_BYTES:
+        return [payload]
+    message_id = uuid.uuid4().hex
+    # ASCII-only JSON, so characters and bytes are the same; leave room for the header
+    size = MAX_NOTIFY_BYTES - 64
+    parts = [payload[start:start + size] for start in range(0, len(payload), size)]
+    return [f'{message_id}:{index}:{len(parts)}:{part}' for index, part in enumerate(parts)]
+
+
+class NotifyAssembler:
+    """Joins the payloads of split_payload back into messages"""
+
+    def __init__(self):
+        self._parts = {}
+
+    def add(self, payload):
+        """The decoded message once all its parts have arrived, else None"""
+        if payload.startswith('{'):
+            return json.loads(payload)
+        message_id, index, count, part = payload.split(':', 3)
+        parts = self._parts.setdefault(message_id, {})
+        parts[int(index)] = part
+        if len(parts) < int(count):
+            return None
+        del self._parts[message_id]
+        return json.loads(''.join(parts[index] for index in range(int(count))))
+
+
+class Broadcaster:
+    """
+    In-process pub/sub that fans events out to streaming clients.
+
+    Publishers may run on any thread. With EVENTS_BACKEND = 'postgres',
+    events go through LISTEN/NOTIFY so every worker process receives them.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self._listener = None
+
+    @property
+    def backend(self):
+        return getattr(settings, 'EVENTS_BACKEND', 'local')
+
+    def subscribe(self, channel):
+        """Register a subscription; must be called from a running event loop"""
+        subscription = Subscription(channel, getattr(settings, 'EVENTS_QUEUE_SIZE', 100))
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        if self.backend == 'postgres':
+            self._ensure_listener()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._subscribers.get(channel, ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish_local(self, channel, event):
+        """Deliver an event to the subscribers in this process"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # The client's event loop has already shut down
+                self.unsubscribe(subscription)
+
+    def publish(self, channel, event):
+        """Publish an event once the current transaction commits"""
+        transaction.on_commit(lambda: self._send(channel, event))
+
+    def _send(self, channel, event):
+        if self.backend != 'postgres':
+            self.publish_local(channel, event)
+            return
+        payload = json.dumps({'channel': channel, 'event': event}, default=str)
+        try:
+            # The parts of a long event are delivered together when the transaction commits
+            with transaction.atomic(), connection.cursor() as cursor:
+                for part in split_payload(payload):
+                    cursor.execute('SELECT pg_notify(%s, %s)', [NOTIFY_CHANNEL, part])
+        except Exception as e:
+            logger.warning('Falling back to local delivery for %s: %s', channel, e)
+            self.publish_local(channel, event)
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='events-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        """Forward NOTIFY payloads from PostgreSQL to local subscribers"""
+        backoff = 1
+        while True:
+            listener = None
+            assembler = NotifyAssembler()
+            try:
+                listener = open_listener(NOTIFY_CHANNEL)
+                backoff = 1
+                for payload in listener_payloads(listener):
+                    message = assembler.add(payload)
+                    if message is not None:
+                        self.publish_local(message['channel'], message['event'])
+            except Exception as e:
+                logger.error('Event listener disconnected: %s', e)
+                if listener is not None:
+                    listener.close()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+
+# OPTIONS that configure Django's use of the driver rather than the libpq connection
+DJANGO_DB_OPTIONS = {
+    'pool', 'isolation_level', 'assume_role', 'server_side_binding',
+    'cursor_factory', 'context', 'prepare_threshold',
+}
+
+
+def listener_params(settings_dict):
+    """
+    libpq keywords for a LISTEN connection to the database of settings_dict.
+
+    The listener connects on its own, outside Django's pool, so it is built
+    from the settings rather than from get_connection_params(), whose psycopg 3
+    extras (context, prepare_threshold, cursor_factory) libpq rejects.
+    """
+    params = {
+        'dbname': settings_dict.get('NAME'),
+        'user': settings_dict.get('USER'),
+        'password': settings_dict.get('PASSWORD'),
+        'host': settings_dict.get('HOST'),
+        'port': settings_dict.get('PORT'),
+        **{
+            key: value for key, value in settings_dict.get('OPTIONS', {}).items()
+            if key not in DJANGO_DB_OPTIONS
+        },
+    }
+    return {key: str(value) for key, value in params.items() if value not in (None, '')}
+
+
+def open_listener(channel, alias='default'):
+    """An autocommit connection LISTENing on channel, opened with the driver Django uses"""
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+    params = listener_params(connections[alias].settings_dict)
+    if is_psycopg3:
+        import psycopg
+        listener = psycopg.connect(psycopg.conninfo.make_conninfo(**params), autocommit=True)
+        listener.execute(f'LISTEN {channel}')
+        return listener
+
+    import psycopg2
+    import psycopg2.extensions
+    listener = psycopg2.connect(psycopg2.extensions.make_dsn(**params))
+    listener.autocommit = True
+    with listener.cursor() as cursor:
+        cursor.execute(f'LISTEN {channel}')
+    return listener
+
+
+def listener_payloads(listener):
+    """Yield NOTIFY payloads received by an open_listener() connection until it drops"""
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+    if is_psycopg3:
+        for notify in listener.notifies():
+            yield notify.payload
+        return
+
+    while True:
+        if select.select([listener], [], [], 30) == ([], [], []):
+            continue
+        listener.poll()
+        while listener.notifies:
+            yield listener.notifies.pop(0).payload
+
+
+broadcaster = Broadcaster()
+
+
+def post_channel(post_id):
+    return f'post:{post_id}'
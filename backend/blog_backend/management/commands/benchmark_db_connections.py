@@ -0,0 +1,66 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = 'Measure per-request connection setup overhead with and without connection reuse'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Simulated requests per mode')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--query', default='SELECT 1', help='Query run by each request')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        original = {key: connection.settings_dict[key] for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')}
+        pooled = 'pool' in connection.settings_dict.get('OPTIONS', {})
+        modes = [
+            ('pool' if pooled else 'new connection', 0, False),
+            ('persistent', 600, False),
+            ('persistent + checks', 600, True),
+        ]
+
+        self.stdout.write(f"{connection.vendor} ({connection.settings_dict.get('HOST') or 'local'})")
+        self.stdout.write(f'{"mode":<22}{"mean (ms)":>11}{"p50 (ms)":>10}{"p95 (ms)":>10}{"connects":>10}')
+        results = {}
+        try:
+            for name, max_age, health_checks in modes:
+                connection.close()
+                connection.settings_dict.update(CONN_MAX_AGE=max_age, CONN_HEALTH_CHECKS=health_checks)
+                timings, connects = self.run_requests(connection, options['requests'], options['query'])
+                results[name] = statistics.mean(timings)
+                timings.sort()
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                self.stdout.write(
+                    f'{name:<22}{results[name] * 1000:>11.2f}{statistics.median(timings) * 1000:>10.2f}'
+                    f'{p95 * 1000:>10.2f}{connects:>10}'
+                )
+        finally:
+            connection.close()
+            connection.settings_dict.update(original)
+
+        baseline = modes[0][0]
+        saved = (results[baseline] - results['persistent + checks']) * 1000
+        self.stdout.write(self.style.SUCCESS(
+            f'Reusing connections saves {saved:.2f} ms per request over {baseline}'
+        ))
+
+    def run_requests(self, connection, requests, query):
+        """Run one query per simulated request, with Django's request signals closing stale connections"""
+        timings = []
+        connects = 0
+        for _ in range(requests):
+            start = time.perf_counter()
+            request_started.send(sender=self.__class__)
+            previous = connection.connection
+            with connection.cursor() as cursor:
+                cursor.execute(query)
+                cursor.fetchall()
+            if connection.connection is not previous or previous is None:
+                connects += 1
+            request_finished.send(sender=self.__class__)
+            timings.append(time.perf_counter() - start)
+        return timings, connects
@@ -0,0 +1,50 @@
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+class Command(BaseCommand):
+    help = 'Move post views and reaction rollups left on the primary into the analytics database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--keep', action='store_true', help='Leave the copied rows on the primary')
+
+    def handle(self, *args, **options):
+        target = settings.ANALYTICS_DB_ALIAS
+        if target == DEFAULT_DB_ALIAS:
+            raise CommandError('ANALYTICS_DB_NAME is not set, analytics tables already live on the primary')
+
+        tables = connections[DEFAULT_DB_ALIAS].introspection.table_names()
+        for label in settings.ANALYTICS_MODELS:
+            model = apps.get_model(label)
+            if model._meta.db_table not in tables:
+                continue
+            moved = self.copy(model, target, options['batch_size'])
+            if not options['keep']:
+                model.objects.using(DEFAULT_DB_ALIAS).all().delete()
+            self.stdout.write(f'{label}: {moved} rows moved')
+        self.stdout.write(self.style.SUCCESS(f'Analytics data is in the {target!r} database'))
+
+    def copy(self, model, target, batch_size):
+        rows = model.objects.using(DEFAULT_DB_ALIAS).order_by('pk')
+        moved = 0
+        last_pk = None
+        while True:
+            batch = list((rows if last_pk is None else rows.filter(pk__gt=last_pk))[:batch_size])
+            if not batch:
+                break
+            model.objects.using(target).bulk_create(batch, ignore_conflicts=True)
+            moved += len(batch)
+            last_pk = batch[-1].pk
+
+        # Explicit IDs do not advance sequences, so new rows would collide with the copied ones
+        connection = connections[target]
+        statements = connection.ops.sequence_reset_sql(no_style(), [model])
+        if statements:
+            with transaction.atomic(using=target), connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+        return moved
@@ -0,0 +1,244 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+from blog_backend.cache import local_cache
+from blog_backend.queries import recording
+from comments.models import Comment
+from posts.models import Category, Post, Tag
+
+User = get_user_model()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the API endpoints in-process on seeded data and compare against a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per endpoint first')
+        parser.add_argument('--memory-requests', type=int, default=5, help='Requests traced with tracemalloc')
+        parser.add_argument('--cold', action='store_true', help='Clear the caches before every request')
+        parser.add_argument('--only', action='append', help='Run endpoints whose name contains this (repeatable)')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', help='Fail on regressions against the results in this file')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed relative increase of p95 latency and memory over the baseline')
+        parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                            help='Latency increases below this are noise, whatever their ratio')
+
+    def handle(self, *args, **options):
+        scenarios = self.scenarios()
+        if options['only']:
+            scenarios = [s for s in scenarios if any(name in s[0] for name in options['only'])]
+        if not scenarios:
+            raise CommandError('No endpoints to benchmark')
+
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            # Measure the endpoints, not the rate limits
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}},
+        ):
+            results = {}
+            self.stdout.write(
+                f'{"endpoint":<32}{"p50 (ms)":>10}{"p95 (ms)":>10}{"queries":>9}{"memory (KB)":>13}'
+            )
+            for name, method, path, user, data in scenarios:
+                result = self.benchmark(method, path, user, data, options)
+                results[name] = result
+                self.stdout.write(
+                    f'{name:<32}{result["p50_ms"]:>10.1f}{result["p95_ms"]:>10.1f}'
+                    f'{result["queries"]:>9}{result["memory_kb"]:>13.1f}'
+                )
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'cache': settings.CACHE_BACKEND,
+                'reactions_storage': settings.REACTIONS_STORAGE,
+                'debug': settings.DEBUG,
+                'cold': options['cold'],
+                'posts': Post.objects.count(),
+                'comments': Comment.objects.count(),
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        failed = [name for name, result in results.items() if result['errors']]
+        for name in failed:
+            self.stderr.write(f'{name}: {results[name]["errors"]} requests failed (last status {results[name]["status"]})')
+        if options['baseline']:
+            failed += self.compare(results, options)
+        if failed:
+            raise CommandError(f'{len(failed)} benchmark checks failed')
+        self.stdout.write(self.style.SUCCESS('Benchmarks passed'))
+
+    def scenarios(self):
+        """(name, method, path, user, data) for every endpoint, on the busiest seeded rows"""
+        post = Post.objects.filter(status='published').order_by('-view_count').first()
+        if post is None:
+            raise CommandError('No published posts; run seed_benchmark_data first')
+        busiest = Comment.objects.filter(parent__isnull=True).values('post').annotate(
+            total=Count('id')
+        ).order_by('-total').first()
+        thread_post = busiest['post'] if busiest else post.pk
+        comment = Comment.objects.filter(post_id=thread_post, parent__isnull=True).annotate(
+            total=Count('replies')
+        ).order_by('-total').first()
+        category = Category.objects.annotate(total=Count('posts')).order_by('-total').first()
+        tag = Tag.objects.annotate(total=Count('posts')).order_by('-total').first()
+        page = ','.join(str(pk) for pk in Post.objects.filter(status='published').values_list('pk', flat=True)[:20])
+
+        author = post.author
+        reader, _ = User.objects.get_or_create(username='benchmark_reader', defaults={'email': 'benchmark_reader@example.com'})
+        staff, _ = User.objects.get_or_create(
+            username='benchmark_staff', defaults={'email': 'benchmark_staff@example.com', 'is_staff': True}
+        )
+
+        scenarios = [
+            ('posts.list', 'get', '/api/posts/', None, None),
+            ('posts.list.reactions', 'get', '/api/posts/?include=reactions', reader, None),
+            ('posts.list.search', 'get', '/api/posts/?search=cache', None, None),
+            ('posts.retrieve', 'get', f'/api/posts/{post.pk}/', reader, None),
+            ('posts.featured', 'get', '/api/posts/featured/', None, None),
+            ('posts.my_posts', 'get', '/api/posts/my_posts/', author, None),
+            ('posts.drafts', 'get', '/api/posts/drafts/', author, None),
+            ('posts.analytics', 'get', f'/api/posts/{post.pk}/analytics/', author, None),
+            ('posts.debug_views', 'get', f'/api/posts/{post.pk}/debug_views/', staff, None),
+            ('posts.increment_view', 'post', f'/api/posts/{post.pk}/increment_view/', author, None),
+            ('categories.list', 'get', '/api/categories/', None, None),
+            ('tags.list', 'get', '/api/tags/', None, None),
+            ('comments.list', 'get', f'/api/comments/?post={thread_post}', None, None),
+            ('comments.for_post', 'get', f'/api/comments/for_post/?post_id={thread_post}', None, None),
+            ('comments.for_post.best', 'get', f'/api/comments/for_post/?post_id={thread_post}&ordering=best', reader, None),
+            ('comments.for_post.staff', 'get', f'/api/comments/for_post/?post_id={thread_post}', staff, None),
+            ('comments.pending', 'get', '/api/comments/pending/', staff, None),
+            ('comments.my_comments', 'get', '/api/comments/my_comments/', author, None),
+            ('reactions.list', 'get', '/api/reactions/', reader, None),
+            ('reactions.post_reactions', 'get', f'/api/reactions/post_reactions/?post_id={post.pk}', reader, None),
+            ('reactions.batch', 'get', f'/api/reactions/batch/?post_ids={page}', None, None),
+            ('reactions.my_reactions', 'get', '/api/reactions/my_reactions/', reader, None),
+            ('reactions.popular_reactions', 'get', f'/api/reactions/popular_reactions/?post_id={post.pk}', reader, None),
+            ('reactions.analytics', 'get', '/api/reactions/analytics/', staff, None),
+            ('reactions.toggle', 'post', '/api/reactions/toggle/', reader, {'post_id': str(post.pk), 'reaction_type': 'like'}),
+            ('users.list', 'get', '/api/users/', reader, None),
+            ('users.me', 'get', '/api/users/me/', reader, None),
+            ('users.profile', 'get', f'/api/users/{author.pk}/profile/', reader, None),
+            ('users.author', 'get', f'/api/users/{author.pk}/author/', None, None),
+            ('users.search', 'get', '/api/users/search/?q=bench', reader, None),
+        ]
+        if comment is not None:
+            scenarios += [
+                ('comments.retrieve', 'get', f'/api/comments/{comment.pk}/', None, None),
+                ('comments.replies', 'get', f'/api/comments/{comment.pk}/replies/', None, None),
+                ('comments.like', 'post', f'/api/comments/{comment.pk}/like/', staff, None),
+            ]
+        if category is not None:
+            scenarios.append(('categories.posts', 'get', f'/api/categories/{category.slug}/posts/', None, None))
+        if tag is not None:
+            scenarios.append(('tags.posts', 'get', f'/api/tags/{tag.slug}/posts/', None, None))
+        return scenarios
+
+    def request(self, client, method, path, headers, data):
+        if data is None:
+            return getattr(client, method)(path, **headers)
+        return getattr(client, method)(path, data, content_type='application/json', **headers)
+
+    def benchmark(self, method, path, user, data, options):
+        # Errors are counted as failed requests rather than ending the run
+        client = Client(raise_request_exception=False)
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'} if user else {}
+        errors = 0
+        status = None
+
+        def send(traced=False):
+            nonlocal errors, status
+            if options['cold']:
+                cache.clear()
+                local_cache.clear()
+            start = time.perf_counter()
+            # The request's middleware records into this same recorder
+            with recording(shapes=False) as recorder:
+                response = self.request(client, method, path, headers, data)
+            elapsed = time.perf_counter() - start
+            status = response.status_code
+            if status >= 400:
+                errors += 1
+            return elapsed, recorder.count
+
+        for _ in range(options['warmup']):
+            send()
+        timings, queries = zip(*(send() for _ in range(max(1, options['requests']))))
+
+        # Traced separately, since tracemalloc slows every allocation down
+        memory = []
+        tracemalloc.start()
+        try:
+            for _ in range(options['memory_requests']):
+                tracemalloc.clear_traces()
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                send()
+                memory.append(tracemalloc.get_traced_memory()[1] - baseline)
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'method': method.upper(),
+            'path': path,
+            'requests': len(timings),
+            'p50_ms': round(statistics.median(timings) * 1000, 3),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+            'queries': round(statistics.median(queries)),
+            'memory_kb': round(statistics.median(memory) / 1024, 1) if memory else 0.0,
+            'errors': errors,
+            'status': status,
+        }
+
+    def compare(self, results, options):
+        """Names of the checks that regressed against the baseline file"""
+        try:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)['results']
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'Could not read the baseline {options["baseline"]}: {e}')
+
+        tolerance = 1 + options['tolerance']
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                self.stdout.write(f'{name}: not in the baseline')
+                continue
+            # Query counts are deterministic, so any increase is a regression
+            if result['queries'] > before['queries']:
+                regressions.append((name, 'queries', before['queries'], result['queries']))
+            if (result['p95_ms'] > before['p95_ms'] * tolerance
+                    and result['p95_ms'] - before['p95_ms'] >= options['min_delta_ms']):
+                regressions.append((name, 'p95_ms', before['p95_ms'], result['p95_ms']))
+            if result['memory_kb'] > before['memory_kb'] * tolerance and result['memory_kb'] - before['memory_kb'] >= 64:
+                regressions.append((name, 'memory_kb', before['memory_kb'], result['memory_kb']))
+
+        for name, metric, before, after in regressions:
+            self.stderr.write(f'{name}: {metric} regressed from {before} to {after}')
+        return [f'{name}.{metric}' for name, metric, _, _ in regressions]
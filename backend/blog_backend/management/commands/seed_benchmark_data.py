@@ -0,0 +1,345 @@
+import random
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from blog_backend.cache import namespaces
+from comments.models import Comment, hot_score
+from posts.models import Category, Post, PostView, Tag
+from reactions.models import Reaction, ReactionSet
+from reactions.storage import get_storage
+
+User = get_user_model()
+
+PASSWORD = 'benchmark-password'
+TOPICS = [
+    'Python', 'Django', 'JavaScript', 'React', 'DevOps', 'Databases', 'Security', 'Testing',
+    'Performance', 'Career', 'Design', 'Cloud', 'Data Science', 'Mobile', 'Open Source',
+    'Architecture', 'Rust', 'Go', 'Linux', 'Machine Learning',
+]
+WORDS = (
+    'the a of to and in is that for it with as on this be are by from at an or you can we not your '
+    'code data query index cache request response server client model view test build deploy release '
+    'latency throughput memory thread process worker queue database table column row schema migration '
+    'function class module package library framework pattern design system service network protocol '
+    'user session token error exception log metric trace profile benchmark load scale replica shard '
+    'simple fast slow better worse new old small large every some many most first last next before after '
+    'write read update delete create run start stop check find use make keep move change improve measure'
+).split()
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 14_5) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Safari/605.1.15',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:127.0) Gecko/20100101 Firefox/127.0',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148',
+]
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the given created/updated times instead of stamping every row with now()"""
+    fields = [
+        (field, field.auto_now, field.auto_now_add)
+        for model in models
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def distribute(total, weights, rng):
+    """Split total into integer shares proportional to weights"""
+    if not weights or total <= 0:
+        return [0] * len(weights)
+    scale = total / sum(weights)
+    shares = [int(weight * scale) for weight in weights]
+    for index in rng.choices(range(len(weights)), weights=weights, k=total - sum(shares)):
+        shares[index] += 1
+    return shares
+
+
+def between(rng, start, end):
+    return start + (end - start) * rng.random()
+
+
+class BatchWriter:
+    """Collect model instances and bulk_create them batch_size at a time, one transaction per batch"""
+
+    def __init__(self, model, batch_size):
+        self.model = model
+        self.batch_size = batch_size
+        self.using = router.db_for_write(model)
+        self.pending = []
+        self.total = 0
+
+    def add(self, obj):
+        self.pending.append(obj)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        with transaction.atomic(using=self.using):
+            self.model.objects.using(self.using).bulk_create(self.pending, batch_size=self.batch_size)
+        self.total += len(self.pending)
+        self.pending = []
+
+
+class Command(BaseCommand):
+    help = 'Bulk-create realistic volumes of users, posts, views, comment threads and reactions for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--views', type=int, default=5000000)
+        parser.add_argument('--comments', type=int, default=1000000)
+        parser.add_argument('--reactions', type=int, default=2000000)
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiply every volume, e.g. 0.01 for a quick run')
+        parser.add_argument('--max-depth', type=int, default=40, help='Deepest reply chain in a comment thread')
+        parser.add_argument('--words', type=int, default=400, help='Average words per post')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--force', action='store_true', help='Seed even with DEBUG off')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('DEBUG is off; pass --force to seed benchmark data into this database')
+
+        scale = options['scale']
+        volumes = {name: int(options[name] * scale) for name in ('users', 'posts', 'views', 'comments', 'reactions')}
+        if volumes['users'] < 1 or volumes['posts'] < 1:
+            raise CommandError('At least one user and one post are needed')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        # Keeps the usernames, emails and slugs of repeated runs apart
+        self.run = uuid.uuid4().hex[:6]
+        started = time.perf_counter()
+
+        with explicit_timestamps(User, Post, PostView, Comment, Reaction, ReactionSet):
+            user_ids = self.timed('users', self.create_users, volumes['users'])
+            categories, tags = self.timed('taxonomy', self.create_taxonomy)
+            posts = self.timed('posts', self.create_posts, volumes['posts'], user_ids, categories, tags,
+                               volumes['views'], options['words'])
+            published = [post for post in posts if post[2] is not None]
+            weights = [post[3] for post in published]
+            self.timed('views', self.create_views, published, user_ids)
+            self.timed('comments', self.create_comments, published,
+                       distribute(volumes['comments'], weights, self.rng), user_ids, options['max_depth'])
+            self.timed('reactions', self.create_reactions, published,
+                       distribute(volumes['reactions'], weights, self.rng), user_ids)
+
+        # Summaries, rollups and author totals are maintained by the write paths bulk_create skips
+        call_command('rebuild_reaction_summaries', stdout=self.stdout)
+        if get_storage().supports_rollups:
+            call_command('rollup_reactions', '--all', stdout=self.stdout)
+        call_command('reconcile_author_stats', stdout=self.stdout)
+        for namespace in namespaces.values():
+            namespace.invalidate()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded run {self.run} in {time.perf_counter() - started:.1f}s; '
+            f'users log in with password {PASSWORD!r}'
+        ))
+
+    def timed(self, label, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        self.stdout.write(f'{label}: {time.perf_counter() - start:.1f}s')
+        return result
+
+    def create_users(self, count):
+        # Hashing is slow on purpose, so every user shares one hash
+        password = make_password(PASSWORD)
+        writer = BatchWriter(User, self.batch_size)
+        user_ids = []
+        for i in range(count):
+            username = f'bench_{self.run}_{i}'
+            joined = self.now - timedelta(days=self.rng.uniform(0, 1000))
+            user = User(
+                username=username,
+                email=f'{username}@example.com',
+                password=password,
+                first_name=self.rng.choice(WORDS).title(),
+                last_name=self.rng.choice(WORDS).title(),
+                bio=' '.join(self.rng.choices(WORDS, k=self.rng.randint(0, 30))),
+                is_verified=self.rng.random() < 0.8,
+                date_joined=joined,
+            )
+            writer.add(user)
+            user_ids.append(user.pk)
+        writer.flush()
+        self.stdout.write(f'  {writer.total} users')
+        return user_ids
+
+    def create_taxonomy(self):
+        Category.objects.bulk_create(
+            [Category(name=topic, slug=slugify(topic), description=f'Posts about {topic}') for topic in TOPICS],
+            ignore_conflicts=True
+        )
+        names = [f'{topic} {word}' for topic in TOPICS for word in ('tips', 'news', 'deep dive', 'tutorial', 'notes')]
+        names += [word for word in WORDS if len(word) > 4]
+        Tag.objects.bulk_create([Tag(name=name, slug=slugify(name)) for name in names], ignore_conflicts=True)
+        categories = list(Category.objects.values_list('pk', flat=True))
+        tags = list(Tag.objects.values_list('pk', flat=True))
+        self.stdout.write(f'  {len(categories)} categories, {len(tags)} tags')
+        return categories, tags
+
+    def paragraphs(self, words):
+        paragraphs = []
+        while words > 0:
+            size = min(words, self.rng.randint(40, 120))
+            sentence = ' '.join(self.rng.choices(WORDS, k=size))
+            paragraphs.append(sentence[0].upper() + sentence[1:] + '.')
+            words -= size
+        return '\n\n'.join(paragraphs)
+
+    def create_posts(self, count, user_ids, categories, tags, views, words):
+        """Create posts; returns (pk, author_id, published_at, popularity, view_count) for each"""
+        # A tenth of the users write, and a few posts draw most of the traffic
+        authors = user_ids[:max(1, len(user_ids) // 10)]
+        popularity = [self.rng.paretovariate(1.2) for _ in range(count)]
+        statuses = self.rng.choices(['published', 'draft', 'archived'], weights=[90, 7, 3], k=count)
+        view_counts = distribute(views, [
+            weight if status == 'published' else 0 for weight, status in zip(popularity, statuses)
+        ], self.rng)
+
+        # Posts are flushed before their tag links, so the links never point at missing rows
+        writer = BatchWriter(Post, self.batch_size)
+        links = BatchWriter(Post.tags.through, self.batch_size)
+        rows = []
+        for i in range(count):
+            title = ' '.join(self.rng.choices(WORDS, k=self.rng.randint(4, 10))).capitalize()
+            content = self.paragraphs(max(20, int(self.rng.gauss(words, words / 3))))
+            created = self.now - timedelta(days=self.rng.uniform(0, 730))
+            status = statuses[i]
+            published_at = created + timedelta(hours=self.rng.uniform(0, 48)) if status != 'draft' else None
+            if published_at and published_at > self.now:
+                published_at = self.now
+            excerpt = content[:200] + '...' if len(content) > 200 else content
+            post = Post(
+                title=title,
+                slug=f'{slugify(title)[:200]}-{self.run}-{i}',
+                content=content,
+                excerpt=excerpt,
+                meta_title=title,
+                meta_description=excerpt,
+                author_id=self.rng.choice(authors),
+                status=status,
+                category_id=self.rng.choice(categories) if self.rng.random() < 0.9 else None,
+                published_at=published_at,
+                view_count=view_counts[i],
+                is_featured=status == 'published' and self.rng.random() < 0.005,
+                created_at=created,
+                updated_at=published_at or created,
+            )
+            writer.add(post)
+            if not writer.pending:
+                links.flush()
+            for tag in self.rng.sample(tags, self.rng.randint(0, min(5, len(tags)))):
+                links.pending.append(Post.tags.through(post_id=post.pk, tag_id=tag))
+            rows.append((post.pk, post.author_id, post.published_at if status == 'published' else None,
+                         popularity[i], view_counts[i]))
+        writer.flush()
+        links.flush()
+        self.stdout.write(f'  {writer.total} posts, {links.total} tag links')
+        return rows
+
+    def create_views(self, posts, user_ids):
+        writer = BatchWriter(PostView, self.batch_size)
+        for post_id, _, published_at, _, count in posts:
+            # About a third of readers are signed in; each user and session views a post once
+            signed_in = iter(self.rng.sample(user_ids, min(len(user_ids), int(count * 0.3))))
+            for _ in range(count):
+                writer.add(PostView(
+                    post_id=post_id,
+                    user_id=next(signed_in, None),
+                    session_key=uuid.uuid4().hex,
+                    ip_address=f'10.{self.rng.randrange(256)}.{self.rng.randrange(256)}.{self.rng.randrange(1, 255)}',
+                    user_agent=self.rng.choice(USER_AGENTS),
+                    # Views cluster shortly after publishing
+                    viewed_at=min(self.now, published_at + timedelta(hours=self.rng.expovariate(1 / 72))),
+                ))
+        writer.flush()
+        self.stdout.write(f'  {writer.total} views')
+
+    def create_comments(self, posts, counts, user_ids, max_depth):
+        writer = BatchWriter(Comment, self.batch_size)
+        for (post_id, _, published_at, _, _), count in zip(posts, counts):
+            thread = []  # (pk, depth, created_at)
+            comments = []
+            replies = Counter()  # approved replies per parent, which the score counts
+            for _ in range(count):
+                roll = self.rng.random()
+                parent = None
+                if thread and roll > 0.2:
+                    # Most replies continue the newest branch, which builds the deep chains
+                    candidate = thread[-1] if roll < 0.7 else self.rng.choice(thread)
+                    if candidate[1] < max_depth:
+                        parent = candidate
+                start = parent[2] if parent else published_at
+                created = between(self.rng, start, min(self.now, start + timedelta(days=7)))
+                comment = Comment(
+                    post_id=post_id,
+                    author_id=self.rng.choice(user_ids),
+                    parent_id=parent[0] if parent else None,
+                    content=' '.join(self.rng.choices(WORDS, k=self.rng.randint(5, 80))).capitalize(),
+                    status=self.rng.choices(['approved', 'pending', 'spam'], weights=[96, 3, 1])[0],
+                    likes_count=int(self.rng.paretovariate(1.5)) - 1,
+                    created_at=created,
+                    updated_at=created,
+                )
+                if parent and comment.status == 'approved':
+                    replies[parent[0]] += 1
+                thread.append((comment.pk, parent[1] + 1 if parent else 0, created))
+                comments.append(comment)
+            # Scores are set once the thread is complete, as Comment.refresh_score would leave them
+            for comment in comments:
+                comment.score = hot_score(comment.likes_count, replies[comment.pk], comment.created_at)
+                writer.add(comment)
+        writer.flush()
+        self.stdout.write(f'  {writer.total} comments')
+
+    def create_reactions(self, posts, counts, user_ids):
+        bitset = settings.REACTIONS_STORAGE == 'bitset'
+        writer = BatchWriter(ReactionSet if bitset else Reaction, self.batch_size)
+        reaction_types = [reaction_type for reaction_type, _ in Reaction.REACTION_CHOICES]
+        # The first few types are used far more than the rest
+        type_weights = [1 / (rank + 1) for rank in range(len(reaction_types))]
+        total = 0
+        for (post_id, _, published_at, _, _), count in zip(posts, counts):
+            for user_id in self.rng.sample(user_ids, min(len(user_ids), count)):
+                if count <= 0:
+                    break
+                chosen = set(self.rng.choices(reaction_types, weights=type_weights, k=min(count, self.rng.choice([1, 1, 1, 2, 3]))))
+                count -= len(chosen)
+                total += len(chosen)
+                created = min(self.now, published_at + timedelta(hours=self.rng.expovariate(1 / 48)))
+                if bitset:
+                    writer.add(ReactionSet(
+                        post_id=post_id,
+                        user_id=user_id,
+                        mask=sum(ReactionSet.bit(reaction_type) for reaction_type in chosen),
+                        updated_at=created,
+                    ))
+                    continue
+                for reaction_type in chosen:
+                    writer.add(Reaction(post_id=post_id, user_id=user_id, reaction_type=reaction_type, created_at=created))
+        writer.flush()
+        self.stdout.write(f'  {total} reactions ({writer.total} rows)')
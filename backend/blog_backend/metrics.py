@@ -0,0 +1,300 @@
+import fcntl
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from django.conf import settings
+from .cache import request_lookups
+from .queries import recording
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+WORKER_FILE = re.compile(r'^(?P<pid>[0-9]+)-(?P<started>[0-9]+)\.json$')
+EXITED_FILE = 'exited.json'
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    'http_request_duration_seconds': ('histogram', 'Request latency by view action', LATENCY_BUCKETS),
+    'http_request_db_seconds': ('histogram', 'Time spent in SQL per request by view action', LATENCY_BUCKETS),
+    'http_response_size_bytes': ('histogram', 'Response body size by view action', SIZE_BUCKETS),
+    'http_request_queries': ('histogram', 'SQL statements per request by view action', (1, 2, 5, 10, 20, 50, 100, 200)),
+    'cache_lookups_total': ('counter', 'Two-tier cache lookups by view action and outcome', None),
+    'post_view_errors_total': ('counter', 'Post views counted without being stored', None),
+    'tasks_queue_depth': ('gauge', 'Queued background tasks by name (posts.record_views is the view buffer)', None),
+    'tasks_running': ('gauge', 'Claimed background tasks by name', None),
+}
+
+
+class Metrics:
+    """
+    Per-process counters and histograms.
+
+    With METRICS_DIR set, each process writes its totals to
+    <pid>-<start>.json there at most every METRICS_FLUSH_SECONDS, and
+    collect() merges the files of every worker, so any of them can answer a
+    scrape. The start time keeps a recycled PID from overwriting an exited
+    worker's totals; collect() folds the files of exited workers into
+    exited.json, so their counts are kept without a file per worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._histograms = {}
+        self._flushed_at = 0.0
+        self._pid = None
+        self._started = None
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += value
+
+    def observe(self, name, value, **labels):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Per-bucket counts (the last one is +Inf), sum and count
+                histogram = self._histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, dict(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [
+                    [name, dict(labels), list(counts), total, count]
+                    for (name, labels), (counts, total, count) in self._histograms.items()
+                ],
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def flush(self, force=False):
+        directory = settings.METRICS_DIR
+        now = time.monotonic()
+        if not directory or (not force and now - self._flushed_at < settings.METRICS_FLUSH_SECONDS):
+            return
+        self._flushed_at = now
+        if self._pid != os.getpid():
+            # Set after a fork, in the worker itself
+            self._pid, self._started = os.getpid(), time.time_ns()
+        path = os.path.join(directory, f'{self._pid}-{self._started}.json')
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(temporary, 'w') as file:
+                json.dump(self.snapshot(), file)
+            # Readers only ever see complete files
+            os.replace(temporary, path)
+        except OSError:
+            logger.exception('Could not write metrics to %s', path)
+
+    def collect(self):
+        """Totals of every worker (or of this process without METRICS_DIR)"""
+        if not settings.METRICS_DIR:
+            return [self.snapshot()]
+        self.flush(force=True)
+        self.fold_exited()
+        snapshots = []
+        for entry in os.scandir(settings.METRICS_DIR):
+            if not entry.name.endswith('.json'):
+                continue
+            snapshot = read_snapshot(entry.path)
+            if snapshot is not None:
+                snapshots.append(snapshot)
+        return snapshots
+
+    def fold_exited(self):
+        """Add the totals of workers that exited to exited.json and remove their files"""
+        directory = settings.METRICS_DIR
+        workers = defaultdict(list)
+        for entry in os.scandir(directory):
+            match = WORKER_FILE.match(entry.name)
+            if match:
+                workers[int(match['pid'])].append((int(match['started']), entry.path))
+        exited = []
+        for pid, files in workers.items():
+            files.sort()
+            # Only the newest file of a PID can belong to a running process
+            exited += [path for _, path in files[:-1]]
+            if not is_running(pid):
+                exited.append(files[-1][1])
+        if not exited:
+            return
+
+        path = os.path.join(directory, EXITED_FILE)
+        with open(os.path.join(directory, 'exited.lock'), 'w') as lock:
+            # Concurrent scrapes must not fold the same file twice
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            exited = [name for name in exited if os.path.exists(name)]
+            snapshots = [read_snapshot(name) for name in [path, *exited] if os.path.exists(name)]
+            temporary = f'{path}.{os.getpid()}.tmp'
+            with open(temporary, 'w') as file:
+                json.dump(combine(snapshot for snapshot in snapshots if snapshot is not None), file)
+            os.replace(temporary, path)
+            for name in exited:
+                os.remove(name)
+
+
+def read_snapshot(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        logger.warning('Skipping unreadable metrics file %s', path)
+        return None
+
+
+def is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running as another user
+        return True
+    return True
+
+
+metrics = Metrics()
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in sorted(labels.items())
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def combine(snapshots):
+    """One snapshot holding the totals of several"""
+    counters = defaultdict(float)
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            counters[name, tuple(sorted(labels.items()))] += value
+        for name, labels, counts, total, count in snapshot['histograms']:
+            merged = histograms.setdefault((name, tuple(sorted(labels.items()))), [[0] * len(counts), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+            merged[2] += count
+    return {
+        'counters': [[name, dict(labels), value] for (name, labels), value in counters.items()],
+        'histograms': [
+            [name, dict(labels), counts, total, count]
+            for (name, labels), (counts, total, count) in histograms.items()
+        ],
+    }
+
+
+def merge(snapshots):
+    combined = combine(snapshots)
+    counters = {(name, _labels(labels)): value for name, labels, value in combined['counters']}
+    histograms = {
+        (name, tuple(sorted(labels.items()))): [counts, total, count]
+        for name, labels, counts, total, count in combined['histograms']
+    }
+    return counters, histograms
+
+
+def queue_gauges():
+    """Queue depth gauges, read from the database at scrape time"""
+    from django.db.models import Count
+    from tasks.models import Task
+
+    rows = Task.objects.filter(status__in=[Task.QUEUED, Task.RUNNING]).values('name', 'status').annotate(
+        total=Count('id')
+    )
+    gauges = defaultdict(float)
+    for row in rows:
+        name = 'tasks_queue_depth' if row['status'] == Task.QUEUED else 'tasks_running'
+        gauges[name, _labels({'name': row['name']})] = row['total']
+    return gauges
+
+
+def render(snapshots, gauges=None):
+    """Prometheus text exposition format (version 0.0.4)"""
+    counters, histograms = merge(snapshots)
+    samples = defaultdict(list)
+    for (name, labels), value in sorted({**counters, **(gauges or {})}.items()):
+        samples[name].append(f'{name}{labels} {value:g}')
+    for (name, labels), (counts, total, count) in sorted(histograms.items()):
+        labels = dict(labels)
+        cumulative = 0
+        for bound, bucket in zip([*METRICS[name][2], '+Inf'], counts):
+            cumulative += bucket
+            samples[name].append(f'{name}_bucket{_labels({**labels, "le": bound})} {cumulative}')
+        samples[name].append(f'{name}_sum{_labels(labels)} {total:g}')
+        samples[name].append(f'{name}_count{_labels(labels)} {count}')
+
+    lines = []
+    for name, (kind, help_text, _) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(samples.get(name, []))
+    return '\n'.join(lines) + '\n'
+
+
+def view_labels(view_func, request):
+    """The view and, for viewsets, the action handling a request"""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return getattr(view_func, '__name__', 'unknown'), ''
+    actions = getattr(view_func, 'actions', None) or {}
+    return view_class.__name__, actions.get(request.method.lower(), request.method.lower())
+
+
+class MetricsMiddleware:
+    """Record latency, SQL time and count, cache lookups and response size by view action"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        lookups = Counter()
+        token = request_lookups.set(lookups)
+        start = time.perf_counter()
+        try:
+            with recording(shapes=False) as recorder:
+                response = self.get_response(request)
+        finally:
+            request_lookups.reset(token)
+        elapsed = time.perf_counter() - start
+
+        # Unrouted requests share one label set, so scanners cannot inflate the series
+        view, action = getattr(request, '_metrics_view', ('unmatched', ''))
+        labels = {'view': view, 'action': action, 'method': request.method}
+        metrics.observe('http_request_duration_seconds', elapsed, status=response.status_code, **labels)
+        metrics.observe('http_request_db_seconds', recorder.duration, **labels)
+        metrics.observe('http_request_queries', recorder.count, **labels)
+        if not response.streaming:
+            metrics.observe('http_response_size_bytes', len(response.content), **labels)
+        for outcome, count in lookups.items():
+            metrics.inc('cache_lookups_total', count, outcome=outcome, view=view, action=action)
+        metrics.flush()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view = view_labels(view_func, request)
+        return None
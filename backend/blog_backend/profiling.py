@@ -0,0 +1,202 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+from .queries import recording
+
+PROFILE_PARAM = 'profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+# 'store' keeps the profile for /api/profiles/<id>/; 'text' replaces the response with a report
+PROFILE_MODES = {'1': 'store', 'store': 'store', 'text': 'text'}
+SLOT_KEY = 'profiling:slot:{index}'
+PROFILE_ID = re.compile(r'^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$')
+TOP_FUNCTIONS = 40
+
+
+def requested_mode(request):
+    return PROFILE_MODES.get(request.GET.get(PROFILE_PARAM) or request.META.get(PROFILE_HEADER, ''))
+
+
+def strip_profile_param(request):
+    """Drop ?profile= so views see the same query as an unprofiled request (list caches treat extra params as filters)"""
+    if PROFILE_PARAM not in request.GET:
+        return
+    query = request.GET.copy()
+    del query[PROFILE_PARAM]
+    request.GET = query
+    request.META['QUERY_STRING'] = query.urlencode()
+
+
+def is_staff(request):
+    """Whether the session or JWT user of the request is staff; DRF has not authenticated it yet"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    from users.authentication import CachedJWTAuthentication
+    try:
+        result = CachedJWTAuthentication().authenticate(request)
+    except APIException:
+        return False
+    return result is not None and result[0].is_staff
+
+
+@contextmanager
+def profiling_slot():
+    """
+    Hold one of PROFILING_MAX_CONCURRENT site-wide slots, or yield False if all are taken.
+
+    Slots live in the shared cache and expire after PROFILING_SLOT_SECONDS
+    in case their holder dies.
+    """
+    token = uuid.uuid4().hex
+    for index in range(settings.PROFILING_MAX_CONCURRENT):
+        key = SLOT_KEY.format(index=index)
+        if cache.add(key, token, timeout=settings.PROFILING_SLOT_SECONDS):
+            try:
+                yield True
+            finally:
+                if cache.get(key) == token:
+                    cache.delete(key)
+            return
+    yield False
+
+
+def profile_path(profile_id, suffix):
+    if not PROFILE_ID.match(profile_id):
+        raise ValueError(f'Invalid profile ID {profile_id!r}')
+    return os.path.join(settings.PROFILING_DIR, f'{profile_id}{suffix}')
+
+
+def top_functions(stats, limit=TOP_FUNCTIONS):
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {
+            'function': pstats.func_std_string(function),
+            'calls': calls,
+            'total_ms': round(total * 1000, 3),
+            'cumulative_ms': round(cumulative * 1000, 3),
+        }
+        for function, (_, calls, total, cumulative, _) in rows
+    ]
+
+
+def save_profile(request, response, profiler, timeline, elapsed):
+    """Store the pstats dump and a JSON summary with the SQL timeline; returns the profile ID"""
+    now = timezone.now()
+    profile_id = f'{now:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}'
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    profiler.dump_stats(profile_path(profile_id, '.prof'))
+
+    summary = {
+        'id': profile_id,
+        'created_at': now.isoformat(),
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': response.status_code,
+        'user': str(request.user.pk) if getattr(request, 'user', None) and request.user.is_authenticated else None,
+        'duration_ms': round(elapsed * 1000, 3),
+        'sql_ms': round(timeline.duration * 1000, 3),
+        'query_count': timeline.count,
+        'functions': top_functions(pstats.Stats(profiler)),
+        'queries': timeline.queries,
+    }
+    with open(profile_path(profile_id, '.json'), 'w') as file:
+        json.dump(summary, file)
+    prune_profiles()
+    return profile_id
+
+
+def list_profiles():
+    """IDs of the stored profiles, newest first"""
+    try:
+        names = os.listdir(settings.PROFILING_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted((name[:-5] for name in names if name.endswith('.json') and PROFILE_ID.match(name[:-5])), reverse=True)
+
+
+def prune_profiles():
+    for profile_id in list_profiles()[settings.PROFILING_KEEP:]:
+        for suffix in ('.json', '.prof'):
+            try:
+                os.remove(profile_path(profile_id, suffix))
+            except FileNotFoundError:
+                pass
+
+
+def load_profile(profile_id):
+    """The JSON summary of a stored profile, or None"""
+    try:
+        with open(profile_path(profile_id, '.json')) as file:
+            return json.load(file)
+    except (ValueError, FileNotFoundError):
+        return None
+
+
+def text_report(profiler, timeline, elapsed):
+    stream = io.StringIO()
+    stream.write(f'{elapsed * 1000:.1f} ms, {timeline.count} queries\n\n')
+    pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+    stream.write('SQL timeline (start ms, duration ms, alias)\n')
+    for query in timeline.queries:
+        stream.write(f"{query['start_ms']:>10.1f} {query['duration_ms']:>10.1f}  {query['alias']}  {query['sql']}\n")
+    return stream.getvalue()
+
+
+class ProfilingMiddleware:
+    """
+    Profile a request with cProfile when staff ask for it with ?profile=1 or an X-Profile: 1 header.
+
+    The profile and its SQL timeline are stored under PROFILING_DIR and the
+    response gets an X-Profile-Id header (see /api/profiles/); ?profile=text
+    returns a text report instead of the response. At most
+    PROFILING_MAX_CONCURRENT requests are profiled at once across the site;
+    others run unprofiled with X-Profile: busy.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = requested_mode(request)
+        if not settings.PROFILING_ENABLED or mode is None:
+            return self.get_response(request)
+        strip_profile_param(request)
+        if not is_staff(request):
+            return self.get_response(request)
+
+        with profiling_slot() as acquired:
+            if not acquired:
+                response = self.get_response(request)
+                response['X-Profile'] = 'busy'
+                return response
+
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Python 3.12+ allows one cProfile at a time per process
+                response = self.get_response(request)
+                response['X-Profile'] = 'busy'
+                return response
+            try:
+                with recording(shapes=False, timeline=True) as timeline:
+                    response = self.get_response(request)
+            finally:
+                profiler.disable()
+            elapsed = time.perf_counter() - timeline.started
+
+        if mode == 'text':
+            return HttpResponse(text_report(profiler, timeline, elapsed), content_type='text/plain; charset=utf-8')
+        response['X-Profile-Id'] = save_profile(request, response, profiler, timeline, elapsed)
+        return response
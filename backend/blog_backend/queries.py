@@ -0,0 +1,219 @@
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+DEBUG_HEADER = 'HTTP_X_DEBUG_QUERIES'
+
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SAVEPOINT = re.compile(r'"s\d+_x\d+"')
+_WHITESPACE = re.compile(r'\s+')
+
+_active_recorder = ContextVar('query_recorder', default=None)
+
+
+def normalize_sql(sql):
+    """The shape of a statement: parameters, literals, IN lists and savepoint names collapsed"""
+    sql = _SAVEPOINT.sub('"s_x"', sql)
+    sql = _LITERALS.sub('?', sql)
+    sql = _IN_LIST.sub('(%s, ...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper that counts the queries of a request and their time.
+
+    With shapes, it also counts each normalized statement (for N+1 checks);
+    with timeline, it keeps when each statement ran and for how long in
+    queries (for profiles).
+    """
+
+    def __init__(self, shapes=True, timeline=False):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter() if shapes else None
+        self.queries = [] if timeline else None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.duration += duration
+            self.count += 1
+            if self.shapes is not None:
+                self.shapes[normalize_sql(sql)] += 1
+            if self.queries is not None:
+                self.queries.append({
+                    'alias': context['connection'].alias,
+                    'start_ms': round((start - self.started) * 1000, 3),
+                    'duration_ms': round(duration * 1000, 3),
+                    'sql': sql,
+                })
+
+    def repeated(self, threshold):
+        """Shapes run more than threshold times, most frequent first"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+    def record(self):
+        """Record the queries of every database inside the block"""
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(self))
+        return stack
+
+
+class QueryWindow:
+    """The part of a shared QueryRecorder recorded while the window was open, with the same attributes"""
+
+    def __init__(self, recorder):
+        self.started = time.perf_counter()
+        self._recorder = recorder
+        self._start = self._totals()
+        self._end = None
+
+    def _totals(self):
+        recorder = self._recorder
+        return (
+            recorder.count,
+            recorder.duration,
+            Counter(recorder.shapes) if recorder.shapes is not None else None,
+            len(recorder.queries) if recorder.queries is not None else None,
+        )
+
+    def close(self):
+        """Stop the window; queries run afterwards by outer layers are not part of it"""
+        self._end = self._totals()
+
+    @property
+    def count(self):
+        return (self._end or self._totals())[0] - self._start[0]
+
+    @property
+    def duration(self):
+        return (self._end or self._totals())[1] - self._start[1]
+
+    @property
+    def shapes(self):
+        if self._start[2] is None:
+            return None
+        return (self._end or self._totals())[2] - self._start[2]
+
+    @property
+    def queries(self):
+        if self._start[3] is None:
+            return None
+        end = (self._end or self._totals())[3]
+        offset_ms = (self.started - self._recorder.started) * 1000
+        return [
+            {**query, 'start_ms': round(query['start_ms'] - offset_ms, 3)}
+            for query in self._recorder.queries[self._start[3]:end]
+        ]
+
+    def repeated(self, threshold):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+
+@contextmanager
+def recording(shapes=True, timeline=False):
+    """
+    Record the queries run inside the block; yields a QueryRecorder or QueryWindow.
+
+    Nested blocks (metrics, instrumentation and profiling of one request)
+    share the outermost block's recorder, so each statement passes through a
+    single execute wrapper and no layer times the others' overhead. Inner
+    blocks turn on the shapes or timeline they need and read their own window.
+    """
+    recorder = _active_recorder.get()
+    if recorder is not None:
+        if shapes and recorder.shapes is None:
+            recorder.shapes = Counter()
+        if timeline and recorder.queries is None:
+            recorder.queries = []
+        window = QueryWindow(recorder)
+        try:
+            yield window
+        finally:
+            window.close()
+        return
+
+    recorder = QueryRecorder(shapes=shapes, timeline=timeline)
+    token = _active_recorder.set(recorder)
+    try:
+        with recorder.record():
+            yield recorder
+    finally:
+        _active_recorder.reset(token)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Count the SQL of a request and flag N+1 patterns.
+
+    Requests are instrumented when QUERY_INSTRUMENTATION is on (the default
+    with DEBUG), when staff send an X-Debug-Queries header, and for a
+    QUERY_SAMPLE_RATE fraction of the rest. Instrumented requests log
+    statements repeated more than QUERY_REPEAT_THRESHOLD times, and those
+    slower than QUERY_SLOW_REQUEST_MS. The Server-Timing and X-Query-Count
+    headers are only added with QUERY_INSTRUMENTATION on, or for staff.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def sampled(self):
+        if settings.QUERY_INSTRUMENTATION:
+            return True
+        return settings.QUERY_SAMPLE_RATE > 0 and random.random() < settings.QUERY_SAMPLE_RATE
+
+    def __call__(self, request):
+        sampled = self.sampled()
+        if not sampled and DEBUG_HEADER not in request.META:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        with recording() as recorder:
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        user = getattr(request, 'user', None)
+        # DRF copies the user it authenticated (e.g. from a JWT) onto the request
+        staff = user is not None and user.is_staff
+        # Only staff may ask for instrumentation; anyone else's header must not add log lines
+        if not sampled and not staff:
+            return response
+
+        self.report(request, response, recorder, elapsed)
+        if settings.QUERY_INSTRUMENTATION or staff:
+            timing = f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries", total;dur={elapsed * 1000:.1f}'
+            response['Server-Timing'] = ', '.join(filter(None, [response.get('Server-Timing'), timing]))
+            response['X-Query-Count'] = str(recorder.count)
+        return response
+
+    def report(self, request, response, recorder, elapsed):
+        repeated = recorder.repeated(settings.QUERY_REPEAT_THRESHOLD)
+        for shape, count in repeated:
+            logger.warning('Possible N+1 in %s %s: %d x %s', request.method, request.path, count, shape)
+
+        if elapsed * 1000 >= settings.QUERY_SLOW_REQUEST_MS:
+            logger.warning(
+                'Slow request %s %s (%d): %.0f ms, %d queries in %.0f ms%s',
+                request.method,
+                request.path,
+                response.status_code,
+                elapsed * 1000,
+                recorder.count,
+                recorder.duration * 1000,
+                f', most repeated: {repeated[0][1]} x {repeated[0][0]}' if repeated else ''
+            )
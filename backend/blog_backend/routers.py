@@ -0,0 +1,231 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, OperationalError, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_COOKIE = 'db_pin'
+PIN_KEY = 'db:pin:{user_id}'
+
+# Seconds the replica is behind the primary; 0 when caught up or when run on a primary
+POSTGRES_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+_routing = ContextVar('db_routing', default=None)
+_primary_only = ContextVar('db_primary_only', default=False)
+
+
+def replica_lag(alias):
+    """Replication lag of a replica in seconds, or None if it cannot be reached"""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(POSTGRES_LAG_SQL if connection.vendor == 'postgresql' else 'SELECT 0')
+            return float(cursor.fetchone()[0])
+    except DatabaseError:
+        connection.close()
+        return None
+
+
+class ReplicaHealth:
+    """Per-process view of which replicas are reachable and caught up, refreshed every DB_REPLICA_CHECK_SECONDS"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = {}
+        self._healthy = {}
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at.get(alias, float('-inf')) < settings.DB_REPLICA_CHECK_SECONDS:
+                return self._healthy[alias]
+            # Claim the check so that concurrent requests keep the previous answer meanwhile
+            self._checked_at[alias] = now
+            self._healthy.setdefault(alias, False)
+
+        lag = replica_lag(alias)
+        healthy = lag is not None and lag <= settings.DB_REPLICA_MAX_LAG_SECONDS
+        with self._lock:
+            self._healthy[alias] = healthy
+        return healthy
+
+    def mark_down(self, alias):
+        """Stop using a replica until its next check"""
+        with self._lock:
+            self._checked_at[alias] = time.monotonic()
+            self._healthy[alias] = False
+
+    def reset(self):
+        with self._lock:
+            self._checked_at.clear()
+            self._healthy.clear()
+
+
+replica_health = ReplicaHealth()
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside the block, e.g. while filling a shared cache"""
+    token = _primary_only.set(True)
+    try:
+        yield
+    finally:
+        _primary_only.reset(token)
+
+
+def request_replica():
+    """The replica that the current request reads from, or None outside replica routing"""
+    state = _routing.get()
+    if state is None or not state.read_only:
+        return None
+    return state.replica()
+
+
+def pin_to_primary(request, response):
+    """Send the reads of whoever made this request to the primary for DB_REPLICA_STICKY_SECONDS"""
+    seconds = settings.DB_REPLICA_STICKY_SECONDS
+    response.set_cookie(PIN_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax')
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        # JWT clients may not keep cookies
+        cache.set(PIN_KEY.format(user_id=user.pk), True, timeout=seconds)
+
+
+class RoutingState:
+    """Replica routing decisions for one request"""
+
+    def __init__(self, request):
+        self.request = request
+        self.read_only = request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES
+        self.wrote = False
+        self._pinned_user = None
+        self._replica = None
+
+    def pinned(self):
+        # The user is only known once DRF has authenticated the request
+        user = getattr(self.request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return False
+        if self._pinned_user is None:
+            self._pinned_user = bool(cache.get(PIN_KEY.format(user_id=user.pk)))
+        return self._pinned_user
+
+    def replica(self):
+        """A healthy replica, the same one for the whole request, or None"""
+        if self._replica is None or not replica_health.is_healthy(self._replica):
+            healthy = [alias for alias in settings.DB_REPLICA_ALIASES if replica_health.is_healthy(alias)]
+            self._replica = random.choice(healthy) if healthy else None
+        return self._replica
+
+
+class AnalyticsRouter:
+    """
+    Keep ANALYTICS_MODELS in the ANALYTICS_DB_ALIAS database.
+
+    Their history before their foreign keys became plain ID columns stays on
+    the primary, where those tables were first created; from then on they are
+    only migrated on the analytics database.
+    """
+
+    def _alias(self, model):
+        if model._meta.label_lower in settings.ANALYTICS_MODELS and settings.ANALYTICS_DB_ALIAS != DEFAULT_DB_ALIAS:
+            return settings.ANALYTICS_DB_ALIAS
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._alias(model)
+
+    def db_for_write(self, model, **hints):
+        return self._alias(model)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if f'{app_label}.{model_name}' not in settings.ANALYTICS_MODELS:
+            # The analytics database holds nothing else
+            if db == settings.ANALYTICS_DB_ALIAS != DEFAULT_DB_ALIAS:
+                return False
+            return None
+        model = hints.get('model')
+        if model is not None and any(field.is_relation for field in model._meta.fields):
+            return db == DEFAULT_DB_ALIAS
+        return db == settings.ANALYTICS_DB_ALIAS
+
+
+class ReplicaRouter:
+    """
+    Send reads of DB_REPLICA_MODELS in safe-method requests to a replica.
+
+    Reads stay on the primary inside transactions and use_primary(), after a
+    write in the same request, for DB_REPLICA_STICKY_SECONDS after the
+    client's last write, and when no replica is healthy. Outside ReplicaRoutingMiddleware (shell,
+    commands, workers) everything uses the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.read_only or state.wrote or _primary_only.get():
+            return None
+        if model._meta.label_lower not in settings.DB_REPLICA_MODELS:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block or state.pinned():
+            return None
+        return state.replica()
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in settings.DB_REPLICA_ALIASES:
+            # Objects read from a replica are saved to the primary
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DB_REPLICA_ALIASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive their schema from the primary
+        if db in settings.DB_REPLICA_ALIASES:
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Enable ReplicaRouter for the request and pin clients that write to the primary"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DB_REPLICA_ALIASES:
+            return self.get_response(request)
+
+        state = RoutingState(request)
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        state = _routing.get()
+        if state is not None and state._replica and isinstance(exception, OperationalError):
+            replica_health.mark_down(state._replica)
+        return None
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
 from pathlib import Path
+from importlib.util import find_spec
 import os
 from decouple import config
 
@@ -48,15 +49,23 @@ INSTALLED_APPS = [
     'posts',
     'comments',
     'reactions',
+    'moderation',
+    'tasks',
+    # Project-wide management commands
+    'blog_backend',
 ]
 
 MIDDLEWARE = [
+    'blog_backend.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'blog_backend.queries.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'blog_backend.profiling.ProfilingMiddleware',
+    'blog_backend.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -109,6 +118,129 @@ if not config('DB_PASSWORD', default=''):
         }
     }
 
+# Connection reuse
+# 'pool' shares a psycopg 3 pool per process (needs psycopg[pool]); 'none' connects per request;
+# 'persistent' keeps each worker thread's connection for DB_CONN_MAX_AGE seconds and checks it
+# before reuse. The app is served under ASGI, where every request may run on a different thread
+# and persistent connections pile up, so 'persistent' is only for WSGI deployments. Without
+# psycopg 3, 'pool' falls back to 'none'.
+HAS_PSYCOPG_POOL = find_spec('psycopg') is not None and find_spec('psycopg_pool') is not None
+DB_POOL_MODE = config('DB_POOL_MODE', default='pool')
+if DB_POOL_MODE == 'pool' and not HAS_PSYCOPG_POOL:
+    DB_POOL_MODE = 'none'
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=60, cast=int)
+DB_POOL_MIN_SIZE = config('DB_POOL_MIN_SIZE', default=2, cast=int)
+DB_POOL_MAX_SIZE = config('DB_POOL_MAX_SIZE', default=10, cast=int)
+# Seconds a request waits for a pooled connection before failing
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10, cast=int)
+# Server-side limit for every query in milliseconds (0 keeps the server default)
+DB_STATEMENT_TIMEOUT_MS = config('DB_STATEMENT_TIMEOUT_MS', default=0, cast=int)
+# Tighter limits for the views that map actions to these scopes (blog_backend.db.StatementTimeoutMixin)
+DB_STATEMENT_TIMEOUTS = {
+    'analytics': config('DB_STATEMENT_TIMEOUT_ANALYTICS_MS', default=5000, cast=int),
+}
+
+DATABASES['default']['CONN_MAX_AGE'] = DB_CONN_MAX_AGE if DB_POOL_MODE == 'persistent' else 0
+DATABASES['default']['CONN_HEALTH_CHECKS'] = DB_POOL_MODE == 'persistent'
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    if DB_POOL_MODE == 'pool':
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+        }
+    if DB_STATEMENT_TIMEOUT_MS:
+        DATABASES['default']['OPTIONS']['options'] = f'-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}'
+
+# Analytics database
+# Post views and reaction rollups can live in their own database, so that their write traffic,
+# WAL and backups stay apart from the content. Set ANALYTICS_DB_NAME (a file path with the SQLite
+# fallback; host and credentials default to the primary's), run `manage.py migrate --database
+# analytics`, then `manage.py move_analytics_data` to move existing rows.
+ANALYTICS_DB_NAME = config('ANALYTICS_DB_NAME', default='')
+if ANALYTICS_DB_NAME:
+    DATABASES['analytics'] = {
+        **DATABASES['default'],
+        'OPTIONS': dict(DATABASES['default'].get('OPTIONS', {})),
+        'NAME': ANALYTICS_DB_NAME,
+        'USER': config('ANALYTICS_DB_USER', default=DATABASES['default'].get('USER', '')),
+        'PASSWORD': config('ANALYTICS_DB_PASSWORD', default=DATABASES['default'].get('PASSWORD', '')),
+        'HOST': config('ANALYTICS_DB_HOST', default=DATABASES['default'].get('HOST', '')),
+        'PORT': config('ANALYTICS_DB_PORT', default=DATABASES['default'].get('PORT', '')),
+    }
+ANALYTICS_DB_ALIAS = 'analytics' if ANALYTICS_DB_NAME else 'default'
+ANALYTICS_MODELS = ['posts.postview', 'reactions.reactionrollup']
+
+# Read replicas
+# Comma-separated replica hosts (host or host:port) that share the primary's credentials.
+# With the SQLite fallback, paths of replica database files (e.g. a copy of db.sqlite3).
+DB_REPLICAS = config('DB_REPLICAS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])
+DB_REPLICA_ALIASES = []
+for index, replica in enumerate(DB_REPLICAS, start=1):
+    alias = f'replica{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'OPTIONS': dict(DATABASES['default'].get('OPTIONS', {})),
+        # Tests run against the primary's test database
+        'TEST': {'MIRROR': 'default'},
+    }
+    if DATABASES[alias]['ENGINE'] == 'django.db.backends.sqlite3':
+        DATABASES[alias]['NAME'] = replica
+    else:
+        host, _, port = replica.partition(':')
+        DATABASES[alias].update(HOST=host, PORT=port or DATABASES['default']['PORT'])
+    DB_REPLICA_ALIASES.append(alias)
+
+DATABASE_ROUTERS = ['blog_backend.routers.AnalyticsRouter', 'blog_backend.routers.ReplicaRouter']
+# Models whose safe-method API reads may be served by a replica
+DB_REPLICA_MODELS = ['posts.post', 'posts.postview', 'comments.comment', 'reactions.reaction']
+# After a write, the client reads from the primary for this long so it sees its own changes
+DB_REPLICA_STICKY_SECONDS = config('DB_REPLICA_STICKY_SECONDS', default=10, cast=int)
+# Replicas further behind, or unreachable, are skipped until their next check
+DB_REPLICA_MAX_LAG_SECONDS = config('DB_REPLICA_MAX_LAG_SECONDS', default=5, cast=float)
+DB_REPLICA_CHECK_SECONDS = config('DB_REPLICA_CHECK_SECONDS', default=5, cast=float)
+
+
+# Cache
+# The shared cache (L2 of blog_backend.cache, also used for throttling, token revocation and auth):
+# 'locmem' is per process (development only), 'file' shares a CACHE_LOCATION directory between the
+# workers of one host, and 'redis' uses a Redis-compatible server at the CACHE_LOCATION URL
+# (needs the redis package).
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+CACHE_DEFAULT_LOCATIONS = {
+    'locmem': '',
+    'file': '/var/tmp/blog_backend_cache',
+    'redis': 'redis://localhost:6379/0',
+}
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': config('CACHE_LOCATION', default=CACHE_DEFAULT_LOCATIONS[CACHE_BACKEND]),
+    }
+}
+if CACHE_BACKEND != 'redis':
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=10000, cast=int)}
+# Set to False to bypass the two-tier cache (other cache users are unaffected)
+CACHE_ENABLED = config('CACHE_ENABLED', default=True, cast=bool)
+CACHE_DEFAULT_TIMEOUT = config('CACHE_DEFAULT_TIMEOUT', default=300, cast=int)
+# Size of the per-process L1
+CACHE_L1_MAX_ENTRIES = config('CACHE_L1_MAX_ENTRIES', default=2048, cast=int)
+# Workers trust their copy of a version stamp for this long, so values invalidated by another
+# worker may be served for up to this many seconds
+CACHE_L1_VERSION_SECONDS = config('CACHE_L1_VERSION_SECONDS', default=5, cast=float)
+# Single-flight namespaces: one worker recomputes a missing value while holding its lock for at most
+# CACHE_LOCK_SECONDS; the others serve the previous value (kept CACHE_STALE_SECONDS past its expiry)
+# or, without one, poll for up to CACHE_LOCK_WAIT_SECONDS before computing it themselves
+CACHE_LOCK_SECONDS = config('CACHE_LOCK_SECONDS', default=10, cast=float)
+CACHE_LOCK_WAIT_SECONDS = config('CACHE_LOCK_WAIT_SECONDS', default=2, cast=float)
+CACHE_LOCK_POLL_SECONDS = config('CACHE_LOCK_POLL_SECONDS', default=0.05, cast=float)
+CACHE_STALE_SECONDS = config('CACHE_STALE_SECONDS', default=300, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -129,6 +261,44 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# The first hasher of the profile hashes new passwords; the others still verify old hashes,
+# which are rehashed with the first one on the next successful login.
+PASSWORD_HASHER_PROFILES = {
+    'argon2': [
+        'users.hashers.TunedArgon2PasswordHasher',
+        'users.hashers.TunedPBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+    ],
+    'pbkdf2': [
+        'users.hashers.TunedPBKDF2PasswordHasher',
+        'users.hashers.TunedArgon2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+    ],
+}
+# Argon2 needs argon2-cffi; without it the pbkdf2 profile is used
+HAS_ARGON2 = find_spec('argon2') is not None
+PASSWORD_HASHER_PROFILE = config('PASSWORD_HASHER_PROFILE', default='argon2' if HAS_ARGON2 else 'pbkdf2')
+if PASSWORD_HASHER_PROFILE == 'argon2' and not HAS_ARGON2:
+    PASSWORD_HASHER_PROFILE = 'pbkdf2'
+PASSWORD_HASHERS = PASSWORD_HASHER_PROFILES[PASSWORD_HASHER_PROFILE]
+PASSWORD_ARGON2_TIME_COST = config('PASSWORD_ARGON2_TIME_COST', default=2, cast=int)
+PASSWORD_ARGON2_MEMORY_COST = config('PASSWORD_ARGON2_MEMORY_COST', default=19456, cast=int)  # KiB
+PASSWORD_ARGON2_PARALLELISM = config('PASSWORD_ARGON2_PARALLELISM', default=1, cast=int)
+# 0 keeps Django's default iteration count
+PASSWORD_PBKDF2_ITERATIONS = config('PASSWORD_PBKDF2_ITERATIONS', default=0, cast=int)
+
+# Login settings
+# Create a Django session on API login in addition to the JWT pair
+AUTH_LOGIN_CREATE_SESSION = config('AUTH_LOGIN_CREATE_SESSION', default=True, cast=bool)
+# Concurrent password hashes per process (0 disables the limit) and how long a login may wait for
+# a slot before getting a 503. Waiting holds a worker thread, so the default is not to wait
+LOGIN_MAX_CONCURRENT_HASHES = config('LOGIN_MAX_CONCURRENT_HASHES', default=4, cast=int)
+LOGIN_HASH_QUEUE_SECONDS = config('LOGIN_HASH_QUEUE_SECONDS', default=0, cast=float)
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -161,6 +331,7 @@ AUTH_USER_MODEL = 'users.CustomUser'
 
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = config('CORS_ALLOW_ALL_ORIGINS', default=True, cast=bool)
+CORS_EXPOSE_HEADERS = ['X-Query-Count']
 
 # Email settings (for development)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
@@ -171,10 +342,89 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@blogapp.com')
 
+# Query instrumentation (blog_backend.queries.QueryInstrumentationMiddleware)
+# Instrument every request and add Server-Timing and X-Query-Count headers (development)
+QUERY_INSTRUMENTATION = config('QUERY_INSTRUMENTATION', default=DEBUG, cast=bool)
+# Fraction of other requests instrumented for the logs below; staff can ask with an X-Debug-Queries header
+QUERY_SAMPLE_RATE = config('QUERY_SAMPLE_RATE', default=0.0, cast=float)
+# Log statements of one shape run more often than this in a request (N+1 patterns)
+QUERY_REPEAT_THRESHOLD = config('QUERY_REPEAT_THRESHOLD', default=10, cast=int)
+QUERY_SLOW_REQUEST_MS = config('QUERY_SLOW_REQUEST_MS', default=1000, cast=int)
+
+# Metrics (blog_backend.metrics), served in Prometheus text format at /metrics/
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+# Each worker writes its totals here so that whichever worker answers a scrape reports all of them;
+# empty reports only that worker. Use a directory local to the host, ideally on a tmpfs.
+METRICS_DIR = config('METRICS_DIR', default='')
+# Scrapes may miss up to this many seconds of another worker's requests
+METRICS_FLUSH_SECONDS = config('METRICS_FLUSH_SECONDS', default=5, cast=float)
+# Bearer token for the scraper; staff sessions can read the endpoint as well
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Request profiling (blog_backend.profiling.ProfilingMiddleware), for staff sending ?profile=1
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=True, cast=bool)
+# Requests profiled at once across the site; a slot is freed after PROFILING_SLOT_SECONDS at most
+PROFILING_MAX_CONCURRENT = config('PROFILING_MAX_CONCURRENT', default=1, cast=int)
+PROFILING_SLOT_SECONDS = config('PROFILING_SLOT_SECONDS', default=120, cast=int)
+# Where profiles are stored (per host) and how many of the newest are kept
+PROFILING_DIR = config('PROFILING_DIR', default='/var/tmp/blog_backend_profiles')
+PROFILING_KEEP = config('PROFILING_KEEP', default=100, cast=int)
+
+# Authentication settings
+# Users are resolved from the cache for this long per version (bumped on every user change)
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=300, cast=int)
+# Per-worker copies are trusted without checking the version for this long
+AUTH_USER_CACHE_LOCAL_TTL = config('AUTH_USER_CACHE_LOCAL_TTL', default=5, cast=int)
+
+# User search settings
+# Upper bound on the results of one mention autocomplete or admin search
+USER_SEARCH_MAX_RESULTS = config('USER_SEARCH_MAX_RESULTS', default=10, cast=int)
+
+# Moderation settings
+# How often each worker checks the banned-term list for changes
+MODERATION_TERMS_RECHECK_SECONDS = config('MODERATION_TERMS_RECHECK_SECONDS', default=5, cast=int)
+
+# Post settings
+# Record views through the task queue instead of in the request (needs `manage.py run_worker`)
+POSTS_RECORD_VIEWS_ASYNC = config('POSTS_RECORD_VIEWS_ASYNC', default=False, cast=bool)
+# Lifetime of the cached detail payload of a published post; the counters in it lag by up to this
+# long, except view_count, which is always current
+POST_DETAIL_CACHE_TIMEOUT = config('POST_DETAIL_CACHE_TIMEOUT', default=60, cast=int)
+
+# Comment settings
+# Lifetime of the cached approved thread of a post (invalidated on every change)
+COMMENT_THREAD_CACHE_TIMEOUT = config('COMMENT_THREAD_CACHE_TIMEOUT', default=300, cast=int)
+
+# Reaction settings
+REACTIONS_BATCH_MAX_POSTS = config('REACTIONS_BATCH_MAX_POSTS', default=100, cast=int)
+# 'rows' keeps one Reaction row per emoji; 'bitset' keeps one ReactionSet mask per user and post,
+# which records no per-reaction time, so rollups and dated reaction analytics need 'rows'.
+# Switch with `manage.py migrate_reaction_storage <storage>`.
+REACTIONS_STORAGE = config('REACTIONS_STORAGE', default='rows')
+
+# Background task settings
+# Run tasks inline on enqueue instead of queueing them (no worker needed)
+TASKS_ALWAYS_EAGER = config('TASKS_ALWAYS_EAGER', default=False, cast=bool)
+TASKS_WORKER_THREADS = config('TASKS_WORKER_THREADS', default=4, cast=int)
+TASKS_POLL_SECONDS = config('TASKS_POLL_SECONDS', default=1, cast=float)
+# Failed tasks are retried after TASKS_RETRY_BASE_SECONDS * 2^(attempt - 1), up to the maximum
+TASKS_MAX_ATTEMPTS = config('TASKS_MAX_ATTEMPTS', default=5, cast=int)
+TASKS_RETRY_BASE_SECONDS = config('TASKS_RETRY_BASE_SECONDS', default=10, cast=int)
+TASKS_RETRY_MAX_SECONDS = config('TASKS_RETRY_MAX_SECONDS', default=3600, cast=int)
+# A claimed task still running after this long is assumed lost with its worker and requeued
+TASKS_LEASE_SECONDS = config('TASKS_LEASE_SECONDS', default=600, cast=int)
+TASKS_KEEP_SUCCEEDED_SECONDS = config('TASKS_KEEP_SUCCEEDED_SECONDS', default=86400, cast=int)
+
+# Live event streaming (server-sent events, served by the ASGI app)
+# 'local' delivers within one process; 'postgres' fans out via LISTEN/NOTIFY
+EVENTS_BACKEND = config('EVENTS_BACKEND', default='local')
+EVENTS_HEARTBEAT_SECONDS = config('EVENTS_HEARTBEAT_SECONDS', default=15, cast=int)
+EVENTS_QUEUE_SIZE = config('EVENTS_QUEUE_SIZE', default=100, cast=int)
+
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
@@ -197,6 +447,22 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.FormParser',
         'rest_framework.parsers.MultiPartParser',
     ],
+    # Only actions listed in a view's `throttle_scopes` are throttled
+    'DEFAULT_THROTTLE_CLASSES': [
+        'blog_backend.throttling.ActionRateThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'login_anon': config('THROTTLE_LOGIN_ANON', default='10/min'),
+        'login_user': config('THROTTLE_LOGIN_USER', default='10/min'),
+        'user_search_user': config('THROTTLE_USER_SEARCH_USER', default='120/min'),
+        'register_anon': config('THROTTLE_REGISTER_ANON', default='5/hour'),
+        'register_user': config('THROTTLE_REGISTER_USER', default='5/hour'),
+        'post_view_anon': config('THROTTLE_POST_VIEW_ANON', default='30/min'),
+        'post_view_user': config('THROTTLE_POST_VIEW_USER', default='60/min'),
+        'comment_create_user': config('THROTTLE_COMMENT_CREATE_USER', default='10/min'),
+        'comment_like_user': config('THROTTLE_COMMENT_LIKE_USER', default='60/min'),
+        'reaction_toggle_user': config('THROTTLE_REACTION_TOGGLE_USER', default='60/min'),
+    },
 }
 
 # JWT Settings
@@ -226,8 +492,21 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5),
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
+    # Revocation uses the cache-backed blacklist in users.tokens instead of token_blacklist
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.BlacklistTokenRefreshSerializer',
+    'TOKEN_VERIFY_SERIALIZER': 'users.serializers.BlacklistTokenVerifySerializer',
 }
 
+# Token blacklist settings
+# Expired JTIs are deleted at most this often (cache entries expire with their token)
+TOKEN_BLACKLIST_PURGE_SECONDS = config('TOKEN_BLACKLIST_PURGE_SECONDS', default=3600, cast=int)
+# Per-worker Bloom filter that skips the cache lookup for most access tokens.
+# Revocations from other workers reach it within the sync interval.
+TOKEN_BLACKLIST_BLOOM = config('TOKEN_BLACKLIST_BLOOM', default=False, cast=bool)
+TOKEN_BLACKLIST_BLOOM_CAPACITY = config('TOKEN_BLACKLIST_BLOOM_CAPACITY', default=100000, cast=int)
+TOKEN_BLACKLIST_BLOOM_SYNC_SECONDS = config('TOKEN_BLACKLIST_BLOOM_SYNC_SECONDS', default=5, cast=int)
+TOKEN_BLACKLIST_BLOOM_REBUILD_SECONDS = config('TOKEN_BLACKLIST_BLOOM_REBUILD_SECONDS', default=3600, cast=int)
+
 # Production settings
 if not DEBUG:
     # Security settings
@@ -0,0 +1,836 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from unittest import mock
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.conf import settings
+from django.db import OperationalError, connection, connections, router
+from rest_framework.test import APITestCase
+from rest_framework import status
+from comments.models import Comment, hot_score
+from posts.models import Category, Post, PostView
+from reactions.models import PostReactionSummary, Reaction, ReactionRollup
+from posts.views import PostViewSet
+from .cache import CacheNamespace, cached, local_cache, stats
+from .db import statement_timeout
+from .metrics import metrics
+from .queries import QueryInstrumentationMiddleware, QueryRecorder, normalize_sql
+from .events import MAX_NOTIFY_BYTES, NotifyAssembler, broadcaster, open_listener, post_channel, split_payload
+from .throttling import ActionRateThrottle
+from .routers import PIN_COOKIE, AnalyticsRouter, ReplicaRoutingMiddleware, replica_health
+
+User = get_user_model()
+
+squares = CacheNamespace('tests.squares')
+slow_squares = CacheNamespace('tests.slow-squares', single_flight=True)
+
+def rates(**overrides):
+    """REST_FRAMEWORK settings with the given throttle rates"""
+    rest_framework = dict(settings.REST_FRAMEWORK)
+    rest_framework['DEFAULT_THROTTLE_RATES'] = {
+        **settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'],
+        **overrides,
+    }
+    return rest_framework
+
+class ThrottlingTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_login_is_throttled_per_ip(self):
+        """Test that anonymous login attempts share a per-IP budget"""
+        with override_settings(REST_FRAMEWORK=rates(login_anon='2/min')):
+            for _ in range(2):
+                response = self.client.post('/api/users/login/', {
+                    'username': 'testuser',
+                    'password': 'wrong'
+                }, format='json')
+                self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            
+            response = self.client.post('/api/users/login/', {
+                'username': 'testuser',
+                'password': 'wrong'
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertIn('Retry-After', response)
+            self.assertGreaterEqual(int(response['Retry-After']), 1)
+            
+            # A different client IP has its own budget
+            response = self.client.post('/api/users/login/', {
+                'username': 'testuser',
+                'password': 'wrong'
+            }, format='json', REMOTE_ADDR='10.0.0.2')
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_concurrent_requests_stay_within_limit(self):
+        """Test that requests checked at the same time cannot all pass on the same count"""
+        view = type('View', (), {'throttle_scope': 'login'})()
+        request = type('Request', (), {'user': AnonymousUser(), 'META': {'REMOTE_ADDR': '10.0.0.3'}})()
+        barrier = threading.Barrier(10)
+
+        class SlowCache:
+            """A cache whose calls take long enough for requests to interleave"""
+            def __getattr__(self, name):
+                def call(*args, **kwargs):
+                    time.sleep(0.01)
+                    return getattr(cache, name)(*args, **kwargs)
+                return call
+
+        def check(_):
+            barrier.wait()
+            return ActionRateThrottle().allow_request(request, view)
+
+        with override_settings(REST_FRAMEWORK=rates(login_anon='5/min')), \
+                mock.patch.object(ActionRateThrottle, 'cache', SlowCache()):
+            with ThreadPoolExecutor(max_workers=10) as executor:
+                allowed = list(executor.map(check, range(10)))
+        self.assertEqual(allowed.count(True), 5)
+
+    def test_unscoped_actions_are_not_throttled(self):
+        """Test that actions without a scope are never throttled"""
+        self.client.force_authenticate(user=self.user)
+        with override_settings(REST_FRAMEWORK=rates(login_user='1/min')):
+            for _ in range(3):
+                response = self.client.get('/api/users/me/')
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+class EventStreamTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.post = Post.objects.create(
+            title='Test Post',
+            content='Test content',
+            author=self.user,
+            status='published',
+            published_at=timezone.now()
+        )
+
+    async def test_local_publish_reaches_subscriber(self):
+        """Test that local events are delivered to subscribers of the channel"""
+        subscription = broadcaster.subscribe(post_channel(self.post.id))
+        try:
+            broadcaster.publish_local(post_channel(self.post.id), {'type': 'ping'})
+            event = await asyncio.wait_for(subscription.get(), timeout=1)
+        finally:
+            broadcaster.unsubscribe(subscription)
+        self.assertEqual(event, {'type': 'ping'})
+        self.assertEqual(broadcaster.subscriber_count(post_channel(self.post.id)), 0)
+
+    def test_comment_creation_is_published_on_commit(self):
+        """Test that approved comments are published after the transaction commits"""
+        with mock.patch.object(broadcaster, 'publish_local') as publish_local:
+            with self.captureOnCommitCallbacks(execute=True):
+                comment = Comment.objects.create(
+                    content='Live comment',
+                    author=self.user,
+                    post=self.post,
+                    status='approved'
+                )
+        channel, event = publish_local.call_args.args
+        self.assertEqual(channel, post_channel(self.post.id))
+        self.assertEqual(event['type'], 'comment_created')
+        self.assertEqual(event['comment']['id'], str(comment.id))
+
+    def test_approval_is_published(self):
+        """Test that a pending comment is published once, when it is approved"""
+        comment = Comment.objects.create(content='Held', author=self.user, post=self.post, status='pending')
+        comment = Comment.objects.get(pk=comment.pk)
+        with mock.patch.object(broadcaster, 'publish_local') as publish_local:
+            with self.captureOnCommitCallbacks(execute=True):
+                comment.status = 'approved'
+                comment.save()
+                comment.content = 'Edited'
+                comment.save()
+        self.assertEqual(publish_local.call_count, 1)
+        self.assertEqual(publish_local.call_args.args[1]['comment']['id'], str(comment.id))
+
+    async def test_overflow_sends_resync(self):
+        """Test that a subscriber that falls behind gets a resync event instead of a gapped backlog"""
+        with self.settings(EVENTS_QUEUE_SIZE=2):
+            subscription = broadcaster.subscribe(post_channel(self.post.id))
+        try:
+            for number in range(3):
+                subscription.put({'type': 'ping', 'number': number})
+            self.assertEqual(await subscription.get(), {'type': 'resync'})
+            subscription.put({'type': 'ping', 'number': 3})
+            self.assertEqual(await subscription.get(), {'type': 'ping', 'number': 3})
+        finally:
+            broadcaster.unsubscribe(subscription)
+        self.assertEqual(subscription.dropped, 3)
+
+    def test_long_notify_payloads_are_split(self):
+        """Test that events too long for one NOTIFY are split and joined again"""
+        message = {'channel': 'post:1', 'event': {'type': 'comment_created', 'content': 'x' * 20000}}
+        parts = split_payload(json.dumps(message))
+        self.assertGreater(len(parts), 2)
+        self.assertTrue(all(len(part) < MAX_NOTIFY_BYTES for part in parts))
+
+        assembler = NotifyAssembler()
+        self.assertEqual([assembler.add(part) for part in parts[:-1]], [None] * (len(parts) - 1))
+        self.assertEqual(assembler.add(parts[-1]), message)
+        self.assertEqual(assembler.add(json.dumps({'channel': 'post:1'})), {'channel': 'post:1'})
+
+    def test_listener_connects_with_driver_params(self):
+        """Test that the LISTEN connection gets libpq keywords the configured driver accepts"""
+        from django.db.backends.postgresql.base import DatabaseWrapper
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+        settings_dict = {
+            'ENGINE': 'django.db.backends.postgresql', 'NAME': 'blog', 'USER': 'blog', 'PASSWORD': 'secret',
+            'HOST': 'db.internal', 'PORT': '5432', 'TIME_ZONE': None, 'CONN_MAX_AGE': 0,
+            'CONN_HEALTH_CHECKS': False, 'AUTOCOMMIT': True, 'ATOMIC_REQUESTS': False,
+            'OPTIONS': {
+                'sslmode': 'require',
+                'options': '-c statement_timeout=1000',
+            },
+        }
+        if is_psycopg3:
+            # As settings.py configures DB_POOL_MODE='pool'
+            settings_dict['OPTIONS']['pool'] = {'min_size': 2, 'max_size': 10, 'timeout': 10}
+        # What Django passes its own driver; the psycopg 3 extras are not libpq keywords
+        django_params = DatabaseWrapper(settings_dict, 'default').get_connection_params()
+        self.assertEqual(is_psycopg3, 'context' in django_params)
+
+        with mock.patch.dict(connections['default'].settings_dict, settings_dict):
+            if is_psycopg3:
+                import psycopg
+                with mock.patch.object(psycopg, 'connect') as connect:
+                    open_listener('blog_events')
+                conninfo = connect.call_args.args[0]
+                self.assertEqual(connect.call_args.kwargs, {'autocommit': True})
+                self.assertEqual(psycopg.conninfo.conninfo_to_dict(conninfo), {
+                    'dbname': 'blog', 'user': 'blog', 'password': 'secret', 'host': 'db.internal',
+                    'port': '5432', 'sslmode': 'require', 'options': '-c statement_timeout=1000',
+                })
+                connect.return_value.execute.assert_called_once_with('LISTEN blog_events')
+            else:
+                import psycopg2
+                import psycopg2.extensions
+                with mock.patch.object(psycopg2, 'connect') as connect:
+                    open_listener('blog_events')
+                dsn = psycopg2.extensions.parse_dsn(connect.call_args.args[0])
+                self.assertEqual(dsn['dbname'], 'blog')
+                self.assertEqual(dsn['options'], '-c statement_timeout=1000')
+                self.assertIs(connect.return_value.autocommit, True)
+
+    async def test_stream_endpoint(self):
+        """Test that the stream endpoint opens an event stream"""
+        response = await self.async_client.get(f'/api/posts/{self.post.id}/events/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        first_chunk = await anext(aiter(response.streaming_content))
+        self.assertEqual(first_chunk, b'retry: 5000\n\n')
+        await response.streaming_content.aclose()
+
+
+class DatabaseConnectionTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.post = Post.objects.create(
+            title='Slow analytics',
+            content='Content',
+            author=self.user,
+            status='published',
+            published_at=timezone.now()
+        )
+
+    def test_connection_mode(self):
+        """Test that only persistent mode keeps connections, with health checks"""
+        if settings.DB_POOL_MODE == 'persistent':
+            self.assertGreater(connection.settings_dict['CONN_MAX_AGE'], 0)
+            self.assertTrue(connection.settings_dict['CONN_HEALTH_CHECKS'])
+        else:
+            self.assertEqual(connection.settings_dict['CONN_MAX_AGE'], 0)
+
+    def test_statement_timeout_scopes(self):
+        """Test that only mapped actions get a statement timeout"""
+        view = PostViewSet()
+        view.action = 'analytics'
+        self.assertEqual(view.get_statement_timeout(), settings.DB_STATEMENT_TIMEOUTS['analytics'])
+        view.action = 'list'
+        self.assertIsNone(view.get_statement_timeout())
+        # Not PostgreSQL, so nothing is sent
+        with self.assertNumQueries(0):
+            with statement_timeout(100):
+                pass
+
+    def test_cancelled_query_returns_503(self):
+        """Test that a query cancelled by statement_timeout becomes a 503"""
+        cause = Exception('canceling statement due to statement timeout')
+        cause.pgcode = '57014'
+        error = OperationalError(*cause.args)
+        error.__cause__ = cause
+        self.client.force_authenticate(user=self.user)
+        with mock.patch.object(Post, 'get_recent_views', side_effect=error):
+            response = self.client.get(f'/api/posts/{self.post.id}/analytics/')
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        # psycopg 3 reports the code as sqlstate
+        del cause.pgcode
+        cause.sqlstate = '57014'
+        with mock.patch.object(Post, 'get_recent_views', side_effect=error):
+            response = self.client.get(f'/api/posts/{self.post.id}/analytics/')
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_timeout_reset_after_server_error(self):
+        """Test that the limit is lifted when the view fails with a 500"""
+        exited = []
+
+        @contextmanager
+        def fake_timeout(milliseconds, using):
+            try:
+                yield
+            finally:
+                exited.append(using)
+
+        self.client.force_authenticate(user=self.user)
+        self.client.raise_request_exception = False
+        with mock.patch('blog_backend.db.statement_timeout', fake_timeout), \
+                mock.patch.object(Post, 'get_recent_views', side_effect=RuntimeError):
+            response = self.client.get(f'/api/posts/{self.post.id}/analytics/')
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertIn('default', exited)
+
+
+@override_settings(DB_REPLICA_ALIASES=['replica1'])
+class ReplicaRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        replica_health.reset()
+        self.factory = RequestFactory()
+        self.user = type('User', (), {'is_authenticated': True, 'pk': 1})()
+
+    def route(self, method='get', user=None, cookies=None, write=False, lag=0):
+        """Run a request through the middleware and return where Post and User reads went"""
+        decisions = {}
+
+        def view(request):
+            request.user = user or AnonymousUser()
+            if write:
+                router.db_for_write(PostView)
+            decisions['post'] = router.db_for_read(Post)
+            decisions['user'] = router.db_for_read(User)
+            return HttpResponse(status=201 if method == 'post' else 200)
+
+        request = getattr(self.factory, method)('/api/posts/')
+        request.COOKIES.update(cookies or {})
+        with mock.patch('blog_backend.routers.replica_lag', return_value=lag):
+            response = ReplicaRoutingMiddleware(view)(request)
+        return decisions, response
+
+    def test_safe_reads_use_replica(self):
+        """Test that only listed models are read from the replica"""
+        decisions, _ = self.route()
+        self.assertEqual(decisions, {'post': 'replica1', 'user': 'default'})
+        # Outside a request everything stays on the primary
+        self.assertEqual(router.db_for_read(Post), 'default')
+
+    def test_writes_pin_reads_to_primary(self):
+        """Test read-your-writes stickiness by cookie and by user"""
+        decisions, response = self.route(method='post', user=self.user)
+        self.assertEqual(decisions['post'], 'default')
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        self.assertEqual(self.route(user=self.user)[0]['post'], 'default')
+        self.assertEqual(self.route(cookies={PIN_COOKIE: '1'})[0]['post'], 'default')
+        self.assertEqual(self.route()[0]['post'], 'replica1')
+
+        # A write within a GET request keeps the rest of it on the primary
+        self.assertEqual(self.route(write=True)[0]['post'], 'default')
+
+    def test_lagging_or_down_replica_falls_back(self):
+        """Test that reads fall back to the primary when the replica is unusable"""
+        self.assertEqual(self.route(lag=60)[0]['post'], 'default')
+        replica_health.reset()
+        self.assertEqual(self.route(lag=None)[0]['post'], 'default')
+        replica_health.reset()
+        self.assertEqual(self.route()[0]['post'], 'replica1')
+        replica_health.mark_down('replica1')
+        self.assertEqual(self.route()[0]['post'], 'default')
+
+    def test_statement_timeout_covers_replica(self):
+        """Test that statement timeouts also limit the replica the request reads from"""
+        view = PostViewSet()
+        self.assertEqual(view.get_statement_timeout_aliases(), {'default'})
+        aliases = {}
+
+        def get_response(request):
+            aliases[request.method] = view.get_statement_timeout_aliases()
+            return HttpResponse()
+
+        with mock.patch('blog_backend.routers.replica_lag', return_value=0):
+            ReplicaRoutingMiddleware(get_response)(self.factory.get('/api/posts/'))
+            ReplicaRoutingMiddleware(get_response)(self.factory.post('/api/posts/'))
+        self.assertEqual(aliases, {'GET': {'default', 'replica1'}, 'POST': {'default'}})
+
+    def test_cache_fills_read_primary(self):
+        """Test that values computed for the shared cache are read from the primary"""
+        namespace = CacheNamespace('test_replica_fill')
+        decisions = {}
+
+        def view(request):
+            request.user = AnonymousUser()
+            decisions['fill'] = namespace.get_or_set('key', lambda: router.db_for_read(Post))
+            decisions['post'] = router.db_for_read(Post)
+            return HttpResponse()
+
+        with mock.patch('blog_backend.routers.replica_lag', return_value=0):
+            ReplicaRoutingMiddleware(view)(self.factory.get('/api/posts/'))
+        self.assertEqual(decisions, {'fill': 'default', 'post': 'replica1'})
+
+
+@override_settings(ANALYTICS_DB_ALIAS='analytics')
+class AnalyticsRouterTestCase(SimpleTestCase):
+    def test_event_tables_use_analytics_database(self):
+        """Test that only analytics models are routed and migrated to the analytics database"""
+        analytics = AnalyticsRouter()
+        self.assertEqual(analytics.db_for_read(PostView), 'analytics')
+        self.assertEqual(analytics.db_for_write(ReactionRollup), 'analytics')
+        self.assertIsNone(analytics.db_for_read(Post))
+
+        self.assertTrue(analytics.allow_migrate('analytics', 'posts', 'postview'))
+        self.assertFalse(analytics.allow_migrate('default', 'posts', 'postview'))
+        self.assertFalse(analytics.allow_migrate('analytics', 'posts', 'post'))
+        self.assertFalse(analytics.allow_migrate('analytics', 'users'))
+        self.assertIsNone(analytics.allow_migrate('default', 'posts', 'post'))
+
+    @override_settings(ANALYTICS_DB_ALIAS='default')
+    def test_single_database(self):
+        """Test that without an analytics database nothing is rerouted"""
+        analytics = AnalyticsRouter()
+        self.assertIsNone(analytics.db_for_read(PostView))
+        self.assertTrue(analytics.allow_migrate('default', 'posts', 'postview'))
+
+
+@cached('tests.lengths')
+def cached_length(value):
+    cached_length.calls += 1
+    return len(value)
+
+cached_length.calls = 0
+
+
+class TwoTierCacheTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        stats.reset()
+
+    def tearDown(self):
+        cache.clear()
+        local_cache.clear()
+
+    def test_lookups_go_through_both_tiers(self):
+        """Test that values are computed once, then served from L1, or from L2 in a fresh process"""
+        computed = []
+        def square(value):
+            return squares.get_or_set((value,), lambda: computed.append(value) or value * value)
+
+        self.assertEqual(square(3), 9)
+        self.assertEqual(square(3), 9)
+        local_cache.clear()
+        self.assertEqual(square(3), 9)
+        self.assertEqual(computed, [3])
+        self.assertEqual(stats.snapshot()['tests.squares'], {
+            'l1_hits': 1, 'l2_hits': 1, 'stale_hits': 0, 'coalesced': 0, 'misses': 1, 'hit_ratio': 0.6667
+        })
+
+        values = squares.get_or_set_many([(3,), (4,)], lambda missing: {key: key[0] ** 2 for key in missing})
+        self.assertEqual(values, {(3,): 9, (4,): 16})
+
+    def test_invalidation_bumps_version_stamps(self):
+        """Test that invalidating a scope drops its values only, and that other workers follow within the stamp TTL"""
+        cached_length.calls = 0
+        cached_length('abc')
+        cached_length('de')
+        cached_length.invalidate('abc')
+        self.assertEqual(cached_length('abc'), 3)
+        self.assertEqual(cached_length('de'), 2)
+        self.assertEqual(cached_length.calls, 3)
+
+        cached_length.invalidate()
+        cached_length('de')
+        self.assertEqual(cached_length.calls, 4)
+
+        # Another worker bumps the stamp in the shared cache
+        cache.set('cache:version:tests.lengths:de', 1)
+        cached_length('de')
+        self.assertEqual(cached_length.calls, 4)
+        local_cache.clear()
+        cached_length('de')
+        self.assertEqual(cached_length.calls, 5)
+
+    def test_concurrent_misses_compute_once(self):
+        """Test that workers missing the same single-flight key wait for the one computing it"""
+        calls = []
+        def compute():
+            calls.append(1)
+            time.sleep(0.3)
+            return 49
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(slow_squares.get_or_set((7,), compute)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [49] * 4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(stats.snapshot()['tests.slow-squares']['coalesced'], 3)
+
+    def test_stale_value_is_served_during_recompute(self):
+        """Test that the previous value is served while another worker holds the lock"""
+        slow_squares.get_or_set((5,), lambda: 25)
+        slow_squares.invalidate(5)
+        cache_key = slow_squares.make_keys([(5,)])[(5,)]
+        cache.add(f'{cache_key}:lock', 'another-worker')
+
+        self.assertEqual(slow_squares.get_or_set((5,), lambda: 26), 25)
+        self.assertEqual(stats.snapshot()['tests.slow-squares']['stale_hits'], 1)
+
+        # Without a previous value, waiting gives up and computes
+        slow_squares.invalidate()
+        cache_key = slow_squares.make_keys([(5,)])[(5,)]
+        cache.add(f'{cache_key}:lock', 'another-worker')
+        cache.delete('cache:stale:tests.slow-squares:5')
+        with override_settings(CACHE_LOCK_WAIT_SECONDS=0):
+            self.assertEqual(slow_squares.get_or_set((5,), lambda: 26), 26)
+
+    def test_post_detail_is_cached_with_current_view_count(self):
+        """Test that published post details are served from the cache with live counters"""
+        author = User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+        post = Post.objects.create(
+            title='Published', content='Content', author=author, status='published', published_at=timezone.now()
+        )
+        url = f'/api/posts/{post.id}/'
+        self.client.force_authenticate(author)
+        self.client.get(url)
+
+        self.client.force_authenticate(User.objects.create_user(username='reader', password='testpass123'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        # Only the post lookup and view recording; the counters come from the cache
+        self.assertFalse([query for query in queries if 'COUNT(' in query['sql']])
+        self.assertEqual(response.data['title'], 'Published')
+        self.assertEqual(response.data['view_count'], 2)
+        self.assertEqual(response.data['unique_views_count'], 2)
+
+        # Comments and reactions show up on the next read
+        Comment.objects.create(post=post, author=author, content='First', status='approved')
+        Reaction.objects.create(post=post, user=author, reaction_type='like')
+        response = self.client.get(url)
+        self.assertEqual(response.data['comment_count'], 1)
+        self.assertEqual(response.data['reaction_count'], 1)
+
+        post.title = 'Edited'
+        post.save()
+        self.assertEqual(self.client.get(url).data['title'], 'Edited')
+
+    def test_category_list_is_cached_until_taxonomy_changes(self):
+        """Test that the category list is served without queries until a category or post changes"""
+        author = User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+        category = Category.objects.create(name='Django')
+        self.client.get('/api/categories/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/categories/')
+        self.assertEqual(response.data['results'][0]['post_count'], 0)
+
+        Post.objects.create(
+            title='Published', content='Content', author=author, category=category,
+            status='published', published_at=timezone.now()
+        )
+        response = self.client.get('/api/categories/')
+        self.assertEqual(response.data['results'][0]['post_count'], 1)
+
+    def test_stats_endpoint_is_staff_only(self):
+        """Test that hit and miss counters are exposed to staff"""
+        staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='testpass123', is_staff=True
+        )
+        squares.get_or_set((2,), lambda: 4)
+        response = self.client.get('/api/cache/stats/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.force_authenticate(staff)
+        response = self.client.get('/api/cache/stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['namespaces']['tests.squares']['misses'], 1)
+
+
+class QueryInstrumentationTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.author = User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+        for index in range(3):
+            Post.objects.create(
+                title=f'Post {index}', content='Content', author=self.author,
+                status='published', published_at=timezone.now()
+            )
+
+    def test_normalize_sql(self):
+        """Test that statements differing only in values have the same shape"""
+        self.assertEqual(
+            normalize_sql('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s) AND "n" = 5 LIMIT 21'),
+            normalize_sql('SELECT * FROM "t" WHERE "id" IN (%s, %s)  AND "n" = 7 LIMIT 21')
+        )
+        self.assertEqual(normalize_sql('SAVEPOINT "s1401_x24"'), 'SAVEPOINT "s_x"')
+
+    @override_settings(QUERY_INSTRUMENTATION=True, QUERY_REPEAT_THRESHOLD=2)
+    def test_headers_and_repeated_queries(self):
+        """Test that query counts are reported and per-row queries are logged"""
+        with self.assertLogs('blog_backend.queries', 'WARNING') as logs:
+            response = self.client.get('/api/posts/')
+        self.assertGreater(int(response['X-Query-Count']), 3)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertTrue(any('Possible N+1 in GET /api/posts/' in line for line in logs.output))
+
+    @override_settings(QUERY_INSTRUMENTATION=False, QUERY_SAMPLE_RATE=0)
+    def test_headers_only_for_staff_outside_development(self):
+        """Test that production requests are only instrumented on request, with headers for staff"""
+        response = self.client.get('/api/categories/', HTTP_X_DEBUG_QUERIES='1')
+        self.assertNotIn('X-Query-Count', response)
+
+        # The header is ignored for everyone else, so it cannot be used to load the logs
+        self.client.force_login(self.author)
+        with mock.patch.object(QueryInstrumentationMiddleware, 'report') as report:
+            self.client.get('/api/categories/', HTTP_X_DEBUG_QUERIES='1')
+        report.assert_not_called()
+
+        self.author.is_staff = True
+        self.author.save()
+        self.assertNotIn('X-Query-Count', self.client.get('/api/categories/'))
+        response = self.client.get('/api/categories/', HTTP_X_DEBUG_QUERIES='1')
+        self.assertIn('X-Query-Count', response)
+
+
+class MetricsTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        metrics.reset()
+        self.staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='testpass123', is_staff=True
+        )
+
+    def test_requests_are_recorded_by_action(self):
+        """Test that latency, SQL and size histograms are labelled with the viewset action"""
+        self.client.get('/api/posts/')
+        self.client.get('/api/categories/')
+        self.client.get('/api/categories/')
+
+        with override_settings(METRICS_TOKEN='scrape-token'):
+            response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_count{action="list",method="GET",status="200",view="PostViewSet"} 1',
+            body
+        )
+        self.assertIn('http_request_db_seconds_bucket{action="list",le="+Inf",method="GET",view="CategoryViewSet"} 2', body)
+        self.assertIn('cache_lookups_total{action="list",outcome="l1_hits",view="CategoryViewSet"}', body)
+        self.assertIn('# TYPE tasks_queue_depth gauge', body)
+
+    def test_endpoint_is_internal(self):
+        """Test that the endpoint needs the scrape token or a staff session"""
+        self.assertEqual(self.client.get('/metrics/').status_code, status.HTTP_404_NOT_FOUND)
+        with override_settings(METRICS_TOKEN='scrape-token'):
+            response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer wrong')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get('/metrics/').status_code, status.HTTP_200_OK)
+
+    def test_workers_are_merged_from_metrics_dir(self):
+        """Test that totals written by other workers are added to this one's"""
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            # A running worker, and an exited one whose PID this process has since been given
+            for name, value in ((f'{os.getppid()}-1.json', 2), (f'{os.getpid()}-1.json', 4)):
+                with open(os.path.join(directory, name), 'w') as file:
+                    json.dump({'counters': [['post_view_errors_total', {}, value]], 'histograms': []}, file)
+            metrics.inc('post_view_errors_total')
+            self.client.force_login(self.staff)
+            body = self.client.get('/metrics/').content.decode()
+            self.assertIn('\npost_view_errors_total 7\n', body)
+
+            # The exited worker's totals were folded into exited.json, once
+            files = os.listdir(directory)
+            self.assertIn('exited.json', files)
+            self.assertNotIn(f'{os.getpid()}-1.json', files)
+            self.assertIn(f'{os.getppid()}-1.json', files)
+            body = self.client.get('/metrics/').content.decode()
+            self.assertIn('\npost_view_errors_total 7\n', body)
+
+
+class ProfilingTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings_override = override_settings(PROFILING_DIR=self.directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='testpass123', is_staff=True
+        )
+        self.reader = User.objects.create_user(
+            username='reader', email='reader@example.com', password='testpass123'
+        )
+
+    def test_staff_request_is_profiled(self):
+        """Test that ?profile=1 stores a profile with its SQL timeline"""
+        self.client.force_login(self.staff)
+        response = self.client.get('/api/posts/?profile=1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        profile_id = response['X-Profile-Id']
+
+        response = self.client.get('/api/profiles/')
+        self.assertEqual(response.data['results'], [profile_id])
+        response = self.client.get(f'/api/profiles/{profile_id}/')
+        # The flag is stripped, so the view serves the same query as an unprofiled request
+        self.assertEqual(response.data['path'], '/api/posts/')
+        self.assertGreater(response.data['query_count'], 0)
+        self.assertEqual(len(response.data['queries']), response.data['query_count'])
+        self.assertTrue(response.data['functions'])
+
+        response = self.client.get(f'/api/profiles/{profile_id}/?download=pstats')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get('/api/profiles/..%2Fsecret/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_layers_share_one_execute_wrapper(self):
+        """Test that metrics, instrumentation and profiling of one request record through a single wrapper"""
+        self.client.force_login(self.staff)
+        calls = []
+        record = QueryRecorder.__call__
+
+        def counting(recorder, *args):
+            calls.append(recorder)
+            return record(recorder, *args)
+
+        with mock.patch.object(QueryRecorder, '__call__', counting):
+            response = self.client.get('/api/posts/?profile=1', HTTP_X_DEBUG_QUERIES='1')
+        self.assertEqual(len(set(map(id, calls))), 1)
+        self.assertEqual(len(calls), int(response['X-Query-Count']))
+        profile = self.client.get(f'/api/profiles/{response["X-Profile-Id"]}/').data
+        self.assertEqual(profile['query_count'], len(profile['queries']))
+        self.assertLessEqual(profile['query_count'], len(calls))
+
+    def test_text_report(self):
+        """Test that ?profile=text returns the report instead of the response"""
+        self.client.force_login(self.staff)
+        response = self.client.get('/api/posts/?profile=text')
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertIn('SQL timeline', response.content.decode())
+
+    def test_other_users_are_not_profiled(self):
+        """Test that the flag is ignored for non-staff users and profiles are staff only"""
+        self.client.force_authenticate(self.reader)
+        response = self.client.get('/api/posts/?profile=1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(os.listdir(self.directory.name), [])
+        self.assertEqual(self.client.get('/api/profiles/').status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_concurrent_profiles_are_capped(self):
+        """Test that requests run unprofiled while every slot is taken"""
+        cache.add('profiling:slot:0', 'other', timeout=60)
+        self.client.force_login(self.staff)
+        response = self.client.get('/api/posts/?profile=1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Profile'], 'busy')
+        self.assertNotIn('X-Profile-Id', response)
+
+
+class BenchmarkCommandsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+
+    def seed(self):
+        call_command(
+            'seed_benchmark_data', '--force', '--seed', '1', '--users', '6', '--posts', '12', '--views', '50',
+            '--comments', '40', '--reactions', '30', '--words', '30', '--batch-size', '7', stdout=StringIO()
+        )
+
+    def test_seed_creates_consistent_data(self):
+        """Test that seeded counters and summaries match the rows bulk-created behind them"""
+        self.seed()
+        self.assertEqual(Post.objects.count(), 12)
+        self.assertEqual(sum(Post.objects.values_list('view_count', flat=True)), PostView.objects.count())
+        self.assertEqual(PostView.objects.count(), 50)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertTrue(Comment.objects.filter(parent__parent__isnull=False).exists())
+        # Scores count the approved replies, as Comment.refresh_score does
+        for comment in Comment.objects.all():
+            self.assertAlmostEqual(
+                comment.score,
+                hot_score(comment.likes_count, comment.get_replies().count(), comment.created_at)
+            )
+        self.assertEqual(
+            sum(PostReactionSummary.objects.values_list('count', flat=True)),
+            Reaction.objects.count()
+        )
+        # Timestamps are spread out, and the fields stamp new rows again afterwards
+        self.assertGreater(Post.objects.values('created_at').distinct().count(), 1)
+        self.assertTrue(Post._meta.get_field('created_at').auto_now_add)
+
+    def test_runner_compares_against_baseline(self):
+        """Test that results are saved and that more queries than the baseline fail the run"""
+        self.seed()
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            call_command(
+                'run_benchmarks', '--requests', '2', '--warmup', '0', '--memory-requests', '1',
+                '--only', 'posts.list', '--only', 'comments.for_post', '--output', output, stdout=StringIO()
+            )
+            with open(output) as file:
+                report = json.load(file)
+            self.assertEqual(set(report['results']), {
+                'posts.list', 'posts.list.reactions', 'posts.list.search',
+                'comments.for_post', 'comments.for_post.best', 'comments.for_post.staff',
+            })
+            self.assertEqual(report['results']['posts.list']['errors'], 0)
+            self.assertGreater(report['results']['posts.list']['queries'], 0)
+
+            report['results']['posts.list']['queries'] = 0
+            baseline = os.path.join(directory, 'baseline.json')
+            with open(baseline, 'w') as file:
+                json.dump(report, file)
+            stderr = StringIO()
+            with self.assertRaises(CommandError):
+                call_command(
+                    'run_benchmarks', '--requests', '2', '--warmup', '0', '--memory-requests', '1',
+                    '--only', 'posts.list', '--baseline', baseline, stdout=StringIO(), stderr=stderr
+                )
+            self.assertIn('posts.list: queries regressed', stderr.getvalue())
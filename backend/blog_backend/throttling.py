@@ -0,0 +1,94 @@
+import math
+import time
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+from .utils import get_client_ip
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """Parse a rate such as '10/min' into (requests, seconds)"""
+    if rate is None:
+        return None, None
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+class ActionRateThrottle(BaseThrottle):
+    """
+    Sliding-window throttle with a separate scope per view action.
+
+    Views map actions to scopes with `throttle_scopes`, or set a single
+    `throttle_scope`. Anonymous callers are keyed by client IP and use the
+    '<scope>_anon' rate; authenticated callers are keyed by user ID and use
+    the '<scope>_user' rate. Each check costs one add, one incr and one get,
+    plus a decr when the request is refused. The decision uses the value
+    incr returns, so concurrent requests cannot all pass on the same count.
+    """
+    cache = cache
+    cache_format = 'throttle_%(scope)s_%(ident)s_%(window)s'
+    timer = time.time
+
+    def get_scope(self, view):
+        scopes = getattr(view, 'throttle_scopes', {})
+        scope = scopes.get(getattr(view, 'action', None))
+        return scope or getattr(view, 'throttle_scope', None)
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(view)
+        if scope is None:
+            return True
+
+        if request.user and request.user.is_authenticated:
+            rate_name = f'{scope}_user'
+            ident = request.user.pk
+        else:
+            rate_name = f'{scope}_anon'
+            ident = get_client_ip(request)
+
+        self.num_requests, self.duration = parse_rate(
+            api_settings.DEFAULT_THROTTLE_RATES.get(rate_name)
+        )
+        if self.num_requests is None:
+            return True
+
+        now = self.timer()
+        window = int(now // self.duration)
+        self.elapsed = (now % self.duration) / self.duration
+        current_key = self.cache_format % {'scope': scope, 'ident': ident, 'window': window}
+        previous_key = self.cache_format % {'scope': scope, 'ident': ident, 'window': window - 1}
+
+        # Claim a slot first, then decide from the count that includes it
+        self.cache.add(current_key, 0, timeout=self.duration * 2)
+        try:
+            current = self.cache.incr(current_key)
+        except ValueError:
+            # Evicted between add and incr
+            self.cache.add(current_key, 1, timeout=self.duration * 2)
+            current = 1
+        self.previous = self.cache.get(previous_key, 0)
+        self.current = current - 1
+
+        # Weight the previous window by how much of it still overlaps
+        if self.previous * (1 - self.elapsed) + current > self.num_requests:
+            # Refused requests do not use up the budget
+            try:
+                self.cache.decr(current_key)
+            except ValueError:
+                pass
+            return False
+        return True
+
+    def wait(self):
+        """Seconds until the sliding window admits another request"""
+        if self.current >= self.num_requests:
+            # Wait for the window to roll over, then for its weight to decay
+            needed_elapsed = 1 - self.num_requests / self.current
+            seconds = (1 - self.elapsed + needed_elapsed) * self.duration
+        else:
+            # Wait for the previous window's weight to decay enough
+            needed_elapsed = 1 - (self.num_requests - self.current) / self.previous
+            seconds = (needed_elapsed - self.elapsed) * self.duration
+        return max(1, math.ceil(seconds))
@@ -19,18 +19,25 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
     TokenRefreshView,
     TokenVerifyView,
 )
+from users.views import ThrottledTokenObtainPairView
+from posts.views import post_events
 from .api import urlpatterns as api_urlpatterns
+from .views import CacheStatsView, ProfileDetailView, ProfileListView, metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api-auth/', include('rest_framework.urls')),
+    path('api/posts/<uuid:pk>/events/', post_events, name='post-events'),
+    path('api/cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
+    path('api/profiles/', ProfileListView.as_view(), name='profile-list'),
+    path('api/profiles/<str:profile_id>/', ProfileDetailView.as_view(), name='profile-detail'),
+    path('metrics/', metrics_view, name='metrics'),
     path('api/', include(api_urlpatterns)),
     # JWT Authentication endpoints
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/', ThrottledTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
 ]
@@ -0,0 +1,75 @@
+import os
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .cache import local_cache, stats
+from .metrics import metrics, queue_gauges, render
+from .profiling import list_profiles, load_profile, profile_path
+
+
+class CacheStatsView(APIView):
+    """
+    Two-tier cache counters of the worker that serves the request (staff only).
+
+    Counters are per process; DELETE resets them, e.g. before a load test.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'pid': os.getpid(),
+            'enabled': settings.CACHE_ENABLED,
+            'l2_backend': settings.CACHE_BACKEND,
+            'l1_entries': len(local_cache),
+            'l1_max_entries': local_cache.max_size,
+            'namespaces': stats.snapshot(),
+        })
+
+    def delete(self, request):
+        stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ProfileListView(APIView):
+    """IDs of the stored request profiles, newest first (staff only)"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({'results': list_profiles()})
+
+
+class ProfileDetailView(APIView):
+    """
+    Summary of a stored request profile with its SQL timeline (staff only).
+
+    ?download=pstats returns the raw cProfile dump for pstats or snakeviz.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, profile_id):
+        profile = load_profile(profile_id)
+        if profile is None:
+            return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+        if request.query_params.get('download') == 'pstats':
+            try:
+                dump = open(profile_path(profile_id, '.prof'), 'rb')
+            except FileNotFoundError:
+                return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+            return FileResponse(dump, as_attachment=True, filename=f'{profile_id}.prof')
+        return Response(profile)
+
+
+def metrics_view(request):
+    """Prometheus metrics of every worker, for the METRICS_TOKEN bearer token or staff sessions"""
+    token = settings.METRICS_TOKEN
+    authorized = token and constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}')
+    if not authorized and not request.user.is_staff:
+        # Internal endpoint: do not advertise it
+        raise Http404
+    return HttpResponse(
+        render(metrics.collect(), queue_gauges()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
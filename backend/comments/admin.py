@@ -1,5 +1,7 @@
 from django.contrib import admin
+from users.models import AuthorStats
 from .models import Comment
+from .threads import invalidate_thread
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
@@ -45,20 +47,31 @@ class CommentAdmin(admin.ModelAdmin):
     
     actions = ['approve_comments', 'reject_comments', 'mark_as_spam']
     
+    def _invalidate_threads(self, queryset):
+        """Bulk updates skip signals, so refresh caches, parent scores and author stats explicitly"""
+        for post_id in set(queryset.values_list('post_id', flat=True)):
+            invalidate_thread(post_id)
+        for parent_id in set(queryset.exclude(parent__isnull=True).values_list('parent_id', flat=True)):
+            Comment.refresh_score(parent_id)
+        AuthorStats.reconcile(set(queryset.values_list('post__author_id', flat=True)))
+    
     def approve_comments(self, request, queryset):
         """Approve selected comments"""
         updated = queryset.update(status='approved')
+        self._invalidate_threads(queryset)
         self.message_user(request, f'{updated} comments were successfully approved.')
     approve_comments.short_description = "Approve selected comments"
     
     def reject_comments(self, request, queryset):
         """Reject selected comments"""
         updated = queryset.update(status='rejected')
+        self._invalidate_threads(queryset)
         self.message_user(request, f'{updated} comments were successfully rejected.')
     reject_comments.short_description = "Reject selected comments"
     
     def mark_as_spam(self, request, queryset):
         """Mark selected comments as spam"""
         updated = queryset.update(status='spam')
+        self._invalidate_threads(queryset)
         self.message_user(request, f'{updated} comments were marked as spam.')
     mark_as_spam.short_description = "Mark selected comments as spam"
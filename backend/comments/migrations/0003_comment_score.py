@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:34
+
+import math
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def compute_scores(apps, schema_editor):
+    # Frozen copy of comments.models.hot_score as of this migration
+    epoch = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+    def hot_score(likes_count, reply_count, created_at):
+        order = math.log10(max(likes_count + 2 * reply_count, 1))
+        return round(order + (created_at - epoch).total_seconds() / 45000, 7)
+
+    Comment = apps.get_model('comments', 'Comment')
+    comments = Comment.objects.annotate(
+        approved_replies=Count('replies', filter=Q(replies__status='approved'))
+    ).only('pk', 'likes_count', 'created_at')
+    batch = []
+    for comment in comments.iterator(chunk_size=1000):
+        comment.score = hot_score(comment.likes_count, comment.approved_replies, comment.created_at)
+        batch.append(comment)
+        if len(batch) >= 1000:
+            Comment.objects.bulk_update(batch, ['score'])
+            batch = []
+    Comment.objects.bulk_update(batch, ['score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0002_initial'),
+        ('posts', '0004_alter_postview_unique_together_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='score',
+            field=models.FloatField(default=0, help_text='Time-decayed ranking score for "best" ordering'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('parent__isnull', True)), fields=['post', 'status', '-score'], name='comment_top_level_best_idx'),
+        ),
+        migrations.RunPython(compute_scores, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,26 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from posts.models import Post
+from datetime import datetime, timezone as dt_timezone
+import math
 import uuid
 
 User = get_user_model()
 
+# Ranking constants for the time-decayed "best" score
+SCORE_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+SCORE_DECAY_SECONDS = 45000
+REPLY_WEIGHT = 2
+
+def hot_score(likes_count, reply_count, created_at):
+    """Time-decayed score: 10x the engagement is worth 12.5 hours of recency"""
+    engagement = likes_count + REPLY_WEIGHT * reply_count
+    order = math.log10(max(engagement, 1))
+    age = (created_at - SCORE_EPOCH).total_seconds()
+    return round(order + age / SCORE_DECAY_SECONDS, 7)
+
 class Comment(models.Model):
     """Comment model for blog posts with nested comments support"""
     STATUS_CHOICES = [
@@ -56,6 +71,10 @@ class Comment(models.Model):
     
     # Engagement
     likes_count = models.PositiveIntegerField(default=0)
+    score = models.FloatField(
+        default=0,
+        help_text=_('Time-decayed ranking score for "best" ordering')
+    )
     
     class Meta:
         ordering = ['created_at']
@@ -63,15 +82,30 @@ class Comment(models.Model):
             models.Index(fields=['post', 'status', 'created_at']),
             models.Index(fields=['author', 'created_at']),
             models.Index(fields=['parent', 'created_at']),
+            models.Index(
+                fields=['post', 'status', '-score'],
+                condition=models.Q(parent__isnull=True),
+                name='comment_top_level_best_idx'
+            ),
         ]
     
     def __str__(self):
         return f'Comment by {self.author.username} on {self.post.title}'
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored status, so that signals can tell when a comment becomes approved
+        if 'status' in field_names:
+            instance._loaded_status = values[field_names.index('status')]
+        return instance
+    
     def save(self, *args, **kwargs):
-        # Mark as edited if this is an update
-        if self.pk:
+        # Mark as edited if this is an update (the UUID pk is set before the first save)
+        if not self._state.adding:
             self.is_edited = True
+        else:
+            self.score = hot_score(self.likes_count, 0, timezone.now())
         super().save(*args, **kwargs)
     
     @property
@@ -96,13 +130,25 @@ class Comment(models.Model):
     def increment_likes(self):
         """Increment the likes count"""
         self.likes_count += 1
-        self.save(update_fields=['likes_count'])
+        self.score = hot_score(self.likes_count, self.get_replies().count(), self.created_at)
+        self.save(update_fields=['likes_count', 'score'])
     
     def decrement_likes(self):
         """Decrement the likes count"""
         if self.likes_count > 0:
             self.likes_count -= 1
-            self.save(update_fields=['likes_count'])
+            self.score = hot_score(self.likes_count, self.get_replies().count(), self.created_at)
+            self.save(update_fields=['likes_count', 'score'])
+    
+    @classmethod
+    def refresh_score(cls, comment_id):
+        """Recalculate a comment's score after its replies changed"""
+        comment = cls.objects.filter(pk=comment_id).only('likes_count', 'created_at').first()
+        if comment is None:
+            return
+        score = hot_score(comment.likes_count, comment.get_replies().count(), comment.created_at)
+        # Bypass save() so the comment is not marked as edited
+        cls.objects.filter(pk=comment_id).update(score=score)
     
     def get_ancestors(self):
         """Get all ancestor comments (for nested display)"""
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from moderation.matcher import get_matcher
 from .models import Comment
 
 User = get_user_model()
@@ -11,6 +12,18 @@ class UserMinimalSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'first_name', 'last_name', 'avatar']
 
+class CommentNodeSerializer(serializers.ModelSerializer):
+    """Serializer for a single comment without its replies (used to build cached threads)"""
+    author = UserMinimalSerializer(read_only=True)
+    
+    class Meta:
+        model = Comment
+        fields = [
+            'id', 'content', 'author', 'parent', 'status',
+            'created_at', 'updated_at', 'is_edited', 'likes_count', 'score'
+        ]
+        read_only_fields = fields
+
 class CommentReplySerializer(serializers.ModelSerializer):
     """Serializer for comment replies (nested)"""
     author = UserMinimalSerializer(read_only=True)
@@ -21,10 +34,10 @@ class CommentReplySerializer(serializers.ModelSerializer):
         model = Comment
         fields = [
             'id', 'content', 'author', 'parent', 'status',
-            'created_at', 'updated_at', 'is_edited', 'likes_count',
+            'created_at', 'updated_at', 'is_edited', 'likes_count', 'score',
             'replies', 'reply_count'
         ]
-        read_only_fields = ['author', 'status', 'created_at', 'updated_at', 'likes_count']
+        read_only_fields = ['author', 'status', 'created_at', 'updated_at', 'likes_count', 'score']
     
     def get_replies(self, obj):
         """Get approved replies to this comment"""
@@ -44,10 +57,10 @@ class CommentListSerializer(serializers.ModelSerializer):
         model = Comment
         fields = [
             'id', 'content', 'author', 'parent', 'status',
-            'created_at', 'updated_at', 'is_edited', 'likes_count',
+            'created_at', 'updated_at', 'is_edited', 'likes_count', 'score',
             'replies', 'reply_count'
         ]
-        read_only_fields = ['author', 'status', 'created_at', 'updated_at', 'likes_count']
+        read_only_fields = ['author', 'status', 'created_at', 'updated_at', 'likes_count', 'score']
     
     def get_replies(self, obj):
         """Get approved replies to this comment"""
@@ -67,10 +80,10 @@ class CommentDetailSerializer(serializers.ModelSerializer):
         model = Comment
         fields = [
             'id', 'content', 'author', 'parent', 'status',
-            'created_at', 'updated_at', 'is_edited', 'likes_count',
+            'created_at', 'updated_at', 'is_edited', 'likes_count', 'score',
             'replies', 'reply_count'
         ]
-        read_only_fields = ['author', 'status', 'created_at', 'updated_at', 'likes_count']
+        read_only_fields = ['author', 'status', 'created_at', 'updated_at', 'likes_count', 'score']
     
     def get_replies(self, obj):
         """Get approved replies to this comment"""
@@ -110,6 +123,15 @@ class CommentCreateSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("Parent comment does not exist")
         return value
     
+    def validate(self, attrs):
+        """Block or hold comments containing banned terms"""
+        verdict = get_matcher().verdict(attrs.get('content'))
+        if verdict == 'block':
+            raise serializers.ValidationError({'content': "Comment contains banned terms"})
+        if verdict == 'hold':
+            attrs['status'] = 'pending'
+        return attrs
+    
     def create(self, validated_data):
         parent_id = validated_data.pop('parent_id', None)
         post_id = validated_data.pop('post_id')
@@ -146,6 +168,13 @@ class CommentUpdateSerializer(serializers.ModelSerializer):
         if comment.author != user:
             raise serializers.ValidationError("You can only edit your own comments")
         
+        # Block or hold edits that introduce banned terms
+        verdict = get_matcher().verdict(attrs.get('content'))
+        if verdict == 'block':
+            raise serializers.ValidationError({'content': "Comment contains banned terms"})
+        if verdict == 'hold':
+            attrs['status'] = 'pending'
+        
         return attrs
 
 class CommentModerationSerializer(serializers.ModelSerializer):
@@ -0,0 +1,47 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from blog_backend.events import broadcaster, post_channel
+from posts.cache import post_details
+from .models import Comment
+from .threads import invalidate_thread
+
+@receiver(post_save, sender=Comment)
+def publish_comment_created(sender, instance, created, **kwargs):
+    """Push comments to clients streaming the post when they are created approved or get approved"""
+    previous_status = None if created else getattr(instance, '_loaded_status', 'approved')
+    instance._loaded_status = instance.status
+    if instance.status != 'approved' or previous_status == 'approved':
+        return
+    broadcaster.publish(post_channel(instance.post_id), {
+        'type': 'comment_created',
+        'comment': {
+            'id': str(instance.id),
+            'parent': str(instance.parent_id) if instance.parent_id else None,
+            'author': {
+                'id': str(instance.author_id),
+                'username': instance.author.username,
+            },
+            'content': instance.content,
+            'created_at': instance.created_at.isoformat(),
+        },
+    })
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_cached_thread(sender, instance, **kwargs):
+    """Drop the cached thread when a comment is created, edited, liked, moderated or deleted"""
+    invalidate_thread(instance.post_id)
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_post_detail(sender, instance, created=True, **kwargs):
+    """Drop the cached post detail, whose comment_count changes when a comment is added or deleted"""
+    if created:
+        post_details.invalidate(instance.post_id)
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def refresh_parent_score(sender, instance, **kwargs):
+    """Re-rank the parent comment when its replies change"""
+    if instance.parent_id:
+        Comment.refresh_score(instance.parent_id)
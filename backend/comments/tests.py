@@ -105,3 +105,71 @@ class CommentAPITestCase(APITestCase):
         # Check that comment2 has no replies
         comment2_data = next(c for c in data if c['id'] == str(self.comment2.id))
         self.assertEqual(len(comment2_data['replies']), 0)
+
+    def test_for_post_thread_is_cached(self):
+        """Test that anonymous readers are served the cached thread until a comment changes"""
+        url = f'/api/comments/for_post/?post_id={self.post.id}'
+        first = self.client.get(url)
+        
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.data, second.data)
+        
+        # Liking a comment invalidates the snapshot
+        self.comment2.increment_likes()
+        response = self.client.get(url)
+        comment2_data = next(c for c in response.data if c['id'] == str(self.comment2.id))
+        self.assertEqual(comment2_data['likes_count'], 1)
+
+    def test_for_post_merges_own_pending_comments(self):
+        """Test that authors see their own pending comments merged into the public thread"""
+        other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        pending = Comment.objects.create(
+            content='Pending comment',
+            author=self.user,
+            post=self.post,
+            status='pending'
+        )
+        url = f'/api/comments/for_post/?post_id={self.post.id}'
+        
+        # Anonymous readers only see approved comments
+        response = self.client.get(url)
+        self.assertEqual(len(response.data), 2)
+        
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(url)
+        self.assertEqual([c['id'] for c in response.data][-1], str(pending.id))
+        self.assertEqual(len(response.data), 3)
+        
+        self.client.force_authenticate(user=other_user)
+        response = self.client.get(url)
+        self.assertEqual(len(response.data), 2)
+
+    def test_best_ordering_ranks_by_score(self):
+        """Test that liked comments rank above newer unliked ones with ordering=best"""
+        for _ in range(20):
+            self.comment1.increment_likes()
+        
+        url = f'/api/comments/for_post/?post_id={self.post.id}&ordering=best'
+        response = self.client.get(url)
+        self.assertEqual(response.data[0]['id'], str(self.comment1.id))
+        
+        response = self.client.get(f'/api/comments/?post={self.post.id}&ordering=best')
+        self.assertEqual(response.data['results'][0]['id'], str(self.comment1.id))
+        
+        # Only approved comments are ranked, so the query matches the partial best index
+        Comment.objects.filter(pk=self.comment2.pk).update(status='pending')
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(f'/api/comments/?post={self.post.id}&ordering=best')
+        self.assertEqual([c['id'] for c in response.data['results']], [str(self.comment1.id)])
+
+    def test_new_comments_are_not_marked_edited(self):
+        """Test that only updates mark a comment as edited"""
+        self.assertFalse(self.comment1.is_edited)
+        self.comment1.content = 'Edited'
+        self.comment1.save()
+        self.assertTrue(self.comment1.is_edited)
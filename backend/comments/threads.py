@@ -0,0 +1,67 @@
+from collections import defaultdict
+from django.conf import settings
+from blog_backend.cache import CacheNamespace
+from .models import Comment
+from .serializers import CommentNodeSerializer, CommentListSerializer
+
+# Approved threads by post ID and origin; readers of a post whose thread is being rebuilt
+# get the previous one
+threads = CacheNamespace('comments.thread', single_flight=True)
+
+
+def build_thread(post_id, context):
+    """Serialize the approved comment tree of a post with a single query"""
+    comments = list(
+        Comment.objects.filter(post_id=post_id, status='approved')
+        .select_related('author')
+        .order_by('created_at')
+    )
+    nodes = CommentNodeSerializer(comments, many=True, context=context).data
+
+    children = defaultdict(list)
+    for comment, node in zip(comments, nodes):
+        children[comment.parent_id].append((comment.id, node))
+
+    def attach(parent_id):
+        thread = []
+        for comment_id, node in children.get(parent_id, []):
+            node = dict(node)
+            node['replies'] = attach(comment_id)
+            node['reply_count'] = len(node['replies'])
+            thread.append(node)
+        return thread
+
+    return attach(None)
+
+
+def invalidate_thread(post_id):
+    """Drop the cached thread of a post by bumping its version stamp"""
+    threads.invalidate(post_id)
+
+
+def get_public_thread(post_id, request):
+    """Get the cached approved thread, rebuilding it on a miss"""
+    # Avatar URLs are absolute, so snapshots are kept per scheme and host
+    return threads.get_or_set(
+        (str(post_id), f'{request.scheme}://{request.get_host()}'),
+        lambda: build_thread(post_id, {'request': request}),
+        timeout=getattr(settings, 'COMMENT_THREAD_CACHE_TIMEOUT', 300)
+    )
+
+
+def get_thread_for_user(post_id, request):
+    """Get the public thread merged with the user's own unapproved top-level comments"""
+    thread = get_public_thread(post_id, request)
+    if not request.user.is_authenticated:
+        return thread
+
+    own_comments = Comment.objects.filter(
+        post_id=post_id,
+        parent__isnull=True,
+        author=request.user
+    ).exclude(status='approved').select_related('author')
+    if not own_comments:
+        return thread
+
+    own = CommentListSerializer(own_comments, many=True, context={'request': request}).data
+    return sorted([*thread, *own], key=lambda comment: comment['created_at'])
@@ -4,12 +4,14 @@ from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q
 from .models import Comment
+from .threads import get_thread_for_user
 from .serializers import (
     CommentListSerializer,
     CommentDetailSerializer,
     CommentCreateSerializer,
     CommentUpdateSerializer,
-    CommentModerationSerializer
+    CommentModerationSerializer,
+    CommentReplySerializer
 )
 
 class IsAuthorOrReadOnly(permissions.BasePermission):
@@ -46,15 +48,29 @@ class IsModeratorOrReadOnly(permissions.BasePermission):
         # Write permissions only to the author
         return obj.author == request.user
 
+class CommentOrderingFilter(filters.OrderingFilter):
+    """Ordering filter that also accepts ordering=best (highest score first)"""
+    
+    def filter_queryset(self, request, queryset, view):
+        if request.query_params.get(self.ordering_param) == 'best':
+            # Only approved comments are ranked, which lets comment_top_level_best_idx serve the query
+            return queryset.filter(status='approved').order_by('-score', 'created_at')
+        return super().filter_queryset(request, queryset, view)
+
 class CommentViewSet(viewsets.ModelViewSet):
     """ViewSet for Comment model"""
     queryset = Comment.objects.all()
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsModeratorOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, CommentOrderingFilter]
     filterset_fields = ['status', 'author', 'post', 'parent', 'is_edited']
     search_fields = ['content']
-    ordering_fields = ['created_at', 'updated_at', 'likes_count']
+    ordering_fields = ['created_at', 'updated_at', 'likes_count', 'score']
     ordering = ['created_at']
+    throttle_scopes = {
+        'create': 'comment_create',
+        'like': 'comment_like',
+        'unlike': 'comment_like',
+    }
     
     def get_queryset(self):
         """Filter queryset based on user permissions"""
@@ -185,6 +201,15 @@ class CommentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        best = request.query_params.get('ordering') == 'best'
+        
+        # Everyone except staff is served from the cached approved thread
+        if not request.user.is_staff:
+            thread = get_thread_for_user(post_id, request)
+            if best:
+                thread = sorted(thread, key=lambda comment: comment['score'], reverse=True)
+            return Response(thread)
+        
         # Get top-level comments for the post
         comments = Comment.objects.filter(
             post_id=post_id,
@@ -193,14 +218,8 @@ class CommentViewSet(viewsets.ModelViewSet):
             'replies__author',
             'replies__replies__author'
         )
-        
-        # Apply permission filtering
-        if not request.user.is_authenticated:
-            comments = comments.filter(status='approved')
-        elif not request.user.is_staff:
-            comments = comments.filter(
-                Q(status='approved') | Q(author=request.user)
-            )
+        if best:
+            comments = comments.filter(status='approved').order_by('-score', 'created_at')
         
         serializer = CommentListSerializer(comments, many=True, context={'request': request})
         return Response(serializer.data)
@@ -0,0 +1,26 @@
+from django.contrib import admin
+from .models import BannedTerm
+
+@admin.register(BannedTerm)
+class BannedTermAdmin(admin.ModelAdmin):
+    """Admin interface for BannedTerm model"""
+    list_display = ['term', 'action', 'whole_word', 'is_active', 'updated_at']
+    list_filter = ['action', 'whole_word', 'is_active']
+    search_fields = ['term']
+    readonly_fields = ['created_at', 'updated_at']
+    ordering = ['term']
+    
+    actions = ['activate_terms', 'deactivate_terms']
+    
+    def activate_terms(self, request, queryset):
+        """Activate selected terms"""
+        # The manager's update() moves the version stamp, so workers rebuild their matchers
+        updated = queryset.update(is_active=True)
+        self.message_user(request, f'{updated} terms were activated.')
+    activate_terms.short_description = "Activate selected terms"
+    
+    def deactivate_terms(self, request, queryset):
+        """Deactivate selected terms"""
+        updated = queryset.update(is_active=False)
+        self.message_user(request, f'{updated} terms were deactivated.')
+    deactivate_terms.short_description = "Deactivate selected terms"
@@ -0,0 +1,61 @@
+import random
+import re
+import string
+import time
+from django.core.management.base import BaseCommand
+from moderation.matcher import BannedTermMatcher
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the banned-term automaton against a regex-per-term loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--terms', type=int, default=5000, help='Number of banned terms')
+        parser.add_argument('--words', type=int, default=1000, help='Words in the scanned text')
+        parser.add_argument('--hits', type=int, default=10, help='Banned terms planted in the text')
+        parser.add_argument('--repeat', type=int, default=20, help='Scans per approach')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        def word(min_length=3, max_length=10):
+            length = rng.randint(min_length, max_length)
+            return ''.join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+        terms = list({word(4, 12) for _ in range(options['terms'])})
+        words = [word() for _ in range(options['words'])]
+        for position in rng.sample(range(len(words)), min(options['hits'], len(words))):
+            words[position] = rng.choice(terms)
+        text = ' '.join(words)
+
+        # Naive approach: one compiled word-boundary regex per term
+        start = time.perf_counter()
+        regexes = [re.compile(r'\b' + re.escape(term) + r'\b') for term in terms]
+        naive_build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(options['repeat']):
+            naive_found = {term for term, regex in zip(terms, regexes) if regex.search(text)}
+        naive_scan = (time.perf_counter() - start) / options['repeat']
+
+        start = time.perf_counter()
+        matcher = BannedTermMatcher(
+            {'term': term, 'action': 'hold', 'whole_word': True} for term in terms
+        )
+        automaton_build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(options['repeat']):
+            automaton_found = {term['term'] for term in matcher.find(text)}
+        automaton_scan = (time.perf_counter() - start) / options['repeat']
+
+        if naive_found != automaton_found:
+            self.stderr.write(self.style.ERROR('Matchers disagree on the result set'))
+
+        self.stdout.write(f'Terms: {len(terms)}, text length: {len(text)} chars, matches: {len(automaton_found)}')
+        self.stdout.write(f'{"approach":<12}{"build (ms)":>12}{"scan (ms)":>12}')
+        self.stdout.write(f'{"regex loop":<12}{naive_build * 1000:>12.2f}{naive_scan * 1000:>12.3f}')
+        self.stdout.write(f'{"automaton":<12}{automaton_build * 1000:>12.2f}{automaton_scan * 1000:>12.3f}')
+        if automaton_scan:
+            self.stdout.write(self.style.SUCCESS(f'Speedup per scan: {naive_scan / automaton_scan:.1f}x'))
@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import deque
+from django.conf import settings
+
+
+class AhoCorasick:
+    """Multi-pattern matcher that scans text in a single linear pass"""
+
+    def __init__(self, patterns):
+        # Node 0 is the root; each node maps a character to a child node
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._patterns = []
+
+        for pattern in patterns:
+            self._add(pattern)
+        self._build_failure_links()
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def _add(self, pattern):
+        if not pattern:
+            return
+        node = 0
+        for char in pattern:
+            child = self._goto[node].get(char)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][char] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = child
+        self._output[node].append(len(self._patterns))
+        self._patterns.append(pattern)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                # Inherit matches that end at the failure target
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def iter_matches(self, text):
+        """Yield (start, end, pattern_index) for every occurrence in text"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        patterns = self._patterns
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for index in output[node]:
+                end = position + 1
+                yield end - len(patterns[index]), end, index
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+class BannedTermMatcher:
+    """Compiled banned-term list with per-term action and boundary rules"""
+
+    def __init__(self, terms=()):
+        terms = list(terms)
+        self._terms = terms
+        self._automaton = AhoCorasick(term['term'] for term in terms)
+
+    def __len__(self):
+        return len(self._terms)
+
+    def find(self, text):
+        """Get the banned terms found in text"""
+        if not text or not self._terms:
+            return []
+
+        text = text.lower()
+        found = {}
+        for start, end, index in self._automaton.iter_matches(text):
+            term = self._terms[index]
+            if term['term'] in found:
+                continue
+            if term['whole_word']:
+                if start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                if end < len(text) and _is_word_char(text[end]):
+                    continue
+            found[term['term']] = term
+        return list(found.values())
+
+    def verdict(self, text):
+        """Get 'block', 'hold' or None for the given text"""
+        actions = {term['action'] for term in self.find(text)}
+        if 'block' in actions:
+            return 'block'
+        if 'hold' in actions:
+            return 'hold'
+        return None
+
+
+_lock = threading.Lock()
+_matcher = None
+_version = None
+_checked_at = 0.0
+
+
+def get_matcher():
+    """Get the per-worker matcher, rebuilding it when the term list changes"""
+    global _matcher, _version, _checked_at
+    from .models import BannedTerm
+
+    recheck_seconds = getattr(settings, 'MODERATION_TERMS_RECHECK_SECONDS', 5)
+    now = time.monotonic()
+    if _matcher is not None and now - _checked_at < recheck_seconds:
+        return _matcher
+
+    with _lock:
+        if _matcher is not None and now - _checked_at < recheck_seconds:
+            return _matcher
+
+        version = BannedTerm.get_version()
+        if _matcher is None or version != _version:
+            terms = BannedTerm.objects.filter(is_active=True).values('term', 'action', 'whole_word')
+            _matcher = BannedTermMatcher(terms)
+            _version = version
+        _checked_at = now
+        return _matcher
+
+
+def reset_matcher():
+    """Drop the cached matcher so the next call rebuilds it"""
+    global _matcher, _version, _checked_at
+    with _lock:
+        _matcher = None
+        _version = None
+        _checked_at = 0.0
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:28
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BannedTerm',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('term', models.CharField(max_length=100, unique=True)),
+                ('action', models.CharField(choices=[('hold', 'Hold for moderation'), ('block', 'Block')], default='hold', max_length=10)),
+                ('whole_word', models.BooleanField(default=True, help_text='Only match the term on word boundaries')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['term'],
+                'indexes': [models.Index(fields=['is_active', 'term'], name='moderation__is_acti_6d0c09_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,85 @@
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+import uuid
+
+class BannedTermQuerySet(models.QuerySet):
+    """Bulk writes skip save() and signals, so they move the updated_at stamp themselves"""
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.term = obj.normalize(obj.term)
+        return super().bulk_create(objs, *args, **kwargs)
+    
+    def update(self, **kwargs):
+        kwargs.setdefault('updated_at', timezone.now())
+        return super().update(**kwargs)
+    
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs = list(objs)
+        now = timezone.now()
+        for obj in objs:
+            obj.updated_at = now
+        return super().bulk_update(objs, {*fields, 'updated_at'}, batch_size=batch_size)
+
+class BannedTerm(models.Model):
+    """Term that blocks or holds posts and comments containing it"""
+    ACTION_CHOICES = [
+        ('hold', _('Hold for moderation')),
+        ('block', _('Block')),
+    ]
+    
+    # Primary key
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    # Matching
+    term = models.CharField(max_length=100, unique=True)
+    action = models.CharField(
+        max_length=10,
+        choices=ACTION_CHOICES,
+        default='hold'
+    )
+    whole_word = models.BooleanField(
+        default=True,
+        help_text=_('Only match the term on word boundaries')
+    )
+    is_active = models.BooleanField(default=True)
+    
+    # Timestamps (updated_at is part of the version stamp of get_version)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = BannedTermQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['term']
+        indexes = [
+            models.Index(fields=['is_active', 'term']),
+        ]
+    
+    def __str__(self):
+        return self.term
+    
+    @staticmethod
+    def normalize(term):
+        # Terms are matched case-insensitively
+        return term.strip().lower()
+    
+    def save(self, *args, **kwargs):
+        self.term = self.normalize(self.term)
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def get_version(cls):
+        """
+        Get a stamp that changes whenever a term is added, edited or deleted.
+        
+        save() and bulk_create() set updated_at, and the manager's update()
+        and bulk_update() set it too, so every write path moves the stamp.
+        """
+        stamp = cls.objects.aggregate(
+            total=models.Count('id'),
+            last_change=models.Max('updated_at')
+        )
+        return (stamp['total'], stamp['last_change'])
@@ -0,0 +1,132 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.utils import timezone
+from posts.models import Post
+from comments.models import Comment
+from .matcher import AhoCorasick, BannedTermMatcher, get_matcher, reset_matcher
+from .models import BannedTerm
+
+User = get_user_model()
+
+class AhoCorasickTestCase(TestCase):
+    def test_overlapping_patterns(self):
+        """Test that overlapping and nested patterns are all reported"""
+        automaton = AhoCorasick(['he', 'she', 'his', 'hers'])
+        matches = {
+            (start, end) for start, end, _ in automaton.iter_matches('ushers')
+        }
+        self.assertEqual(matches, {(1, 4), (2, 4), (2, 6)})
+
+    def test_whole_word_matching(self):
+        """Test that whole-word terms ignore matches inside other words"""
+        matcher = BannedTermMatcher([
+            {'term': 'ass', 'action': 'hold', 'whole_word': True},
+            {'term': 'spam', 'action': 'block', 'whole_word': False},
+        ])
+        self.assertIsNone(matcher.verdict('A classic assessment'))
+        self.assertEqual(matcher.verdict('What an ASS.'), 'hold')
+        self.assertEqual(matcher.verdict('Buy spammy pills'), 'block')
+
+    def test_block_wins_over_hold(self):
+        """Test that a blocking term overrides a holding one"""
+        matcher = BannedTermMatcher([
+            {'term': 'foo', 'action': 'hold', 'whole_word': True},
+            {'term': 'bar', 'action': 'block', 'whole_word': True},
+        ])
+        self.assertEqual(matcher.verdict('foo and bar'), 'block')
+
+@override_settings(MODERATION_TERMS_RECHECK_SECONDS=0)
+class BannedTermAPITestCase(APITestCase):
+    def setUp(self):
+        reset_matcher()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.post = Post.objects.create(
+            title='Test Post',
+            content='Test content',
+            author=self.user,
+            status='published',
+            published_at=timezone.now()
+        )
+        BannedTerm.objects.create(term='Badword', action='hold')
+        BannedTerm.objects.create(term='worseword', action='block')
+        self.client.force_authenticate(user=self.user)
+
+    def test_matcher_rebuilds_on_change(self):
+        """Test that the matcher picks up new terms through the version stamp"""
+        self.assertIsNone(get_matcher().verdict('a newword here'))
+        BannedTerm.objects.create(term='newword', action='block')
+        self.assertEqual(get_matcher().verdict('a newword here'), 'block')
+
+    def test_bulk_writes_move_the_version(self):
+        """Test that writes skipping save() and signals still rebuild the matcher"""
+        get_matcher()
+        BannedTerm.objects.filter(term='badword').update(action='block')
+        self.assertEqual(get_matcher().verdict('a badword here'), 'block')
+        
+        BannedTerm.objects.bulk_create([BannedTerm(term=' BulkWord ', action='hold')])
+        self.assertEqual(get_matcher().verdict('a bulkword here'), 'hold')
+        
+        terms = list(BannedTerm.objects.filter(term='bulkword'))
+        terms[0].is_active = False
+        BannedTerm.objects.bulk_update(terms, ['is_active'])
+        self.assertIsNone(get_matcher().verdict('a bulkword here'))
+
+    def test_comment_with_held_term_is_pending(self):
+        """Test that comments with held terms go to moderation"""
+        response = self.client.post('/api/comments/', {
+            'content': 'This has a badword in it',
+            'post_id': str(self.post.id)
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Comment.objects.get().status, 'pending')
+
+    def test_comment_with_blocked_term_is_rejected(self):
+        """Test that comments with blocked terms are refused"""
+        response = self.client.post('/api/comments/', {
+            'content': 'This has a worseword in it',
+            'post_id': str(self.post.id)
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_post_with_held_term_stays_draft(self):
+        """Test that posts with held terms are kept as drafts"""
+        response = self.client.post('/api/posts/', {
+            'title': 'Another post',
+            'content': 'Some badword content',
+            'status': 'published'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        post = Post.objects.get(title='Another post')
+        self.assertEqual(post.status, 'draft')
+        self.assertTrue(post.is_held)
+        self.assertEqual(post.held_reason, 'Contains held terms: badword')
+
+    def test_held_post_waits_for_staff(self):
+        """Test that only staff can publish a held post, which clears the hold"""
+        self.client.post('/api/posts/', {
+            'title': 'Held post',
+            'content': 'Some badword content'
+        }, format='json')
+        post = Post.objects.get(title='Held post')
+
+        response = self.client.post(f'/api/posts/{post.id}/publish/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get('/api/posts/held/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        staff = User.objects.create_user(username='staff', email='staff@example.com', password='testpass123', is_staff=True)
+        self.client.force_authenticate(user=staff)
+        response = self.client.get('/api/posts/held/')
+        self.assertEqual([item['id'] for item in response.data], [str(post.id)])
+        response = self.client.post(f'/api/posts/{post.id}/publish/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        post.refresh_from_db()
+        self.assertEqual(post.status, 'published')
+        self.assertFalse(post.is_held)
@@ -1,6 +1,9 @@
 from django.contrib import admin
+from django.contrib.auth import get_user_model
 from .models import Post, Category, Tag, PostView
 
+User = get_user_model()
+
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     """Admin interface for Category model"""
@@ -32,10 +35,10 @@ class PostAdmin(admin.ModelAdmin):
     """Admin interface for Post model"""
     list_display = [
         'title', 'author', 'status', 'category', 'created_at',
-        'published_at', 'view_count', 'is_featured'
+        'published_at', 'view_count', 'is_featured', 'is_held'
     ]
     list_filter = [
-        'status', 'is_featured', 'created_at', 'published_at',
+        'status', 'is_featured', 'is_held', 'created_at', 'published_at',
         'category', 'tags'
     ]
     search_fields = ['title', 'content', 'excerpt', 'author__username']
@@ -51,6 +54,9 @@ class PostAdmin(admin.ModelAdmin):
         ('Author & Status', {
             'fields': ('author', 'status', 'published_at', 'scheduled_at')
         }),
+        ('Moderation', {
+            'fields': ('is_held', 'held_reason')
+        }),
         ('Organization', {
             'fields': ('category', 'tags', 'is_featured')
         }),
@@ -80,15 +86,16 @@ class PostAdmin(admin.ModelAdmin):
 @admin.register(PostView)
 class PostViewAdmin(admin.ModelAdmin):
     """Admin interface for PostView model"""
-    list_display = ['post', 'user', 'ip_address', 'viewed_at']
-    list_filter = ['viewed_at', 'post__status']
-    search_fields = ['post__title', 'user__username', 'ip_address']
+    list_display = ['post_title', 'username', 'ip_address', 'viewed_at']
+    list_filter = ['viewed_at']
+    search_fields = ['ip_address', 'session_key']
+    search_help_text = 'Post title, IP address or session key'
     date_hierarchy = 'viewed_at'
     ordering = ['-viewed_at']
     
     fieldsets = (
         ('View Information', {
-            'fields': ('post', 'user', 'session_key', 'ip_address', 'user_agent')
+            'fields': ('post_id', 'user_id', 'session_key', 'ip_address', 'user_agent')
         }),
         ('Timing', {
             'fields': ('viewed_at',)
@@ -97,5 +104,32 @@ class PostViewAdmin(admin.ModelAdmin):
     
     readonly_fields = ['viewed_at']
     
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related('post', 'user')
+    def get_changelist_instance(self, request):
+        # Views live in the analytics database, so posts and users are fetched per page instead of joined
+        changelist = super().get_changelist_instance(request)
+        views = changelist.result_list
+        posts = Post.objects.in_bulk({view.post_id for view in views})
+        users = User.objects.in_bulk({view.user_id for view in views if view.user_id})
+        for view in views:
+            view._post = posts.get(view.post_id)
+            view._user = users.get(view.user_id)
+        return changelist
+    
+    def get_search_results(self, request, queryset, search_term):
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            post_ids = Post.objects.filter(title__icontains=search_term).values_list('id', flat=True)[:1000]
+            queryset |= self.get_queryset(request).filter(post_id__in=list(post_ids))
+        return queryset, may_have_duplicates
+    
+    def post_title(self, obj):
+        post = getattr(obj, '_post', None) or Post.objects.filter(id=obj.post_id).first()
+        return post.title if post else obj.post_id
+    post_title.short_description = 'Post'
+    
+    def username(self, obj):
+        if not obj.user_id:
+            return 'Anonymous'
+        user = getattr(obj, '_user', None) or User.objects.filter(id=obj.user_id).first()
+        return user.username if user else obj.user_id
+    username.short_description = 'User'
@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+from blog_backend.cache import CacheNamespace, cached_model, cached_queryset, invalidate_on_change
+from reactions.models import PostReactionSummary
+from .models import Category, Post, Tag
+from .serializers import PostDetailSerializer, reaction_total
+
+# Post counts change with any post or tag link, the names with any category or tag
+TAXONOMY_MODELS = (Category, Tag, Post, Post.tags.through)
+# Authors are left out: last_login saves would drop the lists on every login, so author
+# names and avatars in them may lag by up to CACHE_DEFAULT_TIMEOUT
+POST_LIST_MODELS = (Post, Post.tags.through, Category, Tag)
+
+
+@cached_model(Post)
+def get_post(pk):
+    """
+    Load a post by ID, or None if it does not exist.
+
+    view_count is updated in place without a save, so the cached copy lags
+    behind it; use it where the counters do not matter.
+    """
+    return Post.objects.filter(pk=pk).first()
+
+
+@cached_queryset('posts.featured', depends_on=POST_LIST_MODELS)
+def featured_posts():
+    # Scheduled posts show up once a post changes or the entry expires
+    return Post.objects.filter(
+        is_featured=True,
+        status='published',
+        published_at__lte=timezone.now()
+    ).select_related('author', 'category').prefetch_related('tags')
+
+
+@cached_queryset('posts.categories', depends_on=TAXONOMY_MODELS)
+def category_list():
+    return Category.objects.annotate(post_count=Count('posts', filter=Q(posts__status='published')))
+
+
+@cached_queryset('posts.tags', depends_on=TAXONOMY_MODELS)
+def tag_list():
+    return Tag.objects.annotate(post_count=Count('posts', filter=Q(posts__status='published')))
+
+
+# Serialized detail of published posts by post ID and origin (avatar URLs are absolute).
+# Comments drop their post's entry (comments.signals); view and reaction counts are overlaid live
+post_details = CacheNamespace('posts.detail', single_flight=True)
+invalidate_on_change(post_details, Post, scope=lambda post: post.pk)
+for model in (Category, Tag, Post.tags.through):
+    invalidate_on_change(post_details, model)
+
+
+def get_post_detail(post, request):
+    """
+    Get the PostDetailSerializer payload of a published post.
+
+    It is the same for every reader, so one worker builds it on a miss while
+    the others serve the previous payload. The counters that change with every
+    view or reaction are overlaid fresh: view_count and unique_views_count
+    from post and reaction_count from the maintained reaction summaries.
+    """
+    data = post_details.get_or_set(
+        (str(post.pk), f'{request.scheme}://{request.get_host()}'),
+        lambda: dict(PostDetailSerializer(post, context={'request': request}).data),
+        timeout=settings.POST_DETAIL_CACHE_TIMEOUT
+    )
+    return {
+        **data,
+        'view_count': post.view_count,
+        # view_count only grows when a PostView is stored, so it is the unique view count without a COUNT
+        'unique_views_count': post.view_count,
+        'reaction_count': reaction_total(PostReactionSummary.get_counts(post.pk)),
+    }
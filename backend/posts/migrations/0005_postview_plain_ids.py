@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models, router
+
+
+def create_on_analytics_database(apps, schema_editor):
+    """Create the table where it is first migrated in its new shape (a separate analytics database)"""
+    PostView = apps.get_model('posts', 'PostView')
+    connection = schema_editor.connection
+    if not router.allow_migrate_model(connection.alias, PostView):
+        return
+    if PostView._meta.db_table not in connection.introspection.table_names():
+        schema_editor.create_model(PostView)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_alter_postview_unique_together_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Drop the foreign key constraints; the post_id and user_id columns and their indexes stay
+        migrations.AlterField(
+            model_name='postview',
+            name='post',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='views', to='posts.post'),
+        ),
+        migrations.AlterField(
+            model_name='postview',
+            name='user',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        # Same columns, indexes and constraints, now described by plain UUID fields
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveConstraint(
+                    model_name='postview',
+                    name='unique_post_user_view',
+                ),
+                migrations.RemoveConstraint(
+                    model_name='postview',
+                    name='unique_post_session_view',
+                ),
+                migrations.RemoveIndex(
+                    model_name='postview',
+                    name='posts_postv_post_id_0d76ce_idx',
+                ),
+                migrations.RemoveIndex(
+                    model_name='postview',
+                    name='posts_postv_user_id_ed2718_idx',
+                ),
+                migrations.RemoveField(
+                    model_name='postview',
+                    name='post',
+                ),
+                migrations.RemoveField(
+                    model_name='postview',
+                    name='user',
+                ),
+                migrations.AddField(
+                    model_name='postview',
+                    name='post_id',
+                    field=models.UUIDField(db_index=True),
+                ),
+                migrations.AddField(
+                    model_name='postview',
+                    name='user_id',
+                    field=models.UUIDField(blank=True, db_index=True, null=True),
+                ),
+                migrations.AddIndex(
+                    model_name='postview',
+                    index=models.Index(fields=['post_id', 'viewed_at'], name='posts_postv_post_id_0d76ce_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='postview',
+                    index=models.Index(fields=['user_id', 'viewed_at'], name='posts_postv_user_id_ed2718_idx'),
+                ),
+                migrations.AddConstraint(
+                    model_name='postview',
+                    constraint=models.UniqueConstraint(condition=models.Q(('user_id__isnull', False)), fields=('post_id', 'user_id'), name='unique_post_user_view'),
+                ),
+                migrations.AddConstraint(
+                    model_name='postview',
+                    constraint=models.UniqueConstraint(condition=models.Q(('session_key__isnull', False)), fields=('post_id', 'session_key'), name='unique_post_session_view'),
+                ),
+            ],
+        ),
+        migrations.RunPython(
+            create_on_analytics_database,
+            migrations.RunPython.noop,
+            hints={'model_name': 'postview'}
+        ),
+    ]
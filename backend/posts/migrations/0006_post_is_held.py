@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_postview_plain_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='held_reason',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='is_held',
+            field=models.BooleanField(default=False, help_text='Held by a banned term; only staff can publish it'),
+        ),
+    ]
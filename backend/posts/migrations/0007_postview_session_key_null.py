@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_post_is_held'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='postview',
+            name='session_key',
+            field=models.CharField(blank=True, max_length=40, null=True),
+        ),
+    ]
@@ -1,12 +1,19 @@
-from django.db import models
+from django.conf import settings
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import F
 from django.contrib.auth import get_user_model
 from django.utils.text import slugify
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
+from blog_backend.metrics import metrics
+from blog_backend.utils import get_client_ip
+import logging
 import uuid
 import re
 
+logger = logging.getLogger(__name__)
+
 User = get_user_model()
 
 class Category(models.Model):
@@ -50,10 +57,13 @@ class Tag(models.Model):
 
 class PostView(models.Model):
     """Model for tracking post views with session and user tracking"""
+    # Lives in the analytics database (ANALYTICS_DB_ALIAS), so the post and
+    # user are plain IDs rather than foreign keys into the content database
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    post = models.ForeignKey('Post', on_delete=models.CASCADE, related_name='views')
-    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
-    session_key = models.CharField(max_length=40, blank=True)
+    post_id = models.UUIDField(db_index=True)
+    user_id = models.UUIDField(null=True, blank=True, db_index=True)
+    # Null for sessionless (e.g. JWT) requests, which the session constraint leaves out
+    session_key = models.CharField(max_length=40, null=True, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
     viewed_at = models.DateTimeField(auto_now_add=True)
@@ -61,26 +71,39 @@ class PostView(models.Model):
     class Meta:
         ordering = ['-viewed_at']
         indexes = [
-            models.Index(fields=['post', 'viewed_at']),
-            models.Index(fields=['user', 'viewed_at']),
+            models.Index(fields=['post_id', 'viewed_at']),
+            models.Index(fields=['user_id', 'viewed_at']),
             models.Index(fields=['session_key', 'viewed_at']),
         ]
         # Prevent duplicate views from same user/session
         constraints = [
             models.UniqueConstraint(
-                fields=['post', 'user'],
-                condition=models.Q(user__isnull=False),
+                fields=['post_id', 'user_id'],
+                condition=models.Q(user_id__isnull=False),
                 name='unique_post_user_view'
             ),
             models.UniqueConstraint(
-                fields=['post', 'session_key'],
+                fields=['post_id', 'session_key'],
                 condition=models.Q(session_key__isnull=False),
                 name='unique_post_session_view'
             ),
         ]
     
     def __str__(self):
-        return f"View of {self.post.title} at {self.viewed_at}"
+        return f"View of post {self.post_id} at {self.viewed_at}"
+
+class PostQuerySet(models.QuerySet):
+    
+    def visible_to(self, user):
+        """Posts the user may read: published ones, plus their own; staff see every post"""
+        if user is None or not user.is_authenticated:
+            return self.filter(status='published', published_at__lte=timezone.now())
+        if user.is_staff:
+            return self
+        return self.filter(
+            models.Q(status='published', published_at__lte=timezone.now()) |
+            models.Q(author=user)
+        )
 
 class Post(models.Model):
     """Post model for blog posts"""
@@ -157,6 +180,15 @@ class Post(models.Model):
     view_count = models.PositiveIntegerField(default=0)
     is_featured = models.BooleanField(default=False)
     
+    # Moderation
+    is_held = models.BooleanField(
+        default=False,
+        help_text=_('Held by a banned term; only staff can publish it')
+    )
+    held_reason = models.CharField(max_length=255, blank=True)
+    
+    objects = PostQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -187,69 +219,77 @@ class Post(models.Model):
     def get_absolute_url(self):
         return reverse('post-detail', kwargs={'slug': self.slug})
     
-    def increment_view_count(self):
+    def increment_view_count(self, views=1):
         """Increment the view count"""
-        self.view_count += 1
-        self.save(update_fields=['view_count'])
+        from users.models import AuthorStats
+        # Atomic in the database, so concurrent views are not lost
+        Post.objects.filter(pk=self.pk).update(view_count=F('view_count') + views)
+        self.view_count += views
+        AuthorStats.apply_deltas(self.author_id, total_views=views)
     
     def record_view(self, request):
         """Record a view with session and user tracking"""
+        # Get user and session info
+        details = {
+            'user_id': request.user.pk if request.user.is_authenticated else None,
+            'session_key': request.session.session_key if hasattr(request, 'session') else None,
+            'ip_address': self._get_client_ip(request),
+            'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+        }
+        if settings.POSTS_RECORD_VIEWS_ASYNC:
+            from .tasks import record_views
+            record_views.enqueue(post_id=self.id, **details)
+            return
+        
+        if self.store_view(**details):
+            self.increment_view_count()
+            logger.debug("View recorded for post %s: %s total views", self.id, self.view_count)
+    
+    def store_view(self, user_id, session_key, ip_address, user_agent):
+        """Store a PostView unless the user or session already has one; returns whether the view counts"""
         try:
-            # Get user and session info
-            user = request.user if request.user.is_authenticated else None
-            session_key = request.session.session_key if hasattr(request, 'session') else None
-            ip_address = self._get_client_ip(request)
-            user_agent = request.META.get('HTTP_USER_AGENT', '')
-            
-            # Check if view already exists for this user/session
-            existing_view = None
-            if user:
-                existing_view = PostView.objects.filter(post=self, user=user).first()
-            elif session_key:
-                existing_view = PostView.objects.filter(post=self, session_key=session_key).first()
-            
-            # Only create new view if it doesn't exist
-            if not existing_view:
+            with transaction.atomic(using=router.db_for_write(PostView)):
+                # Check if view already exists for this user/session
+                existing_view = None
+                if user_id:
+                    existing_view = PostView.objects.filter(post_id=self.id, user_id=user_id).first()
+                elif session_key:
+                    existing_view = PostView.objects.filter(post_id=self.id, session_key=session_key).first()
+                
+                if existing_view:
+                    logger.debug("View already exists for post %s", self.id)
+                    return False
+                
                 PostView.objects.create(
-                    post=self,
-                    user=user,
+                    post_id=self.id,
+                    user_id=user_id,
                     session_key=session_key,
                     ip_address=ip_address,
                     user_agent=user_agent
                 )
-                
-                # Increment view count
-                self.increment_view_count()
-                print(f"View recorded for post {self.id}: {self.view_count} total views")
-            else:
-                print(f"View already exists for post {self.id}")
-            
-        except Exception as e:
-            # Log error but don't break the request
-            print(f"Error recording view for post {self.id}: {e}")
-            # Still increment view count even if detailed tracking fails
-            try:
-                self.increment_view_count()
-            except:
-                pass
+            return True
+        except IntegrityError:
+            # A concurrent first view of the same user or session stored its row first
+            logger.debug("View already exists for post %s", self.id)
+            return False
+        except Exception:
+            # Log error but don't break the request; the view still counts even if detailed tracking fails
+            logger.exception("Error recording view for post %s", self.id)
+            metrics.inc('post_view_errors_total')
+            return True
     
     def _get_client_ip(self, request):
         """Get client IP address from request"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        return get_client_ip(request)
     
     def get_unique_views_count(self):
         """Get count of unique views (by user or session)"""
-        return self.views.count()
+        return PostView.objects.filter(post_id=self.id).count()
     
     def get_recent_views(self, days=7):
         """Get views from the last N days"""
         cutoff_date = timezone.now() - timezone.timedelta(days=days)
-        return self.views.filter(viewed_at__gte=cutoff_date)
+        return PostView.objects.filter(post_id=self.id, viewed_at__gte=cutoff_date)
     
     @property
     def is_published(self):
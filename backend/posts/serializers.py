@@ -1,9 +1,26 @@
 from rest_framework import serializers
+from django.db import models
 from django.contrib.auth import get_user_model
+from moderation.matcher import get_matcher
+from reactions.models import PostReactionSummary
 from .models import Post, Category, Tag
 
 User = get_user_model()
 
+def apply_banned_terms(attrs, instance=None):
+    """Block posts containing banned terms and hold others as drafts for moderators"""
+    title = attrs.get('title', instance.title if instance else '')
+    content = attrs.get('content', instance.content if instance else '')
+    terms = get_matcher().find(f'{title}\n{content}')
+    if any(term['action'] == 'block' for term in terms):
+        raise serializers.ValidationError({'content': "Post contains banned terms"})
+    held = sorted(term['term'] for term in terms if term['action'] == 'hold')
+    attrs['is_held'] = bool(held)
+    attrs['held_reason'] = f"Contains held terms: {', '.join(held)}"[:255] if held else ''
+    if held:
+        attrs['status'] = 'draft'
+    return attrs
+
 class CategorySerializer(serializers.ModelSerializer):
     """Serializer for Category model"""
     post_count = serializers.SerializerMethodField()
@@ -14,6 +31,9 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['slug', 'created_at']
     
     def get_post_count(self, obj):
+        # Category and tag lists annotate the count
+        if hasattr(obj, 'post_count'):
+            return obj.post_count
         return obj.posts.filter(status='published').count()
 
 class TagSerializer(serializers.ModelSerializer):
@@ -26,6 +46,9 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['slug', 'created_at']
     
     def get_post_count(self, obj):
+        # Category and tag lists annotate the count
+        if hasattr(obj, 'post_count'):
+            return obj.post_count
         return obj.posts.filter(status='published').count()
 
 class UserMinimalSerializer(serializers.ModelSerializer):
@@ -35,6 +58,18 @@ class UserMinimalSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'first_name', 'last_name', 'avatar']
 
+def reaction_total(counts):
+    return sum(count['count'] for count in counts)
+
+class PostListBatchSerializer(serializers.ListSerializer):
+    """Look up the reaction totals of every post in the list with one cache or summary read"""
+    
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        counts = PostReactionSummary.get_counts_many([post.id for post in posts])
+        self.child.reaction_totals = {post_id: reaction_total(post_counts) for post_id, post_counts in counts.items()}
+        return super().to_representation(posts)
+
 class PostListSerializer(serializers.ModelSerializer):
     """Serializer for listing posts (minimal info)"""
     author = UserMinimalSerializer(read_only=True)
@@ -43,6 +78,7 @@ class PostListSerializer(serializers.ModelSerializer):
     comment_count = serializers.SerializerMethodField()
     reaction_count = serializers.SerializerMethodField()
     unique_views_count = serializers.SerializerMethodField()
+    reaction_summary = serializers.SerializerMethodField()
     
     class Meta:
         model = Post
@@ -50,15 +86,29 @@ class PostListSerializer(serializers.ModelSerializer):
             'id', 'title', 'slug', 'excerpt', 'author', 'category',
             'tags', 'featured_image', 'status', 'published_at',
             'created_at', 'view_count', 'unique_views_count', 'is_featured', 
-            'reading_time', 'comment_count', 'reaction_count'
+            'reading_time', 'comment_count', 'reaction_count', 'reaction_summary'
         ]
         read_only_fields = ['slug', 'created_at', 'published_at', 'view_count', 'unique_views_count']
+        list_serializer_class = PostListBatchSerializer
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Reaction summaries are only embedded when the view batch-loaded them
+        if 'reaction_summaries' not in self.context:
+            self.fields.pop('reaction_summary')
+    
+    def get_reaction_summary(self, obj):
+        return self.context['reaction_summaries'].get(str(obj.id))
     
     def get_comment_count(self, obj):
         return obj.comments.count()
     
     def get_reaction_count(self, obj):
-        return obj.reactions.count()
+        # Totals come from the maintained summaries, which every reaction storage keeps
+        totals = getattr(self, 'reaction_totals', None)
+        if totals is not None:
+            return totals[str(obj.id)]
+        return reaction_total(PostReactionSummary.get_counts(obj.id))
     
     def get_unique_views_count(self, obj):
         return obj.get_unique_views_count()
@@ -82,18 +132,20 @@ class PostDetailSerializer(serializers.ModelSerializer):
             'meta_title', 'meta_description', 'published_at',
             'scheduled_at', 'created_at', 'updated_at', 'view_count',
             'unique_views_count', 'is_featured', 'reading_time', 
-            'word_count', 'character_count', 'comment_count', 'reaction_count'
+            'word_count', 'character_count', 'comment_count', 'reaction_count',
+            'is_held', 'held_reason'
         ]
         read_only_fields = [
             'slug', 'created_at', 'updated_at', 'published_at',
-            'view_count', 'unique_views_count', 'comment_count', 'reaction_count'
+            'view_count', 'unique_views_count', 'comment_count', 'reaction_count',
+            'is_held', 'held_reason'
         ]
     
     def get_comment_count(self, obj):
         return obj.comments.count()
     
     def get_reaction_count(self, obj):
-        return obj.reactions.count()
+        return reaction_total(PostReactionSummary.get_counts(obj.id))
     
     def get_unique_views_count(self, obj):
         return obj.get_unique_views_count()
@@ -121,6 +173,9 @@ class PostCreateSerializer(serializers.ModelSerializer):
             'scheduled_at'
         ]
     
+    def validate(self, attrs):
+        return apply_banned_terms(attrs)
+    
     def create(self, validated_data):
         category_id = validated_data.pop('category_id', None)
         tag_ids = validated_data.pop('tag_ids', [])
@@ -163,6 +218,9 @@ class PostUpdateSerializer(serializers.ModelSerializer):
             'scheduled_at'
         ]
     
+    def validate(self, attrs):
+        return apply_banned_terms(attrs, self.instance)
+    
     def update(self, instance, validated_data):
         category_id = validated_data.pop('category_id', None)
         tag_ids = validated_data.pop('tag_ids', None)
@@ -0,0 +1,16 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .models import Post, PostView
+
+User = get_user_model()
+
+# Post views live in the analytics database, out of reach of foreign key cascades
+
+@receiver(post_delete, sender=Post)
+def delete_post_views(sender, instance, **kwargs):
+    PostView.objects.filter(post_id=instance.id).delete()
+
+@receiver(post_delete, sender=User)
+def forget_viewer(sender, instance, **kwargs):
+    PostView.objects.filter(user_id=instance.pk).update(user_id=None)
@@ -0,0 +1,19 @@
+from collections import Counter
+from tasks.queue import task
+from .models import Post, PostView
+
+
+# The views and the counters may live in different databases; a retried batch must not find
+# its views stored but uncounted
+@task(name='posts.record_views', batch_size=200, write_models=[PostView])
+def record_views(payloads):
+    """Store queued post views, then add them to each post's counter with one update"""
+    posts = {str(pk): post for pk, post in Post.objects.in_bulk({p['post_id'] for p in payloads}).items()}
+    counted = Counter()
+    for payload in payloads:
+        details = dict(payload)
+        post = posts.get(details.pop('post_id'))
+        if post is not None and post.store_view(**details):
+            counted[post.pk] += 1
+    for pk, views in counted.items():
+        posts[str(pk)].increment_view_count(views)
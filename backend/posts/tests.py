@@ -1,3 +1,4 @@
+from unittest import mock
 from django.test import TestCase, RequestFactory
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
@@ -70,7 +71,7 @@ class PostViewTrackingTestCase(APITestCase):
         self.assertEqual(self.post.view_count, initial_count + 1)
         
         # Check that PostView was created
-        self.assertTrue(PostView.objects.filter(post=self.post).exists())
+        self.assertTrue(PostView.objects.filter(post_id=self.post.id).exists())
         
         # Check unique views count
         self.assertEqual(self.post.get_unique_views_count(), 1)
@@ -93,6 +94,36 @@ class PostViewTrackingTestCase(APITestCase):
         self.post.refresh_from_db()
         self.assertEqual(self.post.view_count, initial_count)
 
+    def test_racing_first_views_count_once(self):
+        """Test that a view losing the race to the unique constraint is not counted or reported as an error"""
+        self.assertTrue(self.post.store_view(self.user.pk, 'test_session', '127.0.0.1', 'Test Browser'))
+        
+        # The other request's row is committed after this one checked for it
+        queryset = mock.MagicMock()
+        queryset.first.return_value = None
+        with mock.patch.object(PostView.objects, 'filter', return_value=queryset), \
+                mock.patch('posts.models.metrics.inc') as inc:
+            self.assertFalse(self.post.store_view(self.user.pk, 'test_session', '127.0.0.1', 'Test Browser'))
+        inc.assert_not_called()
+        self.assertEqual(PostView.objects.filter(post_id=self.post.id).count(), 1)
+    
+    def test_sessionless_views_are_stored(self):
+        """Test that views without a session, like JWT requests, are stored and counted once per user"""
+        self.assertTrue(self.post.store_view(self.user.pk, None, '127.0.0.1', 'Test Browser'))
+        self.assertFalse(self.post.store_view(self.user.pk, None, '127.0.0.1', 'Test Browser'))
+        self.assertTrue(self.post.store_view(None, None, '127.0.0.1', 'Test Browser'))
+        self.assertEqual(PostView.objects.filter(post_id=self.post.id, session_key__isnull=True).count(), 2)
+    
+    def test_views_removed_with_post(self):
+        """Test that views, which hold plain IDs, go away with their post and forget deleted users"""
+        viewer = User.objects.create_user(username='viewer', email='viewer@example.com', password='testpass123')
+        self.post.store_view(viewer.pk, 'viewer_session', '127.0.0.1', 'Test Browser')
+        viewer.delete()
+        self.assertIsNone(PostView.objects.get(post_id=self.post.id).user_id)
+
+        self.post.delete()
+        self.assertFalse(PostView.objects.exists())
+
     def test_automatic_view_recording_on_retrieve(self):
         """Test that views are automatically recorded when retrieving published posts"""
         url = f'/api/posts/{self.post.id}/'
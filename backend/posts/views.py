@@ -1,10 +1,19 @@
+import asyncio
+import json
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import Http404, StreamingHttpResponse
 from rest_framework import viewsets, status, permissions, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q, Count
 from django.utils import timezone
-from .models import Post, Category, Tag
+from blog_backend.db import StatementTimeoutMixin
+from blog_backend.events import broadcaster, post_channel
+from reactions.models import PostReactionSummary
+from .cache import category_list, featured_posts, get_post_detail, tag_list
+from .models import Post, Category, Tag, PostView
 from .serializers import (
     PostListSerializer,
     PostDetailSerializer,
@@ -14,6 +23,8 @@ from .serializers import (
     TagSerializer
 )
 
+User = get_user_model()
+
 class IsAuthorOrReadOnly(permissions.BasePermission):
     """Custom permission to only allow authors to edit their posts"""
     
@@ -25,7 +36,7 @@ class IsAuthorOrReadOnly(permissions.BasePermission):
         # Write permissions only to the author
         return obj.author == request.user
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(StatementTimeoutMixin, viewsets.ModelViewSet):
     """ViewSet for Post model"""
     queryset = Post.objects.all()
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
@@ -34,23 +45,20 @@ class PostViewSet(viewsets.ModelViewSet):
     search_fields = ['title', 'content', 'excerpt']
     ordering_fields = ['created_at', 'updated_at', 'published_at', 'view_count']
     ordering = ['-created_at']
+    throttle_scopes = {
+        'increment_view': 'post_view',
+    }
+    statement_timeout_scopes = {
+        'analytics': 'analytics',
+        'debug_views': 'analytics',
+    }
     
     def get_queryset(self):
         """Filter queryset based on user permissions"""
         queryset = Post.objects.select_related('author', 'category').prefetch_related('tags')
         
-        # If user is not authenticated, only show published posts
-        if not self.request.user.is_authenticated:
-            return queryset.filter(status='published', published_at__lte=timezone.now())
-        
-        # If user is authenticated, show their own posts + published posts
-        if self.request.user.is_staff:
-            return queryset  # Staff can see all posts
-        else:
-            return queryset.filter(
-                Q(status='published', published_at__lte=timezone.now()) |
-                Q(author=self.request.user)
-            )
+        # Anonymous users see published posts, authors also their own, staff every post
+        return queryset.visible_to(self.request.user)
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -65,7 +73,25 @@ class PostViewSet(viewsets.ModelViewSet):
         """Set the author when creating a post"""
         serializer.save(author=self.request.user)
     
-    @action(detail=True, methods=['post'])
+    def list(self, request, *args, **kwargs):
+        """List posts, embedding reaction summaries with ?include=reactions"""
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        posts = page if page is not None else list(queryset)
+        
+        context = self.get_serializer_context()
+        if 'reactions' in request.query_params.get('include', '').split(','):
+            context['reaction_summaries'] = PostReactionSummary.summarize_many(
+                [post.id for post in posts],
+                request.user
+            )
+        
+        serializer = self.get_serializer(posts, many=True, context=context)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def publish(self, request, pk=None):
         """Publish a draft post"""
         post = self.get_object()
@@ -82,8 +108,17 @@ class PostViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Posts held by a banned term wait for a moderator
+        if post.is_held and not request.user.is_staff:
+            return Response(
+                {'error': 'Post is held for moderation', 'reason': post.held_reason},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
         post.status = 'published'
         post.published_at = timezone.now()
+        post.is_held = False
+        post.held_reason = ''
         post.save()
         
         serializer = PostDetailSerializer(post, context={'request': request})
@@ -93,11 +128,13 @@ class PostViewSet(viewsets.ModelViewSet):
         """Override retrieve to automatically record views for published posts"""
         post = self.get_object()
         
-        # Record view for published posts
+        # Record view for published posts, which every reader sees the same and are served from the cache
         if post.is_published:
             post.record_view(request)
+            return Response(get_post_detail(post, request))
         
-        return super().retrieve(request, *args, **kwargs)
+        serializer = self.get_serializer(post)
+        return Response(serializer.data)
     
     @action(detail=True, methods=['post'])
     def increment_view(self, request, pk=None):
@@ -113,7 +150,11 @@ class PostViewSet(viewsets.ModelViewSet):
     def debug_views(self, request, pk=None):
         """Debug endpoint to check view recording"""
         post = self.get_object()
-        views = post.views.all()
+        views = PostView.objects.filter(post_id=post.id)
+        recent = list(views[:10])  # Show first 10 views
+        usernames = dict(
+            User.objects.filter(id__in={view.user_id for view in recent if view.user_id}).values_list('id', 'username')
+        )
         return Response({
             'post_id': str(post.id),
             'post_title': post.title,
@@ -122,12 +163,12 @@ class PostViewSet(viewsets.ModelViewSet):
             'views': [
                 {
                     'id': str(view.id),
-                    'user': view.user.username if view.user else 'Anonymous',
+                    'user': usernames.get(view.user_id, 'Anonymous'),
                     'session_key': view.session_key,
                     'ip_address': view.ip_address,
                     'viewed_at': view.viewed_at
                 }
-                for view in views[:10]  # Show first 10 views
+                for view in recent
             ]
         })
     
@@ -154,7 +195,8 @@ class PostViewSet(viewsets.ModelViewSet):
         from datetime import timedelta
         
         thirty_days_ago = timezone.now() - timedelta(days=30)
-        daily_views = post.views.filter(
+        daily_views = PostView.objects.filter(
+            post_id=post.id,
             viewed_at__gte=thirty_days_ago
         ).extra(
             select={'day': 'date(viewed_at)'}
@@ -187,6 +229,13 @@ class PostViewSet(viewsets.ModelViewSet):
         serializer = PostListSerializer(posts, many=True, context={'request': request})
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def held(self, request):
+        """Get posts held by banned terms for moderation (admin only)"""
+        posts = self.get_queryset().filter(is_held=True)
+        serializer = PostListSerializer(posts, many=True, context={'request': request})
+        return Response(serializer.data)
+    
     @action(detail=False, methods=['get'])
     def drafts(self, request):
         """Get current user's draft posts"""
@@ -206,20 +255,32 @@ class PostViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def featured(self, request):
         """Get featured posts"""
-        posts = self.get_queryset().filter(
-            is_featured=True,
-            status='published',
-            published_at__lte=timezone.now()
-        )
-        serializer = PostListSerializer(posts, many=True, context={'request': request})
+        serializer = PostListSerializer(featured_posts(), many=True, context={'request': request})
         return Response(serializer.data)
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CachedListMixin:
+    """Serve unfiltered, unordered lists from `cached_list()` (blog_backend.cache)"""
+    cached_list = None
+    
+    def list(self, request, *args, **kwargs):
+        page_param = getattr(self.paginator, 'page_query_param', None)
+        if set(request.query_params) - {page_param}:
+            return super().list(request, *args, **kwargs)
+        
+        objects = self.cached_list()
+        page = self.paginate_queryset(objects)
+        serializer = self.get_serializer(page if page is not None else objects, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+class CategoryViewSet(CachedListMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for Category model (read-only)"""
     queryset = Category.objects.annotate(post_count=Count('posts', filter=Q(posts__status='published')))
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
     lookup_field = 'slug'
+    cached_list = staticmethod(category_list)
     
     @action(detail=True, methods=['get'])
     def posts(self, request, slug=None):
@@ -234,12 +295,13 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = PostListSerializer(posts, many=True, context={'request': request})
         return Response(serializer.data)
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CachedListMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for Tag model (read-only)"""
     queryset = Tag.objects.annotate(post_count=Count('posts', filter=Q(posts__status='published')))
     serializer_class = TagSerializer
     permission_classes = [permissions.AllowAny]
     lookup_field = 'slug'
+    cached_list = staticmethod(tag_list)
     
     @action(detail=True, methods=['get'])
     def posts(self, request, slug=None):
@@ -253,3 +315,30 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
         
         serializer = PostListSerializer(posts, many=True, context={'request': request})
         return Response(serializer.data)
+
+async def post_events(request, pk):
+    """Stream new comments and reaction count changes for a post (SSE, ASGI only)"""
+    if not await Post.objects.filter(pk=pk, status='published').aexists():
+        raise Http404('Post not found')
+    
+    heartbeat = getattr(settings, 'EVENTS_HEARTBEAT_SECONDS', 15)
+    
+    async def stream():
+        subscription = broadcaster.subscribe(post_channel(pk))
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    # Comment lines keep proxies from closing idle connections
+                    yield ': keepalive\n\n'
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            broadcaster.unsubscribe(subscription)
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
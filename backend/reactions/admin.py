@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Reaction
+from .models import Reaction, ReactionSet, PostReactionSummary, ReactionRollup
 
 @admin.register(Reaction)
 class ReactionAdmin(admin.ModelAdmin):
@@ -40,3 +40,56 @@ class ReactionAdmin(admin.ModelAdmin):
     def has_add_permission(self, request):
         """Disable adding reactions from admin"""
         return False
+
+@admin.register(PostReactionSummary)
+class PostReactionSummaryAdmin(admin.ModelAdmin):
+    """Read-only admin for maintained reaction counts"""
+    list_display = ['post', 'reaction_type', 'count', 'updated_at']
+    list_filter = ['reaction_type']
+    search_fields = ['post__title']
+    ordering = ['-count']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('post')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(ReactionSet)
+class ReactionSetAdmin(admin.ModelAdmin):
+    """Read-only admin for bitset reaction storage"""
+    list_display = ['user', 'post', 'reaction_list', 'updated_at']
+    search_fields = ['user__username', 'post__title']
+    ordering = ['-updated_at']
+    
+    def reaction_list(self, obj):
+        """Show the emojis set in the mask"""
+        emojis = dict(Reaction.REACTION_CHOICES)
+        return ' '.join(emojis[reaction_type] for reaction_type in obj.reaction_types)
+    reaction_list.short_description = 'Reactions'
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'post')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(ReactionRollup)
+class ReactionRollupAdmin(admin.ModelAdmin):
+    """Read-only admin for hourly reaction rollups"""
+    list_display = ['bucket', 'reaction_type', 'count']
+    list_filter = ['reaction_type']
+    date_hierarchy = 'bucket'
+    ordering = ['-bucket']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
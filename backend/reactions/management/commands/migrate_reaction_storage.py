@@ -0,0 +1,97 @@
+from collections import Counter, defaultdict
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from reactions.models import Reaction, ReactionSet
+from reactions.signals import record_reaction_change
+from reactions.storage import STORAGES
+
+
+class Command(BaseCommand):
+    help = 'Move reactions between row storage and bitset storage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', choices=sorted(STORAGES), help='Storage to move reactions into')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        target = options['target']
+        batch_size = options['batch_size']
+        if target == 'bitset':
+            source, move = Reaction, self.rows_to_bitset
+        else:
+            source, move = ReactionSet, self.bitset_to_rows
+
+        # Each batch locks a primary key range of the source, copies it and deletes exactly
+        # those rows, so nothing written while the command runs is lost. Rows created behind
+        # the cursor are picked up by another pass
+        moved = 0
+        while source.objects.exists():
+            last_pk = None
+            while True:
+                with transaction.atomic():
+                    rows = source.objects.select_for_update().order_by('pk')
+                    if last_pk is not None:
+                        rows = rows.filter(pk__gt=last_pk)
+                    rows = list(rows[:batch_size])
+                    if not rows:
+                        break
+                    added = move(rows)
+                    # The ORM delete sends post_delete, which takes the moved reactions off
+                    # the summaries and author stats; putting them back keeps both exact
+                    source.objects.filter(pk__in=[row.pk for row in rows]).delete()
+                    for (post_id, reaction_type), count in added.items():
+                        record_reaction_change(post_id, reaction_type, count)
+                moved += sum(added.values())
+                last_pk = rows[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {moved} reactions to {target} storage; set REACTIONS_STORAGE={target}'
+        ))
+
+    def rows_to_bitset(self, rows):
+        """Merge reaction rows into reaction sets; returns the reactions added per (post, type)"""
+        masks = defaultdict(int)
+        for row in rows:
+            masks[(row.user_id, row.post_id)] |= ReactionSet.bit(row.reaction_type)
+
+        existing = {
+            (reaction_set.user_id, reaction_set.post_id): reaction_set
+            for reaction_set in ReactionSet.objects.select_for_update().filter(
+                user_id__in={user_id for user_id, _ in masks},
+                post_id__in={post_id for _, post_id in masks}
+            )
+        }
+
+        added = Counter()
+        updated, created = [], []
+        for key, mask in masks.items():
+            reaction_set = existing.get(key)
+            if reaction_set is None:
+                reaction_set = ReactionSet(user_id=key[0], post_id=key[1], mask=0)
+                created.append(reaction_set)
+            else:
+                updated.append(reaction_set)
+            for reaction_type in ReactionSet.decode(mask & ~reaction_set.mask):
+                added[(key[1], reaction_type)] += 1
+            reaction_set.mask |= mask
+        ReactionSet.objects.bulk_create(created)
+        ReactionSet.objects.bulk_update(updated, ['mask'])
+        return added
+
+    def bitset_to_rows(self, reaction_sets):
+        """Expand reaction sets into rows; returns the reactions added per (post, type)"""
+        existing = set(Reaction.objects.filter(
+            user_id__in={reaction_set.user_id for reaction_set in reaction_sets},
+            post_id__in={reaction_set.post_id for reaction_set in reaction_sets}
+        ).values_list('user_id', 'post_id', 'reaction_type'))
+
+        added = Counter()
+        batch = []
+        for reaction_set in reaction_sets:
+            for reaction_type in reaction_set.reaction_types:
+                if (reaction_set.user_id, reaction_set.post_id, reaction_type) in existing:
+                    continue
+                batch.append(Reaction(user_id=reaction_set.user_id, post_id=reaction_set.post_id, reaction_type=reaction_type))
+                added[(reaction_set.post_id, reaction_type)] += 1
+        Reaction.objects.bulk_create(batch)
+        return added
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from reactions.models import PostReactionSummary
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-post reaction summaries from the reaction rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('post_ids', nargs='*', help='Only rebuild these posts')
+
+    def handle(self, *args, **options):
+        post_ids = options['post_ids'] or None
+        PostReactionSummary.rebuild(post_ids)
+        scope = f'{len(post_ids)} posts' if post_ids else 'all posts'
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt reaction summaries for {scope}'))
@@ -0,0 +1,31 @@
+from datetime import timedelta
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from reactions.models import ReactionRollup
+
+
+class Command(BaseCommand):
+    help = 'Refresh the hourly reaction rollups read by the analytics endpoints (run periodically)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=int, default=48,
+            help='Refresh this many recent hours; older buckets only change when reactions are removed'
+        )
+        parser.add_argument('--all', action='store_true', help='Rebuild every bucket')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            start = None
+            scope = 'all hours'
+        else:
+            now = timezone.now().replace(minute=0, second=0, microsecond=0)
+            start = now - timedelta(hours=options['hours'] - 1)
+            scope = f"the last {options['hours']} hours"
+
+        try:
+            created = ReactionRollup.refresh(start=start)
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'Refreshed reaction rollups for {scope} ({created} buckets)'))
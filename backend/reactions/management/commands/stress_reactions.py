@@ -0,0 +1,130 @@
+import random
+import threading
+import time
+from collections import Counter
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, IntegrityError, OperationalError
+from django.utils import timezone
+from posts.models import Post
+from reactions.models import Reaction, PostReactionSummary
+from reactions.storage import get_storage, STORAGES
+
+User = get_user_model()
+
+OPERATIONS = ['toggle', 'add', 'remove']
+
+
+class Command(BaseCommand):
+    help = 'Hammer one post with concurrent reaction writes and check that the counts stay consistent'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--iterations', type=int, default=200, help='Writes per thread')
+        parser.add_argument('--users', type=int, default=2, help='Users shared by the threads, to provoke double clicks')
+        parser.add_argument('--types', type=int, default=3, help='Number of reaction types to use')
+        parser.add_argument('--operation', choices=OPERATIONS + ['mixed'], default='mixed')
+        parser.add_argument('--storage', choices=sorted(STORAGES))
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--keep', action='store_true', help='Keep the stress post, its reactions and the users it created')
+
+    def handle(self, *args, **options):
+        storage = get_storage(options['storage'])
+        rng = random.Random(options['seed'])
+        users, created_user_ids = [], []
+        post = None
+        try:
+            for i in range(options['users']):
+                user, created = User.objects.get_or_create(
+                    username=f'stress_user_{i}',
+                    defaults={'email': f'stress_user_{i}@example.com'}
+                )
+                users.append(user)
+                if created:
+                    created_user_ids.append(user.pk)
+            post = Post.objects.create(
+                title=f'Reaction stress {timezone.now():%Y-%m-%d %H:%M:%S}',
+                content='Reaction stress test post',
+                author=users[0],
+                status='published',
+                published_at=timezone.now()
+            )
+            consistent = self.stress(storage, rng, users, post, options)
+        finally:
+            # Runs on errors and interrupts too, so no stress rows are left behind
+            if not options['keep']:
+                self.cleanup(post, created_user_ids)
+
+        if not consistent:
+            raise CommandError('Reaction counts are inconsistent')
+        self.stdout.write(self.style.SUCCESS('Reaction counts are consistent'))
+
+    def stress(self, storage, rng, users, post, options):
+        """Run the concurrent writes and report them; returns whether the counts are consistent"""
+        reaction_types = list(Reaction.REACTION_CODES)[:options['types']]
+        operations = OPERATIONS if options['operation'] == 'mixed' else [options['operation']]
+        plans = [
+            [
+                (rng.choice(users), rng.choice(operations), rng.choice(reaction_types))
+                for _ in range(options['iterations'])
+            ]
+            for _ in range(options['threads'])
+        ]
+
+        results = Counter()
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(len(plans))
+
+        def worker(plan):
+            local = Counter()
+            start_barrier.wait()
+            try:
+                for user, operation, reaction_type in plan:
+                    self.run_write(storage, operation, user, post, reaction_type, local)
+            finally:
+                connection.close()
+                with lock:
+                    results.update(local)
+
+        threads = [threading.Thread(target=worker, args=(plan,)) for plan in plans]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        expected = {row['reaction_type']: row['count'] for row in storage.count_reactions([post.id])}
+        summary = {row['reaction_type']: row['count'] for row in PostReactionSummary.get_counts(post.id)}
+
+        writes = results['ok']
+        self.stdout.write(
+            f"{storage.name}: {writes} writes in {elapsed:.2f}s ({writes / elapsed:.0f}/s), "
+            f"{results['retries']} lock retries, {results['failed']} gave up, "
+            f"{results['integrity_errors']} integrity errors"
+        )
+        self.stdout.write(f'Stored counts: {expected}')
+        self.stdout.write(f'Summary counts: {summary}')
+        return not results['integrity_errors'] and expected == summary
+
+    def cleanup(self, post, user_ids):
+        """Delete the stress post with its reactions, and the users this run created"""
+        if post is not None:
+            post.delete()
+        # Users that existed before the run are left alone
+        User.objects.filter(pk__in=user_ids).delete()
+
+    def run_write(self, storage, operation, user, post, reaction_type, results, attempts=20):
+        for attempt in range(attempts):
+            try:
+                getattr(storage, operation)(user, post, reaction_type)
+                results['ok'] += 1
+                return
+            except IntegrityError:
+                results['integrity_errors'] += 1
+                return
+            except OperationalError:
+                # SQLite reports lock contention as an error instead of waiting
+                results['retries'] += 1
+                time.sleep(0.001 * (attempt + 1))
+        results['failed'] += 1
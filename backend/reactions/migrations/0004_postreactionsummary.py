@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_summaries(apps, schema_editor):
+    Reaction = apps.get_model('reactions', 'Reaction')
+    PostReactionSummary = apps.get_model('reactions', 'PostReactionSummary')
+    counts = Reaction.objects.order_by().values('post_id', 'reaction_type').annotate(count=models.Count('id'))
+    PostReactionSummary.objects.bulk_create(
+        [PostReactionSummary(**count) for count in counts],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_alter_postview_unique_together_and_more'),
+        ('reactions', '0003_convert_to_uuid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostReactionSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reaction_type', models.CharField(choices=[('like', '👍'), ('love', '❤️'), ('laugh', '😂'), ('wow', '😮'), ('sad', '😢'), ('angry', '😠'), ('fire', '🔥'), ('rocket', '🚀'), ('eyes', '👀'), ('clap', '👏'), ('pray', '🙏'), ('muscle', '💪'), ('brain', '🧠'), ('heart_eyes', '😍'), ('sunglasses', '😎'), ('party', '🎉'), ('star', '⭐'), ('thumbs_up', '👍'), ('thumbs_down', '👎'), ('check', '✅')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reaction_summaries', to='posts.post')),
+            ],
+            options={
+                'verbose_name_plural': 'post reaction summaries',
+                'ordering': ['-count'],
+                'constraints': [models.UniqueConstraint(fields=('post', 'reaction_type'), name='unique_post_reaction_summary')],
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
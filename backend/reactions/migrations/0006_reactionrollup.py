@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reactions', '0005_reactionset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReactionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text='Start of the hour')),
+                ('reaction_type', models.CharField(choices=[('like', '👍'), ('love', '❤️'), ('laugh', '😂'), ('wow', '😮'), ('sad', '😢'), ('angry', '😠'), ('fire', '🔥'), ('rocket', '🚀'), ('eyes', '👀'), ('clap', '👏'), ('pray', '🙏'), ('muscle', '💪'), ('brain', '🧠'), ('heart_eyes', '😍'), ('sunglasses', '😎'), ('party', '🎉'), ('star', '⭐'), ('thumbs_up', '👍'), ('thumbs_down', '👎'), ('check', '✅')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['bucket'],
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'reaction_type'), name='unique_reaction_rollup_bucket')],
+            },
+        ),
+    ]
@@ -1,11 +1,17 @@
-from django.db import models
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models, router, transaction, IntegrityError
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
+from blog_backend.cache import CacheNamespace
 from posts.models import Post
 import uuid
 
 User = get_user_model()
 
+# Non-zero counts per post, invalidated by every summary change; while a popular post's
+# counts are rebuilt, other workers serve the previous ones
+reaction_counts = CacheNamespace('reactions.counts', single_flight=True)
+
 class Reaction(models.Model):
     """Reaction model for emoji reactions on posts"""
     REACTION_CHOICES = [
@@ -31,6 +37,9 @@ class Reaction(models.Model):
         ('check', '✅'),
     ]
     
+    # Compact type codes for bitset storage; only ever append new choices
+    REACTION_CODES = {reaction_type: code for code, (reaction_type, _) in enumerate(REACTION_CHOICES)}
+    
     # Primary key
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     
@@ -83,18 +92,9 @@ class Reaction(models.Model):
     @classmethod
     def toggle_reaction(cls, user, post, reaction_type):
         """Toggle a reaction (add if not exists, remove if exists)"""
-        reaction, created = cls.objects.get_or_create(
-            user=user,
-            post=post,
-            reaction_type=reaction_type
-        )
-        
-        if not created:
-            # Reaction already exists, remove it
-            reaction.delete()
-            return False, 'removed'
-        
-        return True, 'added'
+        from .storage import RowStorage
+        added = RowStorage().toggle(user, post, reaction_type)
+        return added, 'added' if added else 'removed'
     
     @classmethod
     def get_popular_reactions(cls, post, limit=5):
@@ -102,3 +102,225 @@ class Reaction(models.Model):
         return cls.objects.filter(post=post).values('reaction_type').annotate(
             count=models.Count('reaction_type')
         ).order_by('-count')[:limit]
+
+class ReactionSet(models.Model):
+    """Compact reaction storage: one row per user and post with a bitmask of reaction types"""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='reaction_sets'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='reaction_sets',
+        db_index=False  # Covered by the (user, post) unique constraint
+    )
+    mask = models.PositiveIntegerField(
+        default=0,
+        help_text=_('Bit n is set when the user reacted with type code n')
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_user_post_reaction_set'
+            ),
+        ]
+    
+    def __str__(self):
+        return f'{self.user_id} on {self.post_id}: {", ".join(self.reaction_types)}'
+    
+    @staticmethod
+    def bit(reaction_type):
+        """Get the mask bit of a reaction type"""
+        return 1 << Reaction.REACTION_CODES[reaction_type]
+    
+    @staticmethod
+    def decode(mask):
+        """Get the reaction types set in a mask, in choice order"""
+        return [
+            reaction_type
+            for reaction_type, code in Reaction.REACTION_CODES.items()
+            if mask & (1 << code)
+        ]
+    
+    @property
+    def reaction_types(self):
+        return self.decode(self.mask)
+
+class PostReactionSummary(models.Model):
+    """Maintained per-post reaction counts, one row per reaction type"""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='reaction_summaries'
+    )
+    reaction_type = models.CharField(
+        max_length=20,
+        choices=Reaction.REACTION_CHOICES
+    )
+    count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = _('post reaction summaries')
+        ordering = ['-count']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'reaction_type'],
+                name='unique_post_reaction_summary'
+            ),
+        ]
+    
+    def __str__(self):
+        return f'{self.post_id} {self.reaction_type}: {self.count}'
+    
+    @classmethod
+    def apply_delta(cls, post_id, reaction_type, delta):
+        """Atomically adjust the count of one reaction type on a post"""
+        rows = cls.objects.filter(post_id=post_id, reaction_type=reaction_type)
+        if delta < 0:
+            rows = rows.filter(count__gte=-delta)
+        updated = rows.update(count=models.F('count') + delta)
+        reaction_counts.invalidate(post_id)
+        if updated or delta <= 0:
+            return
+        
+        try:
+            with transaction.atomic():
+                cls.objects.create(post_id=post_id, reaction_type=reaction_type, count=delta)
+        except IntegrityError:
+            # Another request created the row first
+            rows.update(count=models.F('count') + delta)
+    
+    @classmethod
+    def load_counts(cls, post_ids):
+        """Read non-zero reaction counts of many posts with one query, by post ID"""
+        counts = {str(post_id): [] for post_id in post_ids}
+        rows = cls.objects.filter(post_id__in=list(counts), count__gt=0).order_by(
+            'post_id', '-count', 'reaction_type'
+        ).values_list('post_id', 'reaction_type', 'count')
+        for post_id, reaction_type, count in rows:
+            counts[str(post_id)].append({'reaction_type': reaction_type, 'count': count})
+        return counts
+    
+    @classmethod
+    def get_counts(cls, post_id):
+        """Get non-zero reaction counts for a post, most popular first"""
+        post_id = str(post_id)
+        return reaction_counts.get_or_set((post_id,), lambda: cls.load_counts([post_id])[post_id])
+    
+    @classmethod
+    def get_counts_many(cls, post_ids):
+        """Get the counts of many posts, reading only those missing from the cache, by post ID"""
+        cached = reaction_counts.get_or_set_many(
+            [(str(post_id),) for post_id in post_ids],
+            lambda missing: {
+                (post_id,): counts
+                for post_id, counts in cls.load_counts([post_id for post_id, in missing]).items()
+            }
+        )
+        return {post_id: counts for (post_id,), counts in cached.items()}
+    
+    @classmethod
+    def summarize(cls, counts, user_reactions):
+        """Format counts and the user's reactions as returned by the API"""
+        user_reactions = list(user_reactions)
+        reacted = set(user_reactions)
+        return {
+            'reaction_counts': [
+                {
+                    'reaction_type': count['reaction_type'],
+                    'count': count['count'],
+                    'user_reacted': count['reaction_type'] in reacted
+                }
+                for count in counts
+            ],
+            'user_reactions': user_reactions,
+            'total_reactions': sum(count['count'] for count in counts)
+        }
+    
+    @classmethod
+    def summarize_many(cls, post_ids, user=None):
+        """Get summaries for many posts with one grouped query each for uncached counts and the user's reactions"""
+        post_ids = [str(post_id) for post_id in post_ids]
+        counts = cls.get_counts_many(post_ids)
+        user_reactions = {post_id: [] for post_id in post_ids}
+        
+        if user is not None and user.is_authenticated:
+            from .storage import get_storage
+            user_reactions.update(get_storage().get_user_reactions_many(user, post_ids))
+        
+        return {
+            post_id: cls.summarize(counts[post_id], user_reactions[post_id])
+            for post_id in post_ids
+        }
+    
+    @classmethod
+    def rebuild(cls, post_ids=None, storage=None):
+        """Recompute summaries from the reactions held by the given (or active) storage"""
+        from .storage import get_storage
+        storage = storage or get_storage()
+        summaries = cls.objects.all()
+        if post_ids is not None:
+            summaries = summaries.filter(post_id__in=post_ids)
+        
+        with transaction.atomic():
+            summaries.delete()
+            cls.objects.bulk_create(
+                [cls(**count) for count in storage.count_reactions(post_ids)],
+                batch_size=1000
+            )
+            if post_ids is None:
+                reaction_counts.invalidate()
+            for post_id in post_ids or []:
+                reaction_counts.invalidate(post_id)
+
+class ReactionRollup(models.Model):
+    """Periodic rollup of reaction counts per type per hour (UTC), by creation time"""
+    bucket = models.DateTimeField(help_text=_('Start of the hour'))
+    reaction_type = models.CharField(
+        max_length=20,
+        choices=Reaction.REACTION_CHOICES
+    )
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['bucket']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['bucket', 'reaction_type'],
+                name='unique_reaction_rollup_bucket'
+            ),
+        ]
+    
+    def __str__(self):
+        return f'{self.bucket:%Y-%m-%d %H:00} {self.reaction_type}: {self.count}'
+    
+    @classmethod
+    def refresh(cls, start=None, end=None, storage=None):
+        """Recompute the buckets in [start, end) from the reactions held by the storage"""
+        from .storage import get_storage
+        storage = storage or get_storage()
+        if not storage.supports_rollups:
+            raise ImproperlyConfigured(
+                f'Reaction rollups need REACTIONS_STORAGE=rows; {storage.name} storage does not record '
+                'when each reaction was made'
+            )
+        rollups = cls.objects.all()
+        if start is not None:
+            rollups = rollups.filter(bucket__gte=start)
+        if end is not None:
+            rollups = rollups.filter(bucket__lt=end)
+        
+        counts = list(storage.count_by_hour(start, end))
+        # Rollups may live in the analytics database
+        with transaction.atomic(using=router.db_for_write(cls)):
+            rollups.delete()
+            return len(cls.objects.bulk_create(
+                [cls(**count) for count in counts],
+                batch_size=1000
+            ))
@@ -0,0 +1,66 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+import numpy as np
+from .models import Reaction, ReactionRollup
+
+REACTION_TYPES = [reaction_type for reaction_type, _ in Reaction.REACTION_CHOICES]
+
+# 1970-01-01 was a Thursday; shift day numbers so that Monday is 0
+EPOCH_WEEKDAY = 3
+
+
+class RollupSeries:
+    """Hourly rollups in a date range loaded as parallel NumPy arrays"""
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        rows = ReactionRollup.objects.filter(bucket__gte=start, bucket__lt=end).values_list(
+            'bucket', 'reaction_type', 'count'
+        )
+        buckets, codes, counts = [], [], []
+        for bucket, reaction_type, count in rows:
+            buckets.append(bucket.replace(tzinfo=None))
+            codes.append(Reaction.REACTION_CODES[reaction_type])
+            counts.append(count)
+        self.hours = np.array(buckets, dtype='datetime64[h]').astype(np.int64)
+        self.codes = np.array(codes, dtype=np.int64)
+        self.counts = np.array(counts, dtype=np.int64)
+
+    @classmethod
+    def for_dates(cls, start_date, end_date):
+        """Load the rollups of the whole days from start_date to end_date inclusive"""
+        start = datetime.combine(start_date, time.min, tzinfo=dt_timezone.utc)
+        end = datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=dt_timezone.utc)
+        return cls(start, end)
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    def by_type(self):
+        """Counts per reaction type, most used first"""
+        totals = np.bincount(self.codes, weights=self.counts, minlength=len(REACTION_TYPES))
+        order = np.argsort(-totals, kind='stable')
+        return [
+            {'reaction_type': REACTION_TYPES[code], 'count': int(totals[code])}
+            for code in order if totals[code] > 0
+        ]
+
+    def daily(self):
+        """Counts per day over the whole range, including empty days"""
+        first_day = np.datetime64(self.start.replace(tzinfo=None), 'D')
+        days = int((np.datetime64(self.end.replace(tzinfo=None), 'D') - first_day).astype(np.int64))
+        offsets = self.hours // 24 - first_day.astype(np.int64)
+        totals = np.bincount(offsets, weights=self.counts, minlength=days)[:days]
+        dates = first_day + np.arange(days)
+        return [
+            {'date': str(date), 'count': int(count)}
+            for date, count in zip(dates, totals)
+        ]
+
+    def hour_of_week(self):
+        """7x24 matrix of counts, rows Monday to Sunday, columns hours in UTC"""
+        weekdays = (self.hours // 24 + EPOCH_WEEKDAY) % 7
+        slots = weekdays * 24 + self.hours % 24
+        matrix = np.bincount(slots, weights=self.counts, minlength=7 * 24).reshape(7, 24)
+        return matrix.astype(np.int64).tolist()
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from .models import Reaction
+from .storage import get_storage
 
 User = get_user_model()
 
@@ -34,8 +36,6 @@ class ReactionCreateSerializer(serializers.ModelSerializer):
     
     def validate(self, attrs):
         """Validate reaction data"""
-        user = self.context['request'].user
-        post = attrs.get('post')
         reaction_type = attrs.get('reaction_type')
         
         # Check if reaction type is valid
@@ -43,22 +43,15 @@ class ReactionCreateSerializer(serializers.ModelSerializer):
         if reaction_type not in valid_types:
             raise serializers.ValidationError(f"Invalid reaction type. Must be one of: {', '.join(valid_types)}")
         
-        # Check if user already has this reaction on this post
-        existing_reaction = Reaction.objects.filter(
-            user=user,
-            post=post,
-            reaction_type=reaction_type
-        ).first()
-        
-        if existing_reaction:
-            raise serializers.ValidationError("You have already reacted with this emoji to this post")
-        
         return attrs
     
     def create(self, validated_data):
         """Create the reaction"""
         validated_data['user'] = self.context['request'].user
-        return Reaction.objects.create(**validated_data)
+        # The insert itself detects duplicates, so double submits cannot race
+        if not get_storage().add(**validated_data):
+            raise serializers.ValidationError("You have already reacted with this emoji to this post")
+        return Reaction(created_at=timezone.now(), **validated_data)
 
 class ReactionCountSerializer(serializers.Serializer):
     """Serializer for reaction counts"""
@@ -86,4 +79,15 @@ class ReactionToggleSerializer(serializers.Serializer):
         valid_types = [choice[0] for choice in Reaction.REACTION_CHOICES]
         if value not in valid_types:
             raise serializers.ValidationError(f"Invalid reaction type. Must be one of: {', '.join(valid_types)}")
-        return value 
\ No newline at end of file
+        return value
+
+class ReactionSetSerializer(serializers.Serializer):
+    """Serializer for replacing a user's reactions on a post"""
+    reaction_types = serializers.ListField(
+        child=serializers.ChoiceField(choices=Reaction.REACTION_CHOICES),
+        allow_empty=True
+    )
+    
+    def validate_reaction_types(self, value):
+        """Drop duplicates while keeping order"""
+        return list(dict.fromkeys(value))
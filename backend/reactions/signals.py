@@ -0,0 +1,40 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from blog_backend.events import broadcaster, post_channel
+from posts.models import Post
+from users.models import AuthorStats
+from .models import Reaction, ReactionSet, PostReactionSummary, reaction_counts
+
+def publish_reaction_delta(post_id, reaction_type, delta):
+    """Push a reaction count change to clients streaming the post"""
+    broadcaster.publish(post_channel(post_id), {
+        'type': 'reaction_count',
+        'reaction_type': reaction_type,
+        'delta': delta,
+    })
+
+def record_reaction_change(post_id, reaction_type, delta):
+    """Update the post summary and author stats and notify listeners of a reaction change"""
+    PostReactionSummary.apply_delta(post_id, reaction_type, delta)
+    AuthorStats.apply_for_post(post_id, total_reactions=delta)
+    publish_reaction_delta(post_id, reaction_type, delta)
+
+@receiver(post_save, sender=Reaction)
+def reaction_added(sender, instance, created, **kwargs):
+    if created:
+        record_reaction_change(instance.post_id, instance.reaction_type, 1)
+
+@receiver(post_delete, sender=Reaction)
+def reaction_removed(sender, instance, **kwargs):
+    record_reaction_change(instance.post_id, instance.reaction_type, -1)
+
+@receiver(post_delete, sender=ReactionSet)
+def reaction_set_removed(sender, instance, **kwargs):
+    """Reaction sets are only deleted by cascades, which drop every reaction in the mask"""
+    for reaction_type in instance.reaction_types:
+        record_reaction_change(instance.post_id, reaction_type, -1)
+
+@receiver(post_delete, sender=Post)
+def forget_reaction_counts(sender, instance, **kwargs):
+    """Summaries are removed by the cascade, which leaves their cached counts behind"""
+    reaction_counts.invalidate(instance.pk)
@@ -0,0 +1,272 @@
+import uuid
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+from .models import Reaction, ReactionSet
+from .signals import record_reaction_change
+
+
+def _names(model, *field_names):
+    """Quoted table name followed by the quoted columns of the given fields"""
+    quote = connection.ops.quote_name
+    return [quote(model._meta.db_table)] + [quote(model._meta.get_field(name).column) for name in field_names]
+
+
+def _prep(model, field_name, value):
+    return model._meta.get_field(field_name).get_db_prep_value(value, connection)
+
+
+def _fetch_column(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+class RowStorage:
+    """One Reaction row per user, post and reaction type"""
+    name = 'rows'
+    # Every reaction keeps its creation time, so it can be rolled up by hour
+    supports_rollups = True
+    # Each reaction is a row with its own ID
+    supports_row_ids = True
+
+    def get_user_reactions(self, user, post_id):
+        return list(Reaction.get_user_reactions(user, post_id))
+
+    def get_user_reactions_many(self, user, post_ids):
+        reactions = {}
+        rows = Reaction.objects.filter(user=user, post_id__in=post_ids).order_by().values_list(
+            'post_id', 'reaction_type'
+        )
+        for post_id, reaction_type in rows:
+            reactions.setdefault(str(post_id), []).append(reaction_type)
+        return reactions
+
+    def get_user_reaction_list(self, user):
+        """Reaction instances of a user, newest first"""
+        return Reaction.objects.filter(user=user).select_related('user', 'post')
+
+    def _insert(self, user, post, reaction_types):
+        """Insert missing reactions in one statement; returns the types actually inserted"""
+        now = timezone.now()
+        rows = [
+            (_prep(Reaction, 'id', uuid.uuid4()), _prep(Reaction, 'post', post.pk),
+             _prep(Reaction, 'user', user.pk), reaction_type, _prep(Reaction, 'created_at', now))
+            for reaction_type in reaction_types
+        ]
+        if not rows:
+            return []
+        table, id_column, post_column, user_column, type_column, created_column = _names(
+            Reaction, 'id', 'post', 'user', 'reaction_type', 'created_at'
+        )
+        values = ', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))
+        return _fetch_column(
+            f'INSERT INTO {table} ({id_column}, {post_column}, {user_column}, {type_column}, {created_column}) '
+            f'VALUES {values} ON CONFLICT ({post_column}, {user_column}, {type_column}) DO NOTHING '
+            f'RETURNING {type_column}',
+            [value for row in rows for value in row]
+        )
+
+    def _delete(self, user, post, reaction_types, keep=False):
+        """Delete the given reactions (or all but them, with keep) in one statement; returns the deleted types"""
+        table, post_column, user_column, type_column = _names(Reaction, 'post', 'user', 'reaction_type')
+        sql = f'DELETE FROM {table} WHERE {post_column} = %s AND {user_column} = %s'
+        params = [_prep(Reaction, 'post', post.pk), _prep(Reaction, 'user', user.pk)]
+        if reaction_types:
+            placeholders = ', '.join(['%s'] * len(reaction_types))
+            sql += f" AND {type_column} {'NOT IN' if keep else 'IN'} ({placeholders})"
+            params += list(reaction_types)
+        elif not keep:
+            return []
+        return _fetch_column(f'{sql} RETURNING {type_column}', params)
+
+    def _record(self, post, added=(), removed=()):
+        # Raw statements bypass the Reaction signals
+        for reaction_type in added:
+            record_reaction_change(post.pk, reaction_type, 1)
+        for reaction_type in removed:
+            record_reaction_change(post.pk, reaction_type, -1)
+
+    def add(self, user, post, reaction_type):
+        """Add a reaction; returns True when it did not exist yet"""
+        with transaction.atomic():
+            added = self._insert(user, post, [reaction_type])
+            self._record(post, added=added)
+        return bool(added)
+
+    def remove(self, user, post, reaction_type):
+        """Remove a reaction; returns True when it existed"""
+        with transaction.atomic():
+            removed = self._delete(user, post, [reaction_type])
+            self._record(post, removed=removed)
+        return bool(removed)
+
+    def toggle(self, user, post, reaction_type):
+        """Toggle a reaction; returns True when it is present afterwards"""
+        with transaction.atomic():
+            removed = self._delete(user, post, [reaction_type])
+            if removed:
+                self._record(post, removed=removed)
+                return False
+            # A concurrent add that wins the insert leaves the reaction present either way
+            self._record(post, added=self._insert(user, post, [reaction_type]))
+        return True
+
+    def set(self, user, post, reaction_types):
+        """Make the user's reactions on the post exactly reaction_types; returns (added, removed)"""
+        with transaction.atomic():
+            removed = self._delete(user, post, reaction_types, keep=True)
+            added = self._insert(user, post, reaction_types)
+            self._record(post, added=added, removed=removed)
+        return added, removed
+
+    def count_reactions(self, post_ids=None):
+        """Per-post, per-type counts as dicts of post_id, reaction_type and count"""
+        reactions = Reaction.objects.order_by()
+        if post_ids is not None:
+            reactions = reactions.filter(post_id__in=post_ids)
+        return reactions.values('post_id', 'reaction_type').annotate(count=models.Count('id'))
+
+    def count_by_hour(self, start=None, end=None):
+        """Per-hour, per-type counts of reactions created in [start, end)"""
+        reactions = Reaction.objects.order_by()
+        if start is not None:
+            reactions = reactions.filter(created_at__gte=start)
+        if end is not None:
+            reactions = reactions.filter(created_at__lt=end)
+        return reactions.annotate(bucket=TruncHour('created_at')).values(
+            'bucket', 'reaction_type'
+        ).annotate(count=models.Count('id'))
+
+
+class BitsetStorage:
+    """
+    One ReactionSet row per user and post holding a bitmask of reaction types.
+
+    Masks do not record when each reaction was made, only when the set last
+    changed, so hourly rollups (and the dated analytics built on them) are
+    not available with this storage. Nor do single reactions have IDs, so
+    they are written through add, remove, toggle and set only.
+    """
+    name = 'bitset'
+    supports_rollups = False
+    supports_row_ids = False
+
+    def get_user_reactions(self, user, post_id):
+        mask = ReactionSet.objects.filter(user=user, post_id=post_id).values_list('mask', flat=True).first()
+        return ReactionSet.decode(mask or 0)
+
+    def get_user_reactions_many(self, user, post_ids):
+        rows = ReactionSet.objects.filter(user=user, post_id__in=post_ids, mask__gt=0).values_list(
+            'post_id', 'mask'
+        )
+        return {str(post_id): ReactionSet.decode(mask) for post_id, mask in rows}
+
+    def get_user_reaction_list(self, user):
+        """Unsaved Reaction instances expanded from the user's masks, newest first"""
+        reaction_sets = ReactionSet.objects.filter(user=user, mask__gt=0).select_related('post').order_by('-updated_at')
+        return [
+            Reaction(user=user, post=reaction_set.post, reaction_type=reaction_type, created_at=reaction_set.updated_at)
+            for reaction_set in reaction_sets
+            for reaction_type in reaction_set.reaction_types
+        ]
+
+    def _upsert(self, user, post, bit, update, where=''):
+        """Insert a set holding bit, or apply update to the existing mask; returns the new mask or None"""
+        table, user_column, post_column, mask_column, updated_column = _names(
+            ReactionSet, 'user', 'post', 'mask', 'updated_at'
+        )
+        mask = f'{table}.{mask_column}'
+        rows = _fetch_column(
+            f'INSERT INTO {table} ({user_column}, {post_column}, {mask_column}, {updated_column}) '
+            f'VALUES (%s, %s, %s, %s) ON CONFLICT ({user_column}, {post_column}) DO UPDATE '
+            f'SET {mask_column} = {update.format(mask=mask, bit="EXCLUDED." + mask_column)}, '
+            f'{updated_column} = EXCLUDED.{updated_column} '
+            f'{where.format(mask=mask, bit="EXCLUDED." + mask_column)} RETURNING {mask_column}',
+            [_prep(ReactionSet, 'user', user.pk), _prep(ReactionSet, 'post', post.pk), bit,
+             _prep(ReactionSet, 'updated_at', timezone.now())]
+        )
+        return rows[0] if rows else None
+
+    def add(self, user, post, reaction_type):
+        with transaction.atomic():
+            # The conditional update skips sets that already hold the bit
+            mask = self._upsert(
+                user, post, ReactionSet.bit(reaction_type),
+                update='{mask} + {bit}',
+                where='WHERE ({mask} & {bit}) = 0'
+            )
+            if mask is not None:
+                record_reaction_change(post.pk, reaction_type, 1)
+        return mask is not None
+
+    def remove(self, user, post, reaction_type):
+        bit = ReactionSet.bit(reaction_type)
+        table, user_column, post_column, mask_column, updated_column = _names(
+            ReactionSet, 'user', 'post', 'mask', 'updated_at'
+        )
+        with transaction.atomic():
+            # Rows are kept at mask 0 so deletions only fire on cascades
+            removed = _fetch_column(
+                f'UPDATE {table} SET {mask_column} = {mask_column} - %s, {updated_column} = %s '
+                f'WHERE {user_column} = %s AND {post_column} = %s AND ({mask_column} & %s) != 0 '
+                f'RETURNING {mask_column}',
+                [bit, _prep(ReactionSet, 'updated_at', timezone.now()),
+                 _prep(ReactionSet, 'user', user.pk), _prep(ReactionSet, 'post', post.pk), bit]
+            )
+            if removed:
+                record_reaction_change(post.pk, reaction_type, -1)
+        return bool(removed)
+
+    def toggle(self, user, post, reaction_type):
+        bit = ReactionSet.bit(reaction_type)
+        with transaction.atomic():
+            mask = self._upsert(
+                user, post, bit,
+                update='CASE WHEN ({mask} & {bit}) = 0 THEN {mask} + {bit} ELSE {mask} - {bit} END'
+            )
+            added = bool(mask & bit)
+            record_reaction_change(post.pk, reaction_type, 1 if added else -1)
+        return added
+
+    def set(self, user, post, reaction_types):
+        mask = 0
+        for reaction_type in reaction_types:
+            mask |= ReactionSet.bit(reaction_type)
+        with transaction.atomic():
+            # The old mask is needed for the summary deltas, so lock the row first
+            ReactionSet.objects.bulk_create([ReactionSet(user=user, post=post)], ignore_conflicts=True)
+            reaction_set = ReactionSet.objects.select_for_update().get(user=user, post=post)
+            added = ReactionSet.decode(mask & ~reaction_set.mask)
+            removed = ReactionSet.decode(reaction_set.mask & ~mask)
+            if added or removed:
+                reaction_set.mask = mask
+                reaction_set.save(update_fields=['mask', 'updated_at'])
+            for reaction_type in added:
+                record_reaction_change(post.pk, reaction_type, 1)
+            for reaction_type in removed:
+                record_reaction_change(post.pk, reaction_type, -1)
+        return added, removed
+
+    def count_reactions(self, post_ids=None):
+        reaction_sets = ReactionSet.objects.order_by()
+        if post_ids is not None:
+            reaction_sets = reaction_sets.filter(post_id__in=post_ids)
+        for reaction_type, code in Reaction.REACTION_CODES.items():
+            counts = reaction_sets.annotate(
+                has_type=models.F('mask').bitand(1 << code)
+            ).filter(has_type__gt=0).values('post_id').annotate(count=models.Count('id'))
+            for count in counts:
+                yield {'post_id': count['post_id'], 'reaction_type': reaction_type, 'count': count['count']}
+
+
+STORAGES = {
+    RowStorage.name: RowStorage,
+    BitsetStorage.name: BitsetStorage,
+}
+
+
+def get_storage(name=None):
+    """Get the reaction storage selected by REACTIONS_STORAGE"""
+    return STORAGES[name or getattr(settings, 'REACTIONS_STORAGE', 'rows')]()
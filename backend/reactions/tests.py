@@ -1,3 +1,419 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.core.management import CommandError, call_command
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+from posts.models import Post
+from users.models import AuthorStats
+from .models import Reaction, ReactionSet, PostReactionSummary, ReactionRollup
+from .storage import get_storage
+from .management.commands.stress_reactions import Command
+from datetime import datetime, timezone as dt_timezone
 
-# Create your tests here.
+User = get_user_model()
+
+class ReactionSummaryTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            username='otheruser',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.post = Post.objects.create(
+            title='Test Post',
+            content='Test content',
+            author=self.user,
+            status='published',
+            published_at=timezone.now()
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def toggle(self, reaction_type):
+        return self.client.post('/api/reactions/toggle/', {
+            'post_id': str(self.post.id),
+            'reaction_type': reaction_type
+        }, format='json')
+
+    def test_toggle_maintains_summary(self):
+        """Test that toggling adds and removes counts in the summary"""
+        Reaction.objects.create(user=self.other_user, post=self.post, reaction_type='like')
+        
+        response = self.toggle('like')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['message'], 'Reaction added')
+        self.assertEqual(response.data['total_reactions'], 2)
+        self.assertEqual(response.data['user_reactions'], ['like'])
+        self.assertTrue(response.data['reaction_counts'][0]['user_reacted'])
+        
+        response = self.toggle('like')
+        self.assertEqual(response.data['message'], 'Reaction removed')
+        self.assertEqual(response.data['total_reactions'], 1)
+        self.assertEqual(
+            PostReactionSummary.objects.get(post=self.post, reaction_type='like').count,
+            1
+        )
+
+    def test_post_reactions_reads_summary(self):
+        """Test that post_reactions answers from the summary and the user's own reactions"""
+        Reaction.objects.create(user=self.user, post=self.post, reaction_type='fire')
+        Reaction.objects.create(user=self.other_user, post=self.post, reaction_type='fire')
+        Reaction.objects.create(user=self.other_user, post=self.post, reaction_type='wow')
+        
+        url = f'/api/reactions/post_reactions/?post_id={self.post.id}'
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.data['total_reactions'], 3)
+        self.assertEqual(response.data['reaction_counts'][0], {
+            'reaction_type': 'fire', 'count': 2, 'user_reacted': True
+        })
+
+    def test_post_reactions_unknown_post(self):
+        """Test that unknown posts still return 404"""
+        url = '/api/reactions/post_reactions/?post_id=00000000-0000-0000-0000-000000000000'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rebuild_matches_rows(self):
+        """Test that rebuilding recomputes summaries from reaction rows"""
+        Reaction.objects.create(user=self.user, post=self.post, reaction_type='like')
+        PostReactionSummary.objects.all().delete()
+        PostReactionSummary.rebuild()
+        self.assertEqual(PostReactionSummary.get_counts(self.post.id), [
+            {'reaction_type': 'like', 'count': 1}
+        ])
+
+    def test_batch_summaries_use_three_queries(self):
+        """Test that batch summaries cost three queries regardless of the number of posts"""
+        posts = [self.post] + [
+            Post.objects.create(
+                title=f'Post {i}',
+                content='Test content',
+                author=self.user,
+                status='published',
+                published_at=timezone.now()
+            )
+            for i in range(5)
+        ]
+        for post in posts[:3]:
+            Reaction.objects.create(user=self.user, post=post, reaction_type='like')
+            Reaction.objects.create(user=self.other_user, post=post, reaction_type='love')
+        
+        post_ids = ','.join(str(post.id) for post in posts)
+        # Visible posts, uncached counts and the user's reactions
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/reactions/batch/?post_ids={post_ids}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 6)
+        self.assertEqual(response.data[str(posts[0].id)]['total_reactions'], 2)
+        self.assertEqual(response.data[str(posts[0].id)]['user_reactions'], ['like'])
+        self.assertEqual(response.data[str(posts[5].id)]['total_reactions'], 0)
+
+    def test_batch_skips_posts_the_user_cannot_read(self):
+        """Test that drafts are only summarized for their author"""
+        draft = Post.objects.create(title='Draft', content='Test content', author=self.user, status='draft')
+        post_ids = f'{self.post.id},{draft.id}'
+        
+        response = self.client.get(f'/api/reactions/batch/?post_ids={post_ids}')
+        self.assertEqual(set(response.data), {str(self.post.id), str(draft.id)})
+        
+        self.client.force_authenticate(user=self.other_user)
+        response = self.client.get(f'/api/reactions/batch/?post_ids={post_ids}')
+        self.assertEqual(set(response.data), {str(self.post.id)})
+        
+        self.client.force_authenticate(user=None)
+        response = self.client.get(f'/api/reactions/batch/?post_ids={post_ids}')
+        self.assertEqual(set(response.data), {str(self.post.id)})
+    
+    def test_batch_rejects_invalid_ids(self):
+        """Test that malformed post IDs are rejected"""
+        response = self.client.get('/api/reactions/batch/?post_ids=not-a-uuid')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_post_list_embeds_summaries(self):
+        """Test that the post list embeds reaction summaries on request"""
+        Reaction.objects.create(user=self.other_user, post=self.post, reaction_type='wow')
+        
+        response = self.client.get('/api/posts/')
+        self.assertNotIn('reaction_summary', response.data['results'][0])
+        
+        response = self.client.get('/api/posts/?include=reactions')
+        summary = response.data['results'][0]['reaction_summary']
+        self.assertEqual(summary['total_reactions'], 1)
+        self.assertEqual(summary['user_reactions'], [])
+
+@override_settings(REACTIONS_STORAGE='bitset')
+class BitsetStorageTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.post = Post.objects.create(
+            title='Test Post',
+            content='Test content',
+            author=self.user,
+            status='published',
+            published_at=timezone.now()
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def toggle(self, reaction_type):
+        return self.client.post('/api/reactions/toggle/', {
+            'post_id': str(self.post.id),
+            'reaction_type': reaction_type
+        }, format='json')
+
+    def test_toggle_keeps_one_row_per_post(self):
+        """Test that reactions are stored as bits of a single row"""
+        self.toggle('like')
+        response = self.toggle('fire')
+        self.assertEqual(response.data['message'], 'Reaction added')
+        self.assertEqual(response.data['user_reactions'], ['like', 'fire'])
+        self.assertEqual(ReactionSet.objects.get().mask, ReactionSet.bit('like') | ReactionSet.bit('fire'))
+        self.assertFalse(Reaction.objects.exists())
+
+        response = self.toggle('like')
+        self.assertEqual(response.data['message'], 'Reaction removed')
+        self.assertEqual(response.data['total_reactions'], 1)
+        self.assertEqual(PostReactionSummary.get_counts(self.post.id), [{'reaction_type': 'fire', 'count': 1}])
+
+    def test_create_and_my_reactions(self):
+        """Test that create and my_reactions keep the row API shape"""
+        response = self.client.post('/api/reactions/', {
+            'post': str(self.post.id),
+            'reaction_type': 'love'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.post('/api/reactions/', {
+            'post': str(self.post.id),
+            'reaction_type': 'love'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get('/api/reactions/my_reactions/')
+        self.assertEqual([reaction['reaction_type'] for reaction in response.data], ['love'])
+
+    def test_post_endpoints_count_reaction_sets(self):
+        """Test that post lists and details report reaction totals from the summaries"""
+        self.toggle('like')
+        self.toggle('fire')
+        response = self.client.get('/api/posts/')
+        self.assertEqual(response.data['results'][0]['reaction_count'], 2)
+        response = self.client.get(f'/api/posts/{self.post.id}/')
+        self.assertEqual(response.data['reaction_count'], 2)
+
+    def test_row_endpoints_use_reaction_sets(self):
+        """Test that list reads the reaction sets and ID lookups are refused"""
+        self.toggle('like')
+        self.toggle('fire')
+        response = self.client.get('/api/reactions/', {'reaction_type': 'fire'})
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['reaction_type'], 'fire')
+
+        reaction_id = response.data['results'][0]['id']
+        response = self.client.get(f'/api/reactions/{reaction_id}/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.delete(f'/api/reactions/{reaction_id}/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ReactionSet.objects.get().reaction_types, ['like', 'fire'])
+
+    def test_migrate_between_storages(self):
+        """Test that reactions survive a round trip between storages"""
+        with self.settings(REACTIONS_STORAGE='rows'):
+            Reaction.objects.create(user=self.user, post=self.post, reaction_type='like')
+            Reaction.objects.create(user=self.user, post=self.post, reaction_type='star')
+
+        call_command('migrate_reaction_storage', 'bitset', '--batch-size', '1', stdout=StringIO())
+        self.assertFalse(Reaction.objects.exists())
+        self.assertEqual(ReactionSet.objects.get().reaction_types, ['like', 'star'])
+        self.assertEqual(PostReactionSummary.get_counts(self.post.id), [
+            {'reaction_type': 'like', 'count': 1},
+            {'reaction_type': 'star', 'count': 1},
+        ])
+        self.assertEqual(AuthorStats.objects.get(user=self.user).total_reactions, 2)
+
+        call_command('migrate_reaction_storage', 'rows', stdout=StringIO())
+        self.assertFalse(ReactionSet.objects.exists())
+        self.assertEqual(
+            sorted(Reaction.objects.values_list('reaction_type', flat=True)),
+            ['like', 'star']
+        )
+        self.assertEqual(PostReactionSummary.objects.filter(post=self.post).count(), 2)
+
+    def test_rollups_are_refused(self):
+        """Test that bitset storage offers no hourly rollups, which would bucket reactions by their set's last change"""
+        self.toggle('like')
+        with self.assertRaises(CommandError):
+            call_command('rollup_reactions', '--all', stdout=StringIO())
+        self.assertFalse(ReactionRollup.objects.exists())
+        
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='testpass123')
+        self.client.force_authenticate(user=admin)
+        response = self.client.get('/api/reactions/analytics/')
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+        response = self.client.get('/api/reactions/popular_reactions/', {'start': '2025-03-04'})
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+        response = self.client.get('/api/reactions/popular_reactions/')
+        self.assertEqual(response.data[0], {'reaction_type': 'like', 'count': 1})
+    
+    def test_deleting_post_clears_summary(self):
+        """Test that cascaded reaction sets remove their counts"""
+        self.toggle('like')
+        self.post.delete()
+        self.assertFalse(PostReactionSummary.objects.exists())
+
+class ReactionRollupTestCase(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='testpass123'
+        )
+        self.post = Post.objects.create(
+            title='Test Post',
+            content='Test content',
+            author=self.admin,
+            status='published',
+            published_at=timezone.now()
+        )
+        users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='testpass123')
+            for i in range(3)
+        ]
+        # Monday 2025-03-03 10:xx and Tuesday 2025-03-04 22:xx UTC
+        monday = datetime(2025, 3, 3, 10, 15, tzinfo=dt_timezone.utc)
+        tuesday = datetime(2025, 3, 4, 22, 40, tzinfo=dt_timezone.utc)
+        for user, reaction_type, created_at in [
+            (users[0], 'like', monday),
+            (users[1], 'like', monday),
+            (users[2], 'fire', tuesday),
+        ]:
+            reaction = Reaction.objects.create(user=user, post=self.post, reaction_type=reaction_type)
+            Reaction.objects.filter(pk=reaction.pk).update(created_at=created_at)
+        call_command('rollup_reactions', '--all', stdout=StringIO())
+        self.client.force_authenticate(user=self.admin)
+
+    def test_rollup_buckets(self):
+        """Test that reactions are rolled up per hour and type"""
+        self.assertEqual(
+            list(ReactionRollup.objects.values_list('reaction_type', 'count')),
+            [('like', 2), ('fire', 1)]
+        )
+
+    def test_analytics_breakdowns(self):
+        """Test the daily series and hour-of-week matrix of a date range"""
+        response = self.client.get('/api/reactions/analytics/', {'start': '2025-03-02', 'end': '2025-03-04'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_reactions'], 3)
+        self.assertEqual(response.data['recent_reactions'], 3)
+        self.assertEqual(
+            [day['count'] for day in response.data['daily']],
+            [0, 2, 1]
+        )
+        self.assertEqual(response.data['hour_of_week'][0][10], 2)
+        self.assertEqual(response.data['hour_of_week'][1][22], 1)
+        self.assertEqual(sum(map(sum, response.data['hour_of_week'])), 3)
+
+    def test_popular_reactions_in_range(self):
+        """Test the dated leaderboard and date validation"""
+        response = self.client.get('/api/reactions/popular_reactions/', {'start': '2025-03-04', 'end': '2025-03-04'})
+        self.assertEqual(list(response.data), [{'reaction_type': 'fire', 'count': 1}])
+
+        response = self.client.get('/api/reactions/popular_reactions/')
+        self.assertEqual(response.data[0], {'reaction_type': 'like', 'count': 2})
+
+        response = self.client.get('/api/reactions/popular_reactions/', {'start': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class IdempotentWriteTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.post = Post.objects.create(
+            title='Test Post',
+            content='Test content',
+            author=self.user,
+            status='published',
+            published_at=timezone.now()
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def write(self, action, **data):
+        method = self.client.put if action == 'set' else self.client.post
+        return method(f'/api/reactions/{action}/', {'post_id': str(self.post.id), **data}, format='json')
+
+    def check_storage(self):
+        response = self.write('add', reaction_type='like')
+        self.assertEqual(response.data['message'], 'Reaction added')
+        response = self.write('add', reaction_type='like')
+        self.assertEqual(response.data['message'], 'Reaction already present')
+        self.assertEqual(response.data['total_reactions'], 1)
+
+        response = self.write('set', reaction_types=['fire', 'star', 'fire'])
+        self.assertEqual(sorted(response.data['user_reactions']), ['fire', 'star'])
+        self.assertEqual(response.data['total_reactions'], 2)
+
+        response = self.write('remove', reaction_type='fire')
+        self.assertEqual(response.data['message'], 'Reaction removed')
+        response = self.write('remove', reaction_type='fire')
+        self.assertEqual(response.data['message'], 'Reaction not present')
+        self.assertEqual(response.data['user_reactions'], ['star'])
+
+        response = self.write('set', reaction_types=[])
+        self.assertEqual(response.data['total_reactions'], 0)
+        self.assertEqual(list(get_storage().count_reactions([self.post.id])), [])
+
+    def test_row_storage(self):
+        """Test add, remove and set semantics on row storage"""
+        self.check_storage()
+
+    @override_settings(REACTIONS_STORAGE='bitset')
+    def test_bitset_storage(self):
+        """Test add, remove and set semantics on bitset storage"""
+        self.check_storage()
+
+    def test_duplicate_create_is_rejected(self):
+        """Test that a repeated create is refused without an integrity error"""
+        for expected in [status.HTTP_201_CREATED, status.HTTP_400_BAD_REQUEST]:
+            response = self.client.post('/api/reactions/', {
+                'post': str(self.post.id),
+                'reaction_type': 'like'
+            }, format='json')
+            self.assertEqual(response.status_code, expected)
+        self.assertEqual(Reaction.objects.count(), 1)
+
+class ConcurrentWriteTestCase(TransactionTestCase):
+    def test_stress_keeps_counts_consistent(self):
+        """Test that concurrent writes from shared users keep summaries in step"""
+        for storage in ['rows', 'bitset']:
+            out = StringIO()
+            call_command(
+                'stress_reactions', threads=4, iterations=25, storage=storage, seed=1, stdout=out
+            )
+            self.assertIn('Reaction counts are consistent', out.getvalue())
+        # Nothing the runs created is left behind
+        self.assertFalse(User.objects.filter(username__startswith='stress_user_').exists())
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Reaction.objects.exists())
+        self.assertFalse(ReactionSet.objects.exists())
+    
+    def test_stress_cleans_up_after_errors(self):
+        """Test that the stress rows are deleted when the run fails"""
+        with mock.patch.object(Command, 'stress', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                call_command('stress_reactions', threads=2, iterations=1, stdout=StringIO())
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(Post.objects.exists())
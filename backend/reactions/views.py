@@ -2,16 +2,27 @@ from rest_framework import viewsets, status, permissions, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count
-from .models import Reaction
+from blog_backend.db import StatementTimeoutMixin
+import uuid
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import timedelta
+from rest_framework.exceptions import ValidationError
+from .models import Reaction, PostReactionSummary
+from .storage import get_storage
+from .rollups import RollupSeries
 from .serializers import (
     ReactionSerializer,
     ReactionCreateSerializer,
     PostReactionsSerializer,
-    ReactionToggleSerializer
+    ReactionToggleSerializer,
+    ReactionSetSerializer
 )
 
-class ReactionViewSet(viewsets.ModelViewSet):
+class ReactionViewSet(StatementTimeoutMixin, viewsets.ModelViewSet):
     """ViewSet for Reaction model"""
     queryset = Reaction.objects.all()
     permission_classes = [permissions.IsAuthenticated]
@@ -19,6 +30,17 @@ class ReactionViewSet(viewsets.ModelViewSet):
     filterset_fields = ['post', 'user', 'reaction_type']
     ordering_fields = ['created_at']
     ordering = ['-created_at']
+    throttle_scopes = {
+        'create': 'reaction_toggle',
+        'toggle': 'reaction_toggle',
+        'add': 'reaction_toggle',
+        'remove': 'reaction_toggle',
+        'set_reactions': 'reaction_toggle',
+    }
+    statement_timeout_scopes = {
+        'popular_reactions': 'analytics',
+        'analytics': 'analytics',
+    }
     
     def get_queryset(self):
         """Filter queryset based on user permissions"""
@@ -33,6 +55,35 @@ class ReactionViewSet(viewsets.ModelViewSet):
             user=self.request.user
         )
     
+    def list(self, request, *args, **kwargs):
+        """List reactions from the configured storage"""
+        storage = get_storage()
+        if storage.supports_row_ids:
+            return super().list(request, *args, **kwargs)
+        
+        # Reaction sets are only expanded per user, so staff list their own reactions too
+        reactions = storage.get_user_reaction_list(request.user)
+        post_id = request.query_params.get('post')
+        if post_id:
+            reactions = [reaction for reaction in reactions if str(reaction.post_id) == post_id]
+        reaction_type = request.query_params.get('reaction_type')
+        if reaction_type:
+            reactions = [reaction for reaction in reactions if reaction.reaction_type == reaction_type]
+        
+        page = self.paginate_queryset(reactions)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(reactions, many=True).data)
+    
+    def get_object(self):
+        """Retrieve, update and destroy address single rows, which only row storage has"""
+        storage = get_storage()
+        if not storage.supports_row_ids:
+            raise ValidationError({
+                'error': f'Reactions have no IDs with {storage.name} storage; use add, remove, toggle or set'
+            })
+        return super().get_object()
+    
     def get_serializer_class(self):
         if self.action == 'create':
             return ReactionCreateSerializer
@@ -42,57 +93,80 @@ class ReactionViewSet(viewsets.ModelViewSet):
         """Set the user when creating a reaction"""
         serializer.save(user=self.request.user)
     
+    def write_reaction(self, request, serializer_class, operation):
+        """Validate a reaction write, run it against the storage and return the updated summary"""
+        serializer = serializer_class(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        post_id = request.data.get('post_id')
+        if not post_id:
+            return Response(
+                {'error': 'post_id is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        from posts.cache import get_post
+        post = get_post(post_id)
+        if post is None:
+            return Response(
+                {'error': 'Post not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        # Each write is a single conflict-safe statement; the summary row is updated in the same transaction
+        storage = get_storage()
+        try:
+            message = operation(storage, post, serializer.validated_data)
+        except IntegrityError:
+            # The post or user was deleted while the write was in flight
+            return Response(
+                {'error': 'Reaction could not be saved'},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        # Get updated reaction data from the maintained summary
+        summary = PostReactionSummary.summarize(
+            PostReactionSummary.get_counts(post.id),
+            storage.get_user_reactions(request.user, post.id)
+        )
+        
+        return Response({
+            'message': message,
+            **summary
+        })
+    
     @action(detail=False, methods=['post'])
     def toggle(self, request):
         """Toggle a reaction (add if not exists, remove if exists)"""
-        serializer = ReactionToggleSerializer(data=request.data)
-        if serializer.is_valid():
-            reaction_type = serializer.validated_data['reaction_type']
-            post_id = request.data.get('post_id')
-            
-            if not post_id:
-                return Response(
-                    {'error': 'post_id is required'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            try:
-                from posts.models import Post
-                post = Post.objects.get(id=post_id)
-            except Post.DoesNotExist:
-                return Response(
-                    {'error': 'Post not found'},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            
-            # Toggle the reaction
-            added, action = Reaction.toggle_reaction(
-                user=request.user,
-                post=post,
-                reaction_type=reaction_type
-            )
-            
-            # Get updated reaction data
-            reaction_counts = Reaction.get_reaction_counts(post)
-            user_reactions = Reaction.get_user_reactions(request.user, post)
-            
-            # Format response
-            formatted_counts = []
-            for count_data in reaction_counts:
-                formatted_counts.append({
-                    'reaction_type': count_data['reaction_type'],
-                    'count': count_data['count'],
-                    'user_reacted': count_data['reaction_type'] in user_reactions
-                })
-            
-            return Response({
-                'message': f'Reaction {action}',
-                'reaction_counts': formatted_counts,
-                'user_reactions': list(user_reactions),
-                'total_reactions': sum(count['count'] for count in reaction_counts)
-            })
-        
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        def toggle(storage, post, data):
+            added = storage.toggle(request.user, post, data['reaction_type'])
+            return f"Reaction {'added' if added else 'removed'}"
+        return self.write_reaction(request, ReactionToggleSerializer, toggle)
+    
+    @action(detail=False, methods=['post'])
+    def add(self, request):
+        """Add a reaction; repeating the request is a no-op"""
+        def add(storage, post, data):
+            added = storage.add(request.user, post, data['reaction_type'])
+            return 'Reaction added' if added else 'Reaction already present'
+        return self.write_reaction(request, ReactionToggleSerializer, add)
+    
+    @action(detail=False, methods=['post'])
+    def remove(self, request):
+        """Remove a reaction; repeating the request is a no-op"""
+        def remove(storage, post, data):
+            removed = storage.remove(request.user, post, data['reaction_type'])
+            return 'Reaction removed' if removed else 'Reaction not present'
+        return self.write_reaction(request, ReactionToggleSerializer, remove)
+    
+    @action(detail=False, methods=['put'], url_path='set')
+    def set_reactions(self, request):
+        """Replace the user's reactions on a post with reaction_types"""
+        def set_reactions(storage, post, data):
+            added, removed = storage.set(request.user, post, data['reaction_types'])
+            return f'Reactions set ({len(added)} added, {len(removed)} removed)'
+        return self.write_reaction(request, ReactionSetSerializer, set_reactions)
     
     @action(detail=False, methods=['get'])
     def post_reactions(self, request):
@@ -105,37 +179,57 @@ class ReactionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
+        # Get reaction counts from the maintained summary
+        reaction_counts = PostReactionSummary.get_counts(post_id)
+        
+        # Only posts without reactions need an existence check
+        if not reaction_counts:
             from posts.models import Post
-            post = Post.objects.get(id=post_id)
-        except Post.DoesNotExist:
+            if not Post.objects.filter(id=post_id).exists():
+                return Response(
+                    {'error': 'Post not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+        
+        # Get user reactions if authenticated
+        user_reactions = []
+        if request.user.is_authenticated:
+            user_reactions = get_storage().get_user_reactions(request.user, post_id)
+        
+        return Response(PostReactionSummary.summarize(reaction_counts, user_reactions))
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
+    def batch(self, request):
+        """Get reaction summaries for many posts (?post_ids=id1,id2,...); posts the user cannot read are left out"""
+        raw_ids = [value for value in request.query_params.get('post_ids', '').split(',') if value]
+        if not raw_ids:
             return Response(
-                {'error': 'Post not found'},
-                status=status.HTTP_404_NOT_FOUND
+                {'error': 'post_ids parameter is required'},
+                status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get reaction counts
-        reaction_counts = Reaction.get_reaction_counts(post)
-        user_reactions = []
+        max_posts = getattr(settings, 'REACTIONS_BATCH_MAX_POSTS', 100)
+        if len(raw_ids) > max_posts:
+            return Response(
+                {'error': f'At most {max_posts} post_ids are allowed'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Get user reactions if authenticated
-        if request.user.is_authenticated:
-            user_reactions = Reaction.get_user_reactions(request.user, post)
-        
-        # Format response
-        formatted_counts = []
-        for count_data in reaction_counts:
-            formatted_counts.append({
-                'reaction_type': count_data['reaction_type'],
-                'count': count_data['count'],
-                'user_reacted': count_data['reaction_type'] in user_reactions
-            })
+        try:
+            post_ids = [str(uuid.UUID(value)) for value in raw_ids]
+        except ValueError:
+            return Response(
+                {'error': 'post_ids must be UUIDs'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        return Response({
-            'reaction_counts': formatted_counts,
-            'user_reactions': list(user_reactions),
-            'total_reactions': sum(count['count'] for count in reaction_counts)
-        })
+        # Drafts and scheduled posts are only summarized for those who may read them
+        from posts.models import Post
+        post_ids = [
+            str(post_id) for post_id in
+            Post.objects.visible_to(request.user).filter(id__in=post_ids).values_list('id', flat=True)
+        ]
+        return Response(PostReactionSummary.summarize_many(post_ids, request.user))
     
     @action(detail=False, methods=['get'])
     def my_reactions(self, request):
@@ -146,13 +240,37 @@ class ReactionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_401_UNAUTHORIZED
             )
         
-        reactions = self.get_queryset().filter(user=request.user)
+        reactions = get_storage().get_user_reaction_list(request.user)
         serializer = ReactionSerializer(reactions, many=True, context={'request': request})
         return Response(serializer.data)
     
+    def get_date_range(self, default_days=None):
+        """Parse ?start= and ?end= (YYYY-MM-DD, inclusive); returns None when neither is set and there is no default"""
+        start = self.request.query_params.get('start')
+        end = self.request.query_params.get('end')
+        if not start and not end and default_days is None:
+            return None
+        
+        try:
+            end = parse_date(end) if end else timezone.now().date()
+            start = parse_date(start) if start else end - timedelta(days=(default_days or 30) - 1)
+        except (TypeError, ValueError):
+            start = end = None
+        if start is None or end is None:
+            raise ValidationError({'error': 'start and end must be dates (YYYY-MM-DD)'})
+        if start > end:
+            raise ValidationError({'error': 'start must not be after end'})
+        return start, end
+    
+    def rollups_unavailable(self):
+        return Response(
+            {'error': 'Dated reaction analytics need REACTIONS_STORAGE=rows'},
+            status=status.HTTP_501_NOT_IMPLEMENTED
+        )
+    
     @action(detail=False, methods=['get'])
     def popular_reactions(self, request):
-        """Get popular reactions across all posts"""
+        """Get popular reactions across all posts, optionally within ?start= and ?end="""
         post_id = request.query_params.get('post_id')
         limit = int(request.query_params.get('limit', 5))
         
@@ -161,39 +279,48 @@ class ReactionViewSet(viewsets.ModelViewSet):
             try:
                 from posts.models import Post
                 post = Post.objects.get(id=post_id)
-                popular_reactions = Reaction.get_popular_reactions(post, limit)
             except Post.DoesNotExist:
                 return Response(
                     {'error': 'Post not found'},
                     status=status.HTTP_404_NOT_FOUND
                 )
-        else:
-            # Get popular reactions across all posts
-            popular_reactions = Reaction.objects.values('reaction_type').annotate(
-                count=Count('reaction_type')
-            ).order_by('-count')[:limit]
+            popular_reactions = PostReactionSummary.objects.filter(
+                post=post,
+                count__gt=0
+            ).values('reaction_type', 'count')[:limit]
+            return Response(popular_reactions)
+        
+        date_range = self.get_date_range()
+        if date_range is not None and not get_storage().supports_rollups:
+            return self.rollups_unavailable()
+        if date_range is None:
+            # All-time leaderboard from the maintained per-post summaries
+            popular_reactions = PostReactionSummary.objects.order_by().values('reaction_type').annotate(
+                count=Sum('count')
+            ).filter(count__gt=0).order_by('-count')[:limit]
+            return Response(popular_reactions)
         
-        return Response(popular_reactions)
+        return Response(RollupSeries.for_dates(*date_range).by_type()[:limit])
     
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
     def analytics(self, request):
-        """Get reaction analytics (admin only)"""
-        total_reactions = Reaction.objects.count()
-        reactions_by_type = Reaction.objects.values('reaction_type').annotate(
-            count=Count('reaction_type')
-        ).order_by('-count')
+        """Get reaction analytics from the rollups (admin only, ?start= and ?end=, last 30 days by default)"""
+        if not get_storage().supports_rollups:
+            return self.rollups_unavailable()
         
-        # Get reactions by date (last 30 days)
-        from django.utils import timezone
-        from datetime import timedelta
+        totals = PostReactionSummary.objects.order_by().values('reaction_type').annotate(
+            count=Sum('count')
+        ).filter(count__gt=0).order_by('-count')
         
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        recent_reactions = Reaction.objects.filter(
-            created_at__gte=thirty_days_ago
-        ).count()
+        start, end = self.get_date_range(default_days=30)
+        series = RollupSeries.for_dates(start, end)
         
         return Response({
-            'total_reactions': total_reactions,
-            'recent_reactions': recent_reactions,
-            'reactions_by_type': reactions_by_type
+            'total_reactions': sum(total['count'] for total in totals),
+            'recent_reactions': series.total,
+            'reactions_by_type': totals,
+            'range': {'start': start, 'end': end},
+            'range_by_type': series.by_type(),
+            'daily': series.daily(),
+            'hour_of_week': series.hour_of_week(),
         })
@@ -0,0 +1,30 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import Task
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    """Admin for inspecting and retrying queued tasks"""
+    list_display = ['id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'claimed_by', 'finished_at']
+    list_filter = ['status', 'name']
+    search_fields = ['name', 'claimed_by']
+    readonly_fields = [
+        'name', 'payload', 'status', 'attempts', 'max_attempts', 'run_at', 'claimed_by',
+        'claim_token', 'claimed_at', 'finished_at', 'last_error', 'created_at'
+    ]
+    date_hierarchy = 'created_at'
+    actions = ['retry_now']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    @admin.action(description='Retry selected tasks now')
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status=Task.RUNNING).update(
+            status=Task.QUEUED,
+            run_at=timezone.now(),
+            attempts=0,
+            claim_token=None,
+            finished_at=None
+        )
+        self.message_user(request, f'{updated} tasks queued for retry')
@@ -0,0 +1,35 @@
+import os
+import signal
+import socket
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from tasks.queue import Worker, registry
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks; start as many workers as needed, they never claim the same task'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=settings.TASKS_WORKER_THREADS, help='Tasks run in parallel')
+        parser.add_argument('--claim-size', type=int, help='Tasks claimed per round (default: 5 per thread)')
+        parser.add_argument('--poll', type=float, default=settings.TASKS_POLL_SECONDS, help='Seconds to sleep when idle')
+        parser.add_argument('--burst', action='store_true', help='Exit once no task is due')
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            f'{socket.gethostname()}:{os.getpid()}',
+            threads=options['threads'],
+            claim_size=options['claim_size'] or options['threads'] * 5,
+            poll_seconds=options['poll']
+        )
+
+        def stop(signum, frame):
+            self.stdout.write('Stopping after the current round...')
+            worker.stop()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        self.stdout.write(f"Worker {worker.worker_id} running {', '.join(sorted(registry)) or 'no tasks'}")
+        worker.run(burst=options['burst'])
+        self.stdout.write(self.style.SUCCESS(f'Processed {worker.processed} tasks ({worker.failed} failed)'))
@@ -0,0 +1,256 @@
+import json
+import logging
+import random
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import timedelta
+from itertools import groupby
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connection, connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+class TaskHandler:
+    """
+    A registered task function.
+
+    Plain handlers are called with the payload as keyword arguments. Handlers
+    with a batch_size above one are called with a list of up to batch_size
+    payloads of queued tasks of the same name, and succeed or fail together;
+    a failed batch is split and rerun until the failing payloads are isolated.
+    Handlers that write models routed to another database list them in
+    write_models, so that those writes commit or roll back with the rest.
+    """
+
+    def __init__(self, func, name, batch_size=1, max_attempts=None, write_models=()):
+        self.func = func
+        self.name = name
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.write_models = write_models
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, **payload):
+        """Queue a call that runs as soon as a worker is free; returns the Task, or None if run eagerly"""
+        return self.enqueue_at(None, **payload)
+
+    def enqueue_at(self, run_at, **payload):
+        """Queue a call that runs no earlier than run_at"""
+        if settings.TASKS_ALWAYS_EAGER:
+            # Round-trip the payload so that eager runs see what a worker would
+            self.run([json.loads(json.dumps(payload, cls=DjangoJSONEncoder))])
+            return None
+        return Task.objects.create(
+            name=self.name,
+            payload=payload,
+            run_at=run_at or timezone.now(),
+            max_attempts=self.max_attempts or settings.TASKS_MAX_ATTEMPTS
+        )
+
+    def atomic(self):
+        """A transaction on every database the handler writes to, the default one committing last"""
+        stack = ExitStack()
+        aliases = dict.fromkeys([DEFAULT_DB_ALIAS, *(router.db_for_write(model) for model in self.write_models)])
+        for alias in aliases:
+            stack.enter_context(transaction.atomic(using=alias))
+        return stack
+
+    def run(self, payloads):
+        if self.batch_size > 1:
+            self.func(payloads)
+        else:
+            for payload in payloads:
+                self.func(**payload)
+
+
+def task(name=None, batch_size=1, max_attempts=None, write_models=()):
+    """Register a function as a task handler; defaults to the name '<module>.<function>'"""
+    def decorator(func):
+        handler = TaskHandler(
+            func,
+            name or f'{func.__module__}.{func.__name__}',
+            batch_size=batch_size,
+            max_attempts=max_attempts,
+            write_models=write_models
+        )
+        if registry.setdefault(handler.name, handler) is not handler:
+            raise ValueError(f'A task named {handler.name!r} is already registered')
+        return handler
+    return decorator
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter, capped at TASKS_RETRY_MAX_SECONDS"""
+    delay = min(settings.TASKS_RETRY_MAX_SECONDS, settings.TASKS_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+def claim(worker_id, limit):
+    """
+    Claim up to limit due tasks for this worker.
+
+    On PostgreSQL the candidate rows are locked with FOR UPDATE SKIP LOCKED,
+    so concurrent workers claim disjoint sets without waiting on each other.
+    Elsewhere the conditional update decides which worker wins a row.
+    """
+    now = timezone.now()
+    token = uuid.uuid4()
+    with transaction.atomic():
+        due = Task.objects.filter(status=Task.QUEUED, run_at__lte=now).order_by('run_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        Task.objects.filter(id__in=ids, status=Task.QUEUED).update(
+            status=Task.RUNNING,
+            attempts=F('attempts') + 1,
+            claimed_by=worker_id,
+            claim_token=token,
+            claimed_at=now
+        )
+    return list(Task.objects.filter(claim_token=token).order_by('run_at', 'id'))
+
+
+def requeue_expired(lease_seconds=None):
+    """Release tasks whose worker died mid-run, or fail them when out of attempts"""
+    now = timezone.now()
+    expired = Task.objects.filter(
+        status=Task.RUNNING,
+        claimed_at__lt=now - timedelta(seconds=lease_seconds or settings.TASKS_LEASE_SECONDS)
+    )
+    failed = expired.filter(attempts__gte=F('max_attempts')).update(
+        status=Task.FAILED,
+        finished_at=now,
+        last_error='Claim expired'
+    )
+    requeued = expired.update(status=Task.QUEUED, run_at=now, claim_token=None)
+    return requeued + failed
+
+
+def purge_finished(keep_seconds=None):
+    """Delete succeeded tasks older than TASKS_KEEP_SUCCEEDED_SECONDS; failed ones are kept for inspection"""
+    cutoff = timezone.now() - timedelta(seconds=keep_seconds or settings.TASKS_KEEP_SUCCEEDED_SECONDS)
+    deleted, _ = Task.objects.filter(status=Task.SUCCEEDED, finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def run_tasks(tasks):
+    """Run claimed tasks of one name through their handler and record the outcome; returns how many failed"""
+    handler = registry.get(tasks[0].name)
+    try:
+        if handler is None:
+            raise LookupError(f'No task handler named {tasks[0].name!r}')
+        # A failed batch leaves no partial writes behind to be repeated by the retry
+        with handler.atomic():
+            handler.run([task.payload for task in tasks])
+    except Exception:
+        if handler is not None and len(tasks) > 1:
+            # Bisect the batch, so that one bad payload fails alone instead of taking the others with it
+            logger.warning('Task %s failed in a batch of %d; retrying in halves', tasks[0].name, len(tasks))
+            middle = len(tasks) // 2
+            return run_tasks(tasks[:middle]) + run_tasks(tasks[middle:])
+        logger.exception('Task %s failed (%d in batch)', tasks[0].name, len(tasks))
+        fail(tasks, traceback.format_exc(limit=20))
+        return len(tasks)
+    # The claim token check skips tasks whose claim expired and was taken over meanwhile
+    Task.objects.filter(id__in=[task.id for task in tasks], claim_token=tasks[0].claim_token).update(
+        status=Task.SUCCEEDED,
+        finished_at=timezone.now(),
+        last_error=''
+    )
+    return 0
+
+
+def fail(tasks, error):
+    now = timezone.now()
+    for task in tasks:
+        if task.attempts >= task.max_attempts:
+            changes = {'status': Task.FAILED, 'finished_at': now}
+        else:
+            changes = {'status': Task.QUEUED, 'run_at': now + retry_delay(task.attempts), 'claim_token': None}
+        Task.objects.filter(id=task.id, claim_token=task.claim_token).update(last_error=error, **changes)
+
+
+def batches(tasks):
+    """Split claimed tasks into same-name groups no larger than their handler's batch_size"""
+    for name, group in groupby(sorted(tasks, key=lambda task: task.name), key=lambda task: task.name):
+        group = list(group)
+        handler = registry.get(name)
+        size = handler.batch_size if handler else 1
+        for start in range(0, len(group), size):
+            yield group[start:start + size]
+
+
+class Worker:
+    """Claims due tasks and runs them on a thread pool until stopped"""
+
+    def __init__(self, worker_id, threads=4, claim_size=20, poll_seconds=1.0):
+        self.worker_id = worker_id
+        self.threads = threads
+        self.claim_size = claim_size
+        self.poll_seconds = poll_seconds
+        self.stop_event = threading.Event()
+        self.processed = 0
+        self.failed = 0
+        self._housekeeping_at = None
+
+    def _run_in_thread(self, tasks):
+        try:
+            return run_tasks(tasks)
+        finally:
+            # Each pool thread has its own connection; keep it while CONN_MAX_AGE allows
+            close_old_connections()
+
+    def housekeeping(self):
+        now = timezone.now()
+        if self._housekeeping_at and now - self._housekeeping_at < timedelta(seconds=60):
+            return
+        self._housekeeping_at = now
+        requeued = requeue_expired()
+        purged = purge_finished()
+        if requeued or purged:
+            logger.info('Released %d expired claims and purged %d finished tasks', requeued, purged)
+
+    def run_once(self, executor):
+        """Claim and run one round of due tasks; returns how many were claimed"""
+        self.housekeeping()
+        tasks = claim(self.worker_id, self.claim_size)
+        if not tasks:
+            return 0
+        groups = list(batches(tasks))
+        for batch, failed in zip(groups, executor.map(self._run_in_thread, groups)):
+            self.processed += len(batch)
+            self.failed += failed
+        return len(tasks)
+
+    def run(self, burst=False):
+        """Process tasks until stop() is called, or until the queue is drained when burst is set"""
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='task') as executor:
+            while not self.stop_event.is_set():
+                try:
+                    claimed = self.run_once(executor)
+                except Exception:
+                    logger.exception('Worker %s failed to claim tasks', self.worker_id)
+                    connections.close_all()
+                    claimed = 0
+                if not claimed:
+                    if burst:
+                        break
+                    self.stop_event.wait(self.poll_seconds)
+
+    def stop(self):
+        self.stop_event.set()
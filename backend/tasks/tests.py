@@ -0,0 +1,160 @@
+from datetime import timedelta
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, RequestFactory, override_settings
+from django.utils import timezone
+from posts.models import Post, PostView
+from .models import Task
+from .queue import task, claim, run_tasks, requeue_expired, Worker
+
+User = get_user_model()
+
+calls = []
+
+@task(name='tasks.tests.collect', batch_size=3)
+def collect(payloads):
+    calls.append([payload['n'] for payload in payloads])
+
+@task(name='tasks.tests.picky', batch_size=4)
+def picky(payloads):
+    if any(payload['n'] == 13 for payload in payloads):
+        raise ValueError('unlucky')
+    calls.append([payload['n'] for payload in payloads])
+
+@task(name='tasks.tests.explode', max_attempts=2)
+def explode(n):
+    raise RuntimeError(f'boom {n}')
+
+class TaskQueueTestCase(TestCase):
+    """Test cases for claiming, retrying and recovering tasks"""
+    
+    def setUp(self):
+        calls.clear()
+    
+    def test_claim_is_exclusive(self):
+        """Test that a claimed task is not handed to a second worker"""
+        queued = collect.enqueue(n=1)
+        collect.enqueue_at(timezone.now() + timedelta(hours=1), n=2)
+        self.assertEqual(queued.status, Task.QUEUED)
+
+        claimed = claim('worker-a', 10)
+        self.assertEqual([t.id for t in claimed], [queued.id])
+        self.assertEqual(claimed[0].status, Task.RUNNING)
+        self.assertEqual(claimed[0].attempts, 1)
+        self.assertEqual(claim('worker-b', 10), [])
+
+        self.assertEqual(run_tasks(claimed), 0)
+        self.assertEqual(Task.objects.get(id=queued.id).status, Task.SUCCEEDED)
+        self.assertEqual(calls, [[1]])
+    
+    def test_retry_with_backoff_then_fail(self):
+        """Test that failures are retried later and fail for good after max_attempts"""
+        queued = explode.enqueue(n=1)
+        self.assertEqual(run_tasks(claim('worker', 10)), 1)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.QUEUED)
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertIn('boom 1', queued.last_error)
+
+        # Not due yet
+        self.assertEqual(claim('worker', 10), [])
+        Task.objects.filter(id=queued.id).update(run_at=timezone.now())
+        self.assertEqual(run_tasks(claim('worker', 10)), 1)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.FAILED)
+        self.assertEqual(queued.attempts, 2)
+    
+    def test_poison_payload_fails_alone(self):
+        """Test that a failing batch is split until only the bad payload fails"""
+        for n in (1, 2, 13, 4):
+            picky.enqueue(n=n)
+        self.assertEqual(run_tasks(claim('worker', 10)), 1)
+        self.assertEqual(calls, [[1, 2], [4]])
+        self.assertEqual(
+            sorted(Task.objects.filter(status=Task.SUCCEEDED).values_list('payload__n', flat=True)),
+            [1, 2, 4]
+        )
+        self.assertIn('unlucky', Task.objects.get(status=Task.QUEUED).last_error)
+    
+    def test_expired_claims_are_requeued(self):
+        """Test that tasks of a dead worker are released"""
+        queued = collect.enqueue(n=1)
+        claim('worker', 10)
+        self.assertEqual(requeue_expired(), 0)
+        Task.objects.filter(id=queued.id).update(claimed_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_expired(), 1)
+        self.assertEqual(Task.objects.get(id=queued.id).status, Task.QUEUED)
+    
+    @override_settings(TASKS_ALWAYS_EAGER=True)
+    def test_eager_mode(self):
+        """Test that eager mode runs the handler on enqueue"""
+        self.assertIsNone(collect.enqueue(n=5))
+        self.assertEqual(calls, [[5]])
+        self.assertFalse(Task.objects.exists())
+
+class WorkerTestCase(TransactionTestCase):
+    """Test the worker loop with its thread pool"""
+    
+    def setUp(self):
+        calls.clear()
+        self.user = User.objects.create_user(username='worker', email='worker@example.com', password='pass12345')
+        self.post = Post.objects.create(
+            title='Queued views',
+            content='Content',
+            author=self.user,
+            status='published',
+            published_at=timezone.now()
+        )
+    
+    def test_batches_same_type_tasks(self):
+        """Test that same-name tasks run in batches of the handler's batch_size"""
+        for n in range(5):
+            collect.enqueue(n=n)
+        explode.enqueue(n=0)
+
+        worker = Worker('test-worker', threads=2, claim_size=10)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            self.assertEqual(worker.run_once(executor), 6)
+        self.assertEqual(sorted(calls), [[0, 1, 2], [3, 4]])
+        self.assertEqual(worker.processed, 6)
+        self.assertEqual(worker.failed, 1)
+        self.assertEqual(Task.objects.filter(status=Task.SUCCEEDED).count(), 5)
+    
+    @override_settings(POSTS_RECORD_VIEWS_ASYNC=True)
+    def test_post_views_recorded_by_worker(self):
+        """Test that queued views are stored and counted once per user"""
+        factory = RequestFactory()
+        reader = User.objects.create_user(username='reader', email='reader@example.com', password='pass12345')
+        for user in (self.user, self.user, reader):
+            request = factory.get('/')
+            request.user = user
+            request.session = type('Session', (), {'session_key': f'session-{user.username}'})()
+            self.post.record_view(request)
+
+        self.assertEqual(Task.objects.filter(name='posts.record_views').count(), 3)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 0)
+
+        Worker('test-worker', threads=1).run(burst=True)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 2)
+        self.assertEqual(PostView.objects.filter(post_id=self.post.id).count(), 2)
+        self.assertEqual(self.user.author_stats.total_views, 2)
+    
+    @override_settings(POSTS_RECORD_VIEWS_ASYNC=True)
+    def test_failed_view_batch_is_counted_on_retry(self):
+        """Test that views stored by a failed batch are rolled back with it, so the retry counts them"""
+        request = RequestFactory().get('/')
+        request.user = User.objects.create_user(username='reader', email='reader@example.com', password='pass12345')
+        request.session = type('Session', (), {'session_key': 'session-reader'})()
+        self.post.record_view(request)
+        
+        with mock.patch.object(Post, 'increment_view_count', side_effect=RuntimeError('counter down')):
+            run_tasks(claim('test-worker', 10))
+        self.assertFalse(PostView.objects.exists())
+        
+        Task.objects.update(run_at=timezone.now())
+        run_tasks(claim('test-worker', 10))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 1)
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth import get_user_model
+from .models import RevokedToken, AuthorStats
+from .search import match_users
 
 User = get_user_model()
 
@@ -17,6 +19,7 @@ class CustomUserAdmin(UserAdmin):
         'groups', 'user_permissions'
     ]
     search_fields = ['username', 'email', 'first_name', 'last_name']
+    search_help_text = 'Username or name prefix, or an exact email address'
     ordering = ['-date_joined']
     
     fieldsets = (
@@ -45,3 +48,39 @@ class CustomUserAdmin(UserAdmin):
             ),
         }),
     )
+    
+    def get_search_results(self, request, queryset, search_term):
+        """Use the indexed user search instead of icontains across four columns"""
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if '@' in term[1:]:
+            return queryset.filter(email__iexact=term), False
+        # The changelist paginates every match; only the autocomplete API caps them
+        return queryset.filter(pk__in=match_users(term, queryset=queryset).values('pk')), False
+
+@admin.register(RevokedToken)
+class RevokedTokenAdmin(admin.ModelAdmin):
+    """Read-only admin for blacklisted JWT IDs"""
+    list_display = ['jti', 'user', 'expires_at', 'created_at']
+    search_fields = ['jti', 'user__username']
+    readonly_fields = ['jti', 'user', 'expires_at', 'created_at']
+    
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(AuthorStats)
+class AuthorStatsAdmin(admin.ModelAdmin):
+    """Read-only admin for maintained author totals"""
+    list_display = ['user', 'post_count', 'total_views', 'total_reactions', 'comment_count', 'updated_at']
+    search_fields = ['user__username']
+    ordering = ['-total_views']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,104 @@
+import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from blog_backend.cache import LocalCache
+
+User = get_user_model()
+
+VERSION_KEY = 'users:auth-version:{user_id}'
+USER_KEY = 'users:auth:{user_id}:{version}'
+
+# Enough for permission checks and get_queryset filters; anything else is loaded on first access.
+# Model.from_db expects the values in concrete field order.
+CACHED_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.attname in {'id', 'username', 'is_active', 'is_staff', 'is_superuser'}
+)
+
+
+local_users = LocalCache()
+
+
+def get_user_version(user_id):
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_user_version(user_id):
+    """Invalidate the cached authentication data of a user"""
+    cache.set(VERSION_KEY.format(user_id=user_id), time.time_ns(), timeout=None)
+    local_users.discard(str(user_id))
+
+
+def get_cached_user_values(user_id):
+    """Get the cached fields of a user as a tuple in CACHED_FIELDS order, or None if it does not exist"""
+    user_id = str(user_id)
+    values = local_users.get(user_id)
+    if values is not None:
+        return values
+
+    key = USER_KEY.format(user_id=user_id, version=get_user_version(user_id))
+    values = cache.get(key)
+    if values is None:
+        row = User.objects.filter(pk=user_id).values_list(*CACHED_FIELDS).first()
+        if row is None:
+            return None
+        values = tuple(row)
+        cache.set(key, values, timeout=getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 300))
+
+    local_users.set(user_id, values, getattr(settings, 'AUTH_USER_CACHE_LOCAL_TTL', 5))
+    return values
+
+
+def get_cached_user(user_id):
+    """Get a user with only CACHED_FIELDS loaded, or None if it does not exist"""
+    values = get_cached_user_values(user_id)
+    if values is None:
+        return None
+    return User.from_db(DEFAULT_DB_ALIAS, CACHED_FIELDS, values)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that resolves users from a cache instead of the database.
+
+    The user is built with only CACHED_FIELDS loaded; the remaining fields are
+    deferred and fetched together on first access. Cache entries are keyed by
+    a per-user version that is bumped whenever the user or its permissions change.
+    Revoked access tokens are rejected.
+    """
+
+    def get_validated_token(self, raw_token):
+        from .tokens import is_token_revoked
+        validated_token = super().get_validated_token(raw_token)
+        if is_token_revoked(validated_token, use_filter=True):
+            raise InvalidToken(_('Token is blacklisted'))
+        return validated_token
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # Revocation compares the password hash, which is never cached
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
@@ -0,0 +1,69 @@
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id with parameters from the PASSWORD_ARGON2_* settings.
+
+    Stored hashes record their parameters, so changing a setting rehashes
+    each password on its owner's next successful login.
+    """
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with the iteration count from PASSWORD_PBKDF2_ITERATIONS"""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS or PBKDF2PasswordHasher.iterations
+
+
+class HashingBusy(Exception):
+    """Raised when no password hashing slot frees up in time"""
+
+
+_slots = None
+_slots_lock = threading.Lock()
+
+
+@contextmanager
+def hashing_slot():
+    """
+    Cap the number of concurrent password hashes in this process.
+
+    This is a concurrency limit, not offloading: a login waiting for a slot
+    holds its worker thread just as hashing does. Past
+    LOGIN_MAX_CONCURRENT_HASHES, logins wait at most LOGIN_HASH_QUEUE_SECONDS
+    (by default not at all) and then get a 503, so a burst of logins cannot
+    tie up every worker.
+    """
+    global _slots
+    if not settings.LOGIN_MAX_CONCURRENT_HASHES:
+        yield
+        return
+
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(settings.LOGIN_MAX_CONCURRENT_HASHES)
+    wait = settings.LOGIN_HASH_QUEUE_SECONDS
+    if not (_slots.acquire(timeout=wait) if wait > 0 else _slots.acquire(blocking=False)):
+        raise HashingBusy()
+    try:
+        yield
+    finally:
+        _slots.release()
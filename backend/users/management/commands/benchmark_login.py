@@ -0,0 +1,104 @@
+import statistics
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the configured password hashers and, optionally, the login endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10, help='Hashes per hasher')
+        parser.add_argument('--requests', type=int, default=0, help='Login requests to send (0 skips the endpoint)')
+        parser.add_argument('--concurrency', type=int, default=4, help='Threads sending login requests')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Profile: {settings.PASSWORD_HASHER_PROFILE}')
+        self.stdout.write(f'{"hasher":<24}{"encode (ms)":>14}{"verify (ms)":>14}')
+        for hasher in get_hashers():
+            try:
+                encode, verify = self.time_hasher(hasher, options['repeat'])
+            except (ValueError, ImportError) as e:
+                self.stdout.write(f'{hasher.algorithm:<24}{"unavailable":>14}  {e}')
+                continue
+            self.stdout.write(f'{hasher.algorithm:<24}{encode * 1000:>14.1f}{verify * 1000:>14.1f}')
+
+        if options['requests']:
+            for create_session in (True, False):
+                with override_settings(
+                    AUTH_LOGIN_CREATE_SESSION=create_session,
+                    LOGIN_MAX_CONCURRENT_HASHES=0,
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                    # Measure hashing and token minting, not the login rate limit
+                    REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}},
+                ):
+                    self.benchmark_endpoint(options['requests'], options['concurrency'], create_session)
+
+    def time_hasher(self, hasher, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            encoded = hasher.encode('benchmark-password', hasher.salt())
+        encode = (time.perf_counter() - start) / repeat
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            hasher.verify('benchmark-password', encoded)
+        verify = (time.perf_counter() - start) / repeat
+        return encode, verify
+
+    def benchmark_endpoint(self, requests, concurrency, create_session):
+        username = f'benchmark_{uuid.uuid4().hex[:8]}'
+        user = User.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            password='benchmark-password'
+        )
+        timings = []
+        statuses = []
+        lock = threading.Lock()
+        per_thread = max(1, requests // concurrency)
+
+        def worker():
+            client = Client()
+            local_timings, local_statuses = [], []
+            try:
+                for _ in range(per_thread):
+                    start = time.perf_counter()
+                    response = client.post(
+                        '/api/users/login/',
+                        {'username': username, 'password': 'benchmark-password'},
+                        content_type='application/json'
+                    )
+                    local_timings.append(time.perf_counter() - start)
+                    local_statuses.append(response.status_code)
+            finally:
+                connection.close()
+                with lock:
+                    timings.extend(local_timings)
+                    statuses.extend(local_statuses)
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        user.delete()
+
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        mode = 'session + JWT' if create_session else 'JWT only'
+        ok = statuses.count(200)
+        self.stdout.write(
+            f'{mode:<14} {ok}/{len(statuses)} ok, p50 {statistics.median(timings) * 1000:.1f} ms, '
+            f'p95 {p95 * 1000:.1f} ms, {len(timings) / elapsed:.1f} logins/s'
+        )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from users.models import AuthorStats
+
+
+class Command(BaseCommand):
+    help = 'Recompute maintained author stats from posts, comments, reactions and views'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_ids', nargs='*', help='Only reconcile these users')
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids'] or None
+        changed = AuthorStats.reconcile(user_ids)
+        scope = f'{len(user_ids)} users' if user_ids else 'all authors'
+        self.stdout.write(self.style.SUCCESS(f'Reconciled author stats for {scope}: {changed} rows corrected'))
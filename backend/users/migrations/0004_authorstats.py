@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_author_stats(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('comments', 'Comment')
+    PostReactionSummary = apps.get_model('reactions', 'PostReactionSummary')
+    AuthorStats = apps.get_model('users', 'AuthorStats')
+
+    stats = {}
+    for row in Post.objects.order_by().values('author_id').annotate(
+        post_count=models.Count('id', filter=models.Q(status='published')),
+        total_views=models.Sum('view_count')
+    ):
+        stats[row['author_id']] = AuthorStats(
+            user_id=row['author_id'],
+            post_count=row['post_count'],
+            total_views=row['total_views'] or 0
+        )
+    for row in PostReactionSummary.objects.order_by().values('post__author_id').annotate(total=models.Sum('count')):
+        stats[row['post__author_id']].total_reactions = row['total'] or 0
+    for row in Comment.objects.filter(status='approved').order_by().values('post__author_id').annotate(
+        count=models.Count('id')
+    ):
+        stats[row['post__author_id']].comment_count = row['count']
+    AuthorStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_revokedtoken'),
+        ('posts', '0004_alter_postview_unique_together_and_more'),
+        ('comments', '0003_comment_score'),
+        ('reactions', '0006_reactionrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='author_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('post_count', models.PositiveIntegerField(default=0, help_text='Published posts')),
+                ('total_views', models.PositiveBigIntegerField(default=0, help_text="Views of the author's posts")),
+                ('total_reactions', models.PositiveIntegerField(default=0, help_text="Reactions on the author's posts")),
+                ('comment_count', models.PositiveIntegerField(default=0, help_text="Approved comments on the author's posts")),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'author stats',
+            },
+        ),
+        migrations.RunPython(backfill_author_stats, migrations.RunPython.noop),
+    ]
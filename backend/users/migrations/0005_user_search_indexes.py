@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:56
+
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+from django.db.models import Value
+from django.db.models.functions import Concat, Lower
+
+
+def trigram_indexes():
+    from django.contrib.postgres.indexes import GinIndex, OpClass
+    # Must stay identical to the expressions in users.search
+    return [
+        GinIndex(OpClass(Lower('username'), name='gin_trgm_ops'), name='users_username_trgm'),
+        GinIndex(
+            OpClass(Lower(Concat('first_name', Value(' '), 'last_name')), name='gin_trgm_ops'),
+            name='users_display_name_trgm'
+        ),
+    ]
+
+
+def add_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    CustomUser = apps.get_model('users', 'CustomUser')
+    for index in trigram_indexes():
+        schema_editor.add_index(CustomUser, index)
+
+
+def remove_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    CustomUser = apps.get_model('users', 'CustomUser')
+    for index in trigram_indexes():
+        schema_editor.remove_index(CustomUser, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0004_authorstats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(django.db.models.functions.text.Lower('username'), name='users_username_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(django.db.models.functions.text.Lower('first_name'), name='users_first_name_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(django.db.models.functions.text.Lower('last_name'), name='users_last_name_lower_idx'),
+        ),
+        # Both are no-ops outside PostgreSQL
+        TrigramExtension(),
+        migrations.RunPython(add_trigram_indexes, remove_trigram_indexes),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models.functions import Greatest, Lower
 from django.utils.translation import gettext_lazy as _
 import uuid
 
@@ -74,10 +75,24 @@ class CustomUser(AbstractUser):
         verbose_name = _('user')
         verbose_name_plural = _('users')
         ordering = ['-date_joined']
+        # Prefix search on SQLite; PostgreSQL adds trigram indexes in migration 0005
+        indexes = [
+            models.Index(Lower('username'), name='users_username_lower_idx'),
+            models.Index(Lower('first_name'), name='users_first_name_lower_idx'),
+            models.Index(Lower('last_name'), name='users_last_name_lower_idx'),
+        ]
     
     def __str__(self):
         return self.username
     
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        """Load every deferred field at once when one of them is first accessed"""
+        # Users resolved by CachedJWTAuthentication carry only a few fields
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+    
     def get_full_name(self):
         """Return the full name of the user"""
         return f"{self.first_name} {self.last_name}".strip()
@@ -91,3 +106,147 @@ class CustomUser(AbstractUser):
         """Return display name (full name or username)"""
         full_name = self.get_full_name()
         return full_name if full_name else self.username
+
+class RevokedToken(models.Model):
+    """JWT ID that may no longer be used; lookups go through users.tokens"""
+    jti = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='revoked_tokens'
+    )
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return self.jti
+
+class AuthorStats(models.Model):
+    """Maintained per-author totals shown on profile pages"""
+    STAT_FIELDS = ['post_count', 'total_views', 'total_reactions', 'comment_count']
+    
+    user = models.OneToOneField(
+        CustomUser,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='author_stats'
+    )
+    post_count = models.PositiveIntegerField(default=0, help_text=_('Published posts'))
+    total_views = models.PositiveBigIntegerField(default=0, help_text=_('Views of the author\'s posts'))
+    total_reactions = models.PositiveIntegerField(default=0, help_text=_('Reactions on the author\'s posts'))
+    comment_count = models.PositiveIntegerField(default=0, help_text=_('Approved comments on the author\'s posts'))
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = _('author stats')
+    
+    def __str__(self):
+        return f'Stats for {self.user_id}'
+    
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.STAT_FIELDS}
+    
+    @classmethod
+    def empty(cls):
+        return {field: 0 for field in cls.STAT_FIELDS}
+    
+    @staticmethod
+    def _updates(deltas):
+        # Clamp at zero so a missed increment cannot break the unsigned columns
+        return {
+            field: Greatest(models.F(field) + delta, 0)
+            for field, delta in deltas.items() if delta
+        }
+    
+    @classmethod
+    def apply_deltas(cls, user_id, **deltas):
+        """Atomically adjust the totals of an author"""
+        updates = cls._updates(deltas)
+        if not updates or cls.objects.filter(user_id=user_id).update(**updates):
+            return
+        
+        try:
+            with transaction.atomic():
+                cls.objects.create(user_id=user_id, **{
+                    field: max(delta, 0) for field, delta in deltas.items()
+                })
+        except IntegrityError:
+            # Another request created the row first
+            cls.objects.filter(user_id=user_id).update(**updates)
+    
+    @classmethod
+    def apply_for_post(cls, post_id, **deltas):
+        """Adjust the totals of a post's author without loading the post"""
+        from posts.models import Post
+        updates = cls._updates(deltas)
+        if not updates:
+            return
+        author = Post.objects.filter(pk=post_id).values('author_id')
+        if not cls.objects.filter(user_id=models.Subquery(author)).update(**updates):
+            author_id = author.values_list('author_id', flat=True).first()
+            if author_id is not None:
+                cls.apply_deltas(author_id, **deltas)
+    
+    @classmethod
+    def compute(cls, user_ids=None):
+        """Compute the totals from the source tables, keyed by user ID"""
+        from posts.models import Post
+        from comments.models import Comment
+        from reactions.storage import get_storage
+        
+        posts = Post.objects.order_by()
+        if user_ids is not None:
+            posts = posts.filter(author_id__in=user_ids)
+        post_authors = dict(posts.values_list('id', 'author_id'))
+        
+        stats = {}
+        for row in posts.values('author_id').annotate(
+            post_count=models.Count('id', filter=models.Q(status='published')),
+            total_views=models.Sum('view_count')
+        ):
+            stats[row['author_id']] = {
+                **cls.empty(),
+                'post_count': row['post_count'],
+                'total_views': row['total_views'] or 0,
+            }
+        
+        for row in get_storage().count_reactions(list(post_authors) if user_ids is not None else None):
+            author_id = post_authors.get(row['post_id'])
+            if author_id is not None:
+                stats[author_id]['total_reactions'] += row['count']
+        
+        comments = Comment.objects.filter(status='approved', post_id__in=posts.values('id')).order_by()
+        for row in comments.values('post__author_id').annotate(count=models.Count('id')):
+            stats[row['post__author_id']]['comment_count'] = row['count']
+        
+        return stats
+    
+    @classmethod
+    def reconcile(cls, user_ids=None):
+        """Rewrite maintained totals that drifted; returns the number of rows changed"""
+        computed = cls.compute(user_ids)
+        existing = cls.objects.all()
+        if user_ids is not None:
+            existing = existing.filter(user_id__in=user_ids)
+        existing = {row.user_id: row for row in existing}
+        
+        changed, created = [], []
+        for user_id in set(computed) | set(existing):
+            values = computed.get(user_id, cls.empty())
+            row = existing.get(user_id)
+            if row is None:
+                created.append(cls(user_id=user_id, **values))
+            elif row.as_dict() != values:
+                for field, value in values.items():
+                    setattr(row, field, value)
+                changed.append(row)
+        
+        with transaction.atomic():
+            cls.objects.bulk_create(created, ignore_conflicts=True)
+            cls.objects.bulk_update(changed, cls.STAT_FIELDS)
+        return len(created) + len(changed)
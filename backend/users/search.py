@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Concat, Lower
+
+User = get_user_model()
+
+# Shorter terms have no full trigram and are matched by prefix only
+TRIGRAM_MIN_LENGTH = 3
+
+
+def username_expression():
+    return Lower('username')
+
+
+def display_name_expression():
+    # Must stay identical to the expression of the users_display_name_trgm index
+    return Lower(Concat('first_name', Value(' '), 'last_name'))
+
+
+def normalize_query(query):
+    """Lowercase a search term and drop the leading @ of a mention"""
+    return (query or '').strip().lstrip('@').strip().lower()
+
+
+def _prefix_range(field, prefix):
+    # A range instead of LIKE so that SQLite can use the functional lower() indexes
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': upper})
+
+
+def _rank(queryset, query):
+    # Exact username first, then username prefixes, then display name prefixes
+    return queryset.annotate(
+        search_rank=Case(
+            When(search_username=query, then=Value(0)),
+            When(search_username__startswith=query, then=Value(1)),
+            When(search_first_name__startswith=query, then=Value(2)),
+            When(search_last_name__startswith=query, then=Value(2)),
+            default=Value(3),
+            output_field=IntegerField()
+        )
+    )
+
+
+def _prefix_search(queryset, query):
+    queryset = queryset.annotate(
+        search_username=username_expression(),
+        search_first_name=Lower('first_name'),
+        search_last_name=Lower('last_name'),
+    )
+    if connection.vendor == 'postgresql':
+        # LIKE patterns on the indexed expressions are served by the trigram indexes
+        queryset = queryset.annotate(search_display_name=display_name_expression()).filter(
+            Q(search_username__startswith=query)
+            | Q(search_display_name__startswith=query)
+            | Q(search_display_name__contains=f' {query}')
+        )
+    else:
+        queryset = queryset.filter(
+            _prefix_range('search_username', query)
+            | _prefix_range('search_first_name', query)
+            | _prefix_range('search_last_name', query)
+        )
+    return _rank(queryset, query).order_by('search_rank', 'search_username')
+
+
+def _trigram_search(queryset, query):
+    from django.contrib.postgres.lookups import TrigramSimilar
+    from django.contrib.postgres.search import TrigramSimilarity
+    from django.db.models.functions import Greatest
+
+    queryset = queryset.annotate(
+        search_username=username_expression(),
+        search_display_name=display_name_expression(),
+        search_first_name=Lower('first_name'),
+        search_last_name=Lower('last_name'),
+    ).filter(
+        # Both the % operator and LIKE 'q%' are served by the GIN trigram indexes
+        TrigramSimilar(username_expression(), query)
+        | TrigramSimilar(display_name_expression(), query)
+        | Q(search_username__startswith=query)
+    ).annotate(
+        similarity=Greatest(
+            TrigramSimilarity(username_expression(), query),
+            TrigramSimilarity(display_name_expression(), query)
+        )
+    )
+    return _rank(queryset, query).order_by('search_rank', '-similarity', 'search_username')
+
+
+def match_users(query, queryset=None):
+    """
+    Ranked users matching query, best matches first, without a result cap.
+
+    PostgreSQL ranks by trigram similarity of the username and display name,
+    so typos still match. Other databases match username, first and last name
+    prefixes.
+    """
+    query = normalize_query(query)
+    if not query:
+        return User.objects.none()
+
+    if queryset is None:
+        queryset = User.objects.filter(is_active=True)
+
+    if connection.vendor == 'postgresql' and len(query) >= TRIGRAM_MIN_LENGTH:
+        return _trigram_search(queryset, query)
+    return _prefix_search(queryset, query)
+
+
+def search_users(query, limit=None, queryset=None):
+    """Find users for mention autocomplete; at most USER_SEARCH_MAX_RESULTS are returned"""
+    max_results = settings.USER_SEARCH_MAX_RESULTS
+    limit = min(limit or max_results, max_results)
+    return match_users(query, queryset=queryset)[:limit]
@@ -1,6 +1,14 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer, TokenVerifySerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
+from .authentication import get_cached_user
+from .models import AuthorStats
+from .tokens import is_token_revoked, revoke_token
 
 User = get_user_model()
 
@@ -36,18 +44,44 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         user = User.objects.create_user(**validated_data)
         return user
 
+class AuthorStatsField(serializers.Field):
+    """Read-only author totals from the maintained AuthorStats row"""
+    
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+    
+    def to_representation(self, user):
+        try:
+            return user.author_stats.as_dict()
+        except AuthorStats.DoesNotExist:
+            return AuthorStats.empty()
+
 class UserProfileSerializer(serializers.ModelSerializer):
     """Serializer for user profile display"""
+    author_stats = AuthorStatsField()
     
     class Meta:
         model = User
         fields = [
             'id', 'username', 'email', 'first_name', 'last_name',
             'bio', 'avatar', 'website', 'location', 'date_of_birth',
-            'is_verified', 'date_joined', 'last_login'
+            'is_verified', 'date_joined', 'last_login', 'author_stats'
         ]
         read_only_fields = ['id', 'date_joined', 'last_login']
 
+class AuthorSerializer(serializers.ModelSerializer):
+    """Public author profile with totals"""
+    author_stats = AuthorStatsField()
+    
+    class Meta:
+        model = User
+        fields = [
+            'id', 'username', 'first_name', 'last_name', 'avatar',
+            'bio', 'website', 'location', 'is_verified', 'date_joined', 'author_stats'
+        ]
+
 class UserUpdateSerializer(serializers.ModelSerializer):
     """Serializer for updating user profile"""
     
@@ -78,4 +112,44 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
     def validate(self, attrs):
         if attrs['new_password'] != attrs['new_password2']:
             raise serializers.ValidationError({"new_password": "Password fields didn't match."})
-        return attrs 
\ No newline at end of file
+        return attrs 
+
+class BlacklistTokenRefreshSerializer(TokenRefreshSerializer):
+    """Token refresh that honours the cache-backed blacklist and rotates single-use refresh tokens"""
+    
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if is_token_revoked(refresh):
+            raise InvalidToken(_('Token is blacklisted'))
+        
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        if user_id:
+            user = get_cached_user(user_id)
+            if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+                raise AuthenticationFailed(
+                    self.error_messages['no_active_account'],
+                    'no_active_account',
+                )
+        
+        data = {'access': str(refresh.access_token)}
+        
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            # Revoking first makes a refresh token single use even under concurrent requests
+            if api_settings.BLACKLIST_AFTER_ROTATION and not revoke_token(refresh):
+                raise InvalidToken(_('Token is blacklisted'))
+            
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        
+        return data
+
+class BlacklistTokenVerifySerializer(TokenVerifySerializer):
+    """Token verify that rejects blacklisted tokens"""
+    
+    def validate(self, attrs):
+        token = UntypedToken(attrs['token'])
+        if is_token_revoked(token):
+            raise serializers.ValidationError(_('Token is blacklisted'))
+        return {}
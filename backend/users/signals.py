@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from posts.models import Post
+from comments.models import Comment
+from .authentication import bump_user_version
+from .models import AuthorStats
+
+User = get_user_model()
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    bump_user_version(instance.pk)
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_cached_user_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            bump_user_version(instance.pk)
+    elif action == 'pre_clear':
+        # Changed from the group or permission side; after a clear the users are gone
+        for user_id in instance.user_set.values_list('pk', flat=True):
+            bump_user_version(user_id)
+    elif action in ('post_add', 'post_remove'):
+        for user_id in pk_set:
+            bump_user_version(user_id)
+
+def remember_status(instance, update_fields):
+    """Keep the stored status of an existing row so post_save can tell what changed"""
+    if instance._state.adding:
+        instance._previous_status = None
+    elif update_fields is not None and 'status' not in update_fields:
+        instance._previous_status = instance.status
+    else:
+        instance._previous_status = type(instance).objects.filter(pk=instance.pk).values_list(
+            'status', flat=True
+        ).first()
+
+def status_delta(instance, counted_status):
+    previous = getattr(instance, '_previous_status', None)
+    return int(instance.status == counted_status) - int(previous == counted_status)
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Comment)
+def remember_previous_status(sender, instance, update_fields=None, **kwargs):
+    remember_status(instance, update_fields)
+
+@receiver(post_save, sender=Post)
+def count_published_post(sender, instance, **kwargs):
+    AuthorStats.apply_deltas(instance.author_id, post_count=status_delta(instance, 'published'))
+
+@receiver(post_delete, sender=Post)
+def uncount_deleted_post(sender, instance, **kwargs):
+    # Reactions and comments are removed by their own cascaded delete signals
+    AuthorStats.apply_deltas(
+        instance.author_id,
+        post_count=-int(instance.status == 'published'),
+        total_views=-instance.view_count
+    )
+
+@receiver(post_save, sender=Comment)
+def count_approved_comment(sender, instance, **kwargs):
+    AuthorStats.apply_for_post(instance.post_id, comment_count=status_delta(instance, 'approved'))
+
+@receiver(post_delete, sender=Comment)
+def uncount_deleted_comment(sender, instance, **kwargs):
+    AuthorStats.apply_for_post(instance.post_id, comment_count=-int(instance.status == 'approved'))
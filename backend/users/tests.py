@@ -1,3 +1,292 @@
 from django.test import TestCase
+from django.core.management import call_command
+from io import StringIO
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.test import override_settings
+from .authentication import CachedJWTAuthentication, local_users
+from .models import RevokedToken, AuthorStats
+from .search import search_users
+from .tokens import BloomFilter, local_filter, is_token_revoked, revoke_token
+from . import hashers
 
-# Create your tests here.
+User = get_user_model()
+
+class CachedJWTAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        local_users.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123',
+            bio='Hello'
+        )
+        self.token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def authenticate(self):
+        return CachedJWTAuthentication().get_user(self.token)
+
+    def user_queries(self, context):
+        return [query for query in context.captured_queries if f'FROM "{User._meta.db_table}"' in query['sql']]
+
+    def test_repeat_requests_skip_user_query(self):
+        """Test that only the first request loads the user row"""
+        self.client.get('/api/reactions/my_reactions/')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/reactions/my_reactions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.user_queries(context), [])
+
+    def test_version_bump_on_change(self):
+        """Test that saving a user or changing its groups refreshes the cached fields"""
+        self.assertFalse(self.authenticate().is_staff)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertTrue(self.authenticate().is_staff)
+
+        self.authenticate()
+        group = Group.objects.create(name='editors')
+        group.permissions.add(Permission.objects.get(codename='add_customuser'))
+        with CaptureQueriesContext(connection) as context:
+            self.authenticate()
+        self.assertEqual(self.user_queries(context), [])
+        group.user_set.add(self.user)
+        with CaptureQueriesContext(connection) as context:
+            self.authenticate()
+        self.assertEqual(len(self.user_queries(context)), 1)
+
+    def test_deferred_fields_load_together(self):
+        """Test that the first deferred access loads the whole row"""
+        user = self.authenticate()
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'test@example.com')
+            self.assertEqual(user.bio, 'Hello')
+            self.assertTrue(user.check_password('testpass123'))
+
+class TokenBlacklistTestCase(APITestCase):
+    def setUp(self):
+        local_users.clear()
+        local_filter.reset()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.refresh = RefreshToken.for_user(self.user)
+
+    def test_rotated_refresh_token_is_single_use(self):
+        """Test that a refresh token cannot be used after rotation"""
+        response = self.client.post('/api/token/refresh/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('refresh', response.data)
+
+        response = self.client.post('/api/token/refresh/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_logout_revokes_tokens(self):
+        """Test that logout revokes both the access and the refresh token"""
+        access = self.refresh.access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        response = self.client.post('/api/users/logout/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get('/api/reactions/my_reactions/')
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post('/api/token/refresh/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post('/api/token/verify/', {'token': str(access)}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(TOKEN_BLACKLIST_BLOOM=True)
+    def test_bloom_filter_skips_cache_for_unrevoked_tokens(self):
+        """Test that the Bloom filter answers negatives and still catches revocations"""
+        revoked = RefreshToken.for_user(self.user)
+        revoke_token(revoked)
+        local_filter.reset()
+        self.assertTrue(is_token_revoked(revoked, use_filter=True))
+        with self.assertNumQueries(0):
+            self.assertFalse(is_token_revoked(self.refresh, use_filter=True))
+
+    def test_expired_tokens_are_purged(self):
+        """Test that purging drops expired JTIs"""
+        from .tokens import purge_expired
+        revoke_token(self.refresh)
+        RevokedToken.objects.update(expires_at=timezone.now())
+        self.assertEqual(purge_expired(force=True), 1)
+        self.assertFalse(RevokedToken.objects.exists())
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Test that every added value is reported as present"""
+        bloom = BloomFilter(1000)
+        values = [f'jti-{i}' for i in range(1000)]
+        for value in values:
+            bloom.add(value)
+        self.assertTrue(all(value in bloom for value in values))
+        false_positives = sum(f'other-{i}' in bloom for i in range(1000))
+        self.assertLess(false_positives, 50)
+
+@override_settings(PASSWORD_HASHERS=['users.hashers.TunedPBKDF2PasswordHasher'], PASSWORD_PBKDF2_ITERATIONS=1000)
+class LoginHashingTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+    def login(self):
+        return self.client.post('/api/users/login/', {
+            'username': 'testuser',
+            'password': 'testpass123'
+        }, format='json')
+
+    def test_rehash_on_login(self):
+        """Test that a changed hasher profile upgrades the stored hash on login"""
+        self.assertIn('$1000$', self.user.password)
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertIn('$2000$', self.user.password)
+
+    @override_settings(AUTH_LOGIN_CREATE_SESSION=False)
+    def test_jwt_only_login(self):
+        """Test that JWT-only login returns tokens without a session"""
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access_token', response.data)
+        self.assertNotIn('sessionid', response.cookies)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+    @override_settings(LOGIN_MAX_CONCURRENT_HASHES=1)
+    def test_busy_hashing_returns_503(self):
+        """Test that logins beyond the hashing limit are turned away"""
+        hashers._slots = None
+        with hashers.hashing_slot():
+            response = self.login()
+        hashers._slots = None
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+class AuthorStatsTestCase(APITestCase):
+    def setUp(self):
+        from posts.models import Post
+        self.author = User.objects.create_user(
+            username='author',
+            email='author@example.com',
+            password='testpass123'
+        )
+        self.reader = User.objects.create_user(
+            username='reader',
+            email='reader@example.com',
+            password='testpass123'
+        )
+        self.post = Post.objects.create(
+            title='Test Post',
+            content='Test content',
+            author=self.author,
+            status='draft'
+        )
+
+    def stats(self):
+        return AuthorStats.objects.get(user=self.author).as_dict()
+
+    def test_write_paths_update_stats(self):
+        """Test that publishing, views, reactions and comments adjust the totals"""
+        from comments.models import Comment
+        from reactions.models import Reaction
+        self.post.status = 'published'
+        self.post.save()
+        self.post.increment_view_count()
+        Reaction.objects.create(user=self.reader, post=self.post, reaction_type='like')
+        comment = Comment.objects.create(post=self.post, author=self.reader, content='Nice', status='pending')
+        self.assertEqual(self.stats()['comment_count'], 0)
+        comment.status = 'approved'
+        comment.save()
+        self.assertEqual(self.stats(), {
+            'post_count': 1, 'total_views': 1, 'total_reactions': 1, 'comment_count': 1
+        })
+
+        self.post.delete()
+        self.assertEqual(self.stats(), AuthorStats.empty())
+
+    def test_reconcile_and_public_endpoint(self):
+        """Test that reconcile repairs drift and the author endpoint reads one row"""
+        self.post.status = 'published'
+        self.post.save()
+        AuthorStats.objects.filter(user=self.author).update(post_count=7, total_views=3)
+        out = StringIO()
+        call_command('reconcile_author_stats', stdout=out)
+        self.assertIn('1 rows corrected', out.getvalue())
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/users/{self.author.id}/author/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['author_stats']['post_count'], 1)
+        self.assertEqual(response.data['author_stats']['total_views'], 0)
+        self.assertNotIn('email', response.data)
+
+class UserSearchTestCase(APITestCase):
+    """Test cases for ranked user search"""
+    
+    def setUp(self):
+        self.alice = User.objects.create_user(
+            username='alice', email='alice@example.com', password='pass12345',
+            first_name='Alice', last_name='Walker'
+        )
+        self.alicia = User.objects.create_user(
+            username='alicia_k', email='alicia@example.com', password='pass12345'
+        )
+        self.bob = User.objects.create_user(
+            username='bob', email='bob@example.com', password='pass12345',
+            first_name='Bob', last_name='Alison'
+        )
+        User.objects.create_user(
+            username='alien', email='alien@example.com', password='pass12345', is_active=False
+        )
+    
+    def test_ranking_and_cap(self):
+        """Test that exact and username prefixes rank first and results are capped"""
+        self.assertEqual(
+            [user.username for user in search_users('@Ali')],
+            ['alice', 'alicia_k', 'bob']
+        )
+        self.assertEqual([user.username for user in search_users('alice')], ['alice'])
+        self.assertEqual([user.username for user in search_users('walk')], ['alice'])
+        self.assertEqual(len(search_users('ali', limit=1)), 1)
+        with override_settings(USER_SEARCH_MAX_RESULTS=2):
+            self.assertEqual(len(search_users('ali', limit=50)), 2)
+        self.assertEqual(list(search_users('  ')), [])
+    
+    def test_search_endpoint(self):
+        """Test the mention autocomplete endpoint"""
+        response = self.client.get('/api/users/search/', {'q': 'ali'})
+        self.assertEqual(response.status_code, 401)
+
+        self.client.force_authenticate(self.bob)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/users/search/', {'q': 'ali', 'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user['username'] for user in response.data['results']], ['alice', 'alicia_k'])
+        self.assertNotIn('email', response.data['results'][0])
+
+        response = self.client.get('/api/users/search/', {'q': 'ali', 'limit': 'x'})
+        self.assertEqual(response.status_code, 400)
+    
+    @override_settings(USER_SEARCH_MAX_RESULTS=2)
+    def test_admin_search_is_not_capped(self):
+        """Test that the admin changelist lists every match, including inactive users"""
+        admin = User.objects.create_superuser(username='root', email='root@example.com', password='pass12345')
+        self.client.force_login(admin)
+        response = self.client.get('/admin/users/customuser/', {'q': 'ali'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(user.username for user in response.context['cl'].result_list),
+            ['alice', 'alicia_k', 'alien', 'bob']
+        )
@@ -0,0 +1,137 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from .models import RevokedToken
+
+REVOKED_KEY = 'users:revoked-jti:{jti}'
+PURGE_LOCK_KEY = 'users:revoked-jti:purge'
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class LocalRevocationFilter:
+    """
+    Per-worker Bloom filter of revoked JTIs, synced from the database.
+
+    Revocations made by other workers become visible after at most
+    TOKEN_BLACKLIST_BLOOM_SYNC_SECONDS, so it is only consulted for access
+    tokens; refresh and verify always check the shared blacklist.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filter = None
+        self._last_id = 0
+        self._synced_at = 0
+        self._built_at = 0
+
+    def _sync(self):
+        now = time.monotonic()
+        if self._filter is not None and now - self._synced_at < settings.TOKEN_BLACKLIST_BLOOM_SYNC_SECONDS:
+            return
+        if self._filter is None or now - self._built_at > settings.TOKEN_BLACKLIST_BLOOM_REBUILD_SECONDS:
+            # Bloom filters cannot forget, so rebuild to drop purged JTIs
+            self._filter = BloomFilter(settings.TOKEN_BLACKLIST_BLOOM_CAPACITY)
+            self._last_id = 0
+            self._built_at = now
+        rows = RevokedToken.objects.filter(
+            id__gt=self._last_id,
+            expires_at__gt=timezone.now()
+        ).order_by('id').values_list('id', 'jti')
+        for row_id, jti in rows:
+            self._filter.add(jti)
+            self._last_id = row_id
+        self._synced_at = now
+
+    def might_contain(self, jti):
+        with self._lock:
+            self._sync()
+            return jti in self._filter
+
+    def add(self, jti):
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti)
+
+    def reset(self):
+        with self._lock:
+            self._filter = None
+
+
+local_filter = LocalRevocationFilter()
+
+
+def _expiry(token):
+    return datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+
+
+def _seconds_left(expires_at):
+    return max(1, math.ceil((expires_at - timezone.now()).total_seconds()))
+
+
+def revoke_token(token):
+    """Blacklist a validated token until it expires; returns False if it was already revoked"""
+    jti = token[api_settings.JTI_CLAIM]
+    expires_at = _expiry(token)
+    try:
+        _, created = RevokedToken.objects.get_or_create(
+            jti=jti,
+            defaults={'expires_at': expires_at, 'user_id': token.get(api_settings.USER_ID_CLAIM)}
+        )
+    except IntegrityError:
+        # Revoked concurrently
+        created = False
+    cache.set(REVOKED_KEY.format(jti=jti), True, timeout=_seconds_left(expires_at))
+    local_filter.add(jti)
+    purge_expired()
+    return created
+
+
+def is_token_revoked(token, use_filter=False):
+    """Check a validated token against the blacklist; costs one cache lookup on a hit or negative hit"""
+    jti = token[api_settings.JTI_CLAIM]
+    if use_filter and settings.TOKEN_BLACKLIST_BLOOM and not local_filter.might_contain(jti):
+        return False
+
+    key = REVOKED_KEY.format(jti=jti)
+    revoked = cache.get(key)
+    if revoked is None:
+        revoked = RevokedToken.objects.filter(jti=jti).exists()
+        # add() so that a revocation written meanwhile is not overwritten
+        cache.add(key, revoked, timeout=_seconds_left(_expiry(token)))
+    return revoked
+
+
+def purge_expired(force=False):
+    """Delete expired JTIs, at most once per TOKEN_BLACKLIST_PURGE_SECONDS across workers"""
+    if not force and not cache.add(PURGE_LOCK_KEY, True, timeout=settings.TOKEN_BLACKLIST_PURGE_SECONDS):
+        return 0
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
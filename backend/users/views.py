@@ -1,17 +1,27 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken, Token
+from rest_framework_simplejwt.views import TokenObtainPairView
+from django.conf import settings
+from django.shortcuts import get_object_or_404
 from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth.models import update_last_login
 from django.contrib.auth import get_user_model
 from .serializers import (
     UserRegistrationSerializer,
+    AuthorSerializer,
     UserProfileSerializer,
     UserUpdateSerializer,
     UserListSerializer,
     PasswordResetRequestSerializer,
     PasswordResetConfirmSerializer
 )
+from .hashers import HashingBusy, hashing_slot
+from .search import search_users
+from .tokens import revoke_token
 
 User = get_user_model()
 
@@ -19,13 +29,18 @@ class UserViewSet(viewsets.ModelViewSet):
     """ViewSet for user management"""
     queryset = User.objects.all()
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scopes = {
+        'create': 'register',
+        'login': 'login',
+        'search': 'user_search',
+    }
     
     def get_serializer_class(self):
         if self.action == 'create':
             return UserRegistrationSerializer
         elif self.action in ['update', 'partial_update']:
             return UserUpdateSerializer
-        elif self.action == 'list':
+        elif self.action in ['list', 'search']:
             return UserListSerializer
         return UserProfileSerializer
     
@@ -34,7 +49,8 @@ class UserViewSet(viewsets.ModelViewSet):
             return [permissions.AllowAny()]
         elif self.action in ['update', 'partial_update', 'destroy']:
             return [permissions.IsAuthenticated()]
-        return [permissions.IsAuthenticated()]
+        # Fall back to the class or @action permission_classes
+        return super().get_permissions()
     
     def create(self, request, *args, **kwargs):
         """User registration endpoint"""
@@ -83,6 +99,26 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
     
+    @action(detail=True, methods=['get'], permission_classes=[permissions.AllowAny])
+    def author(self, request, pk=None):
+        """Get a public author profile with post, view, reaction and comment totals"""
+        user = get_object_or_404(User.objects.select_related('author_stats'), pk=pk, is_active=True)
+        return Response(AuthorSerializer(user, context={'request': request}).data)
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def search(self, request):
+        """Ranked user search for @-mention autocomplete (?q=, optional limit)"""
+        try:
+            limit = int(request.query_params.get('limit', 0))
+        except ValueError:
+            return Response(
+                {'error': 'limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        users = search_users(request.query_params.get('q'), limit=max(limit, 0))
+        serializer = UserListSerializer(users, many=True, context={'request': request})
+        return Response({'results': serializer.data})
+    
     @action(detail=False, methods=['post'], permission_classes=[permissions.AllowAny])
     def login(self, request):
         """User login endpoint"""
@@ -95,9 +131,22 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        user = authenticate(username=username, password=password)
+        try:
+            with hashing_slot():
+                user = authenticate(request, username=username, password=password)
+        except HashingBusy:
+            return Response(
+                {'error': 'Too many logins in progress, please retry'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '1'}
+            )
+        
         if user:
-            login(request, user)
+            if settings.AUTH_LOGIN_CREATE_SESSION:
+                login(request, user)
+            elif api_settings.UPDATE_LAST_LOGIN:
+                # JWT-only login; keep last_login current like the token endpoint does
+                update_last_login(None, user)
             refresh = RefreshToken.for_user(user)
             return Response({
                 'message': 'Login successful',
@@ -113,8 +162,27 @@ class UserViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def logout(self, request):
-        """User logout endpoint"""
+        """User logout endpoint; revokes the access token used and the refresh token posted"""
+        refresh = request.data.get('refresh')
+        if refresh:
+            try:
+                refresh = RefreshToken(refresh)
+            except TokenError:
+                return Response(
+                    {'error': 'Invalid refresh token'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if str(refresh.get(api_settings.USER_ID_CLAIM)) != str(request.user.pk):
+                return Response(
+                    {'error': 'Refresh token belongs to another user'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
         try:
+            if refresh:
+                revoke_token(refresh)
+            if isinstance(request.auth, Token):
+                revoke_token(request.auth)
             logout(request)
             return Response({'message': 'Logout successful'})
         except Exception as e:
@@ -183,3 +251,18 @@ class UserViewSet(viewsets.ModelViewSet):
                 'note': 'In production, this would validate the token and update the password'
             })
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class ThrottledTokenObtainPairView(TokenObtainPairView):
+    """JWT token endpoint sharing the login throttle budget and hashing slots"""
+    throttle_scope = 'login'
+    
+    def post(self, request, *args, **kwargs):
+        try:
+            with hashing_slot():
+                return super().post(request, *args, **kwargs)
+        except HashingBusy:
+            return Response(
+                {'error': 'Too many logins in progress, please retry'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '1'}
+            )